@@ -0,0 +1,179 @@
+import numba
+import numpy as np
+
+# numba versions of the kernels, imported by kernels.get_compiled_kernels() on the first kernel call, so that
+# importing the solvers does not pay the numba and llvmlite import cost
+
+
+@numba.njit(cache=True)
+def row_utility(indptr, indices, probabilities, utilities, row):
+    '''
+    Definition
+    __________
+
+    Returns sum over s' of P(s'|s,a) * U(s') for a single row of the CSR structure, accumulated in row order
+
+    '''
+
+    total = 0.0
+    for k in range(indptr[row], indptr[row + 1]):
+        total += probabilities[k] * utilities[indices[k]]
+    return total
+
+
+@numba.njit(cache=True)
+def optimal_utility(indptr, indices, probabilities, utilities, num_states, num_actions, state):
+    '''
+    Definition
+    __________
+
+    Returns the expected utility of the optimal action at a single state
+
+    '''
+
+    best = -np.inf
+    for action_index in range(num_actions):
+        value = row_utility(indptr, indices, probabilities, utilities, action_index * num_states + state)
+        if value > best:
+            best = value
+    return best
+
+
+@numba.njit(cache=True)
+def bellman_sweep_compiled(indptr, indices, probabilities, rewards, walls, utilities, discount_factor,
+                           num_actions):
+    '''
+    Definition
+    __________
+
+    Compiled synchronous Bellman sweep, see bellman_sweep()
+
+    '''
+
+    num_states = utilities.shape[0]
+    updated_utilities = np.zeros(num_states)
+    max_utility_change = 0.0
+    for state in range(num_states):
+        if not walls[state]:
+            updated_utilities[state] = rewards[state] + discount_factor * optimal_utility(
+                indptr, indices, probabilities, utilities, num_states, num_actions, state)
+        max_utility_change = max(max_utility_change, abs(updated_utilities[state] - utilities[state]))
+    return updated_utilities, max_utility_change
+
+
+@numba.njit(cache=True)
+def policy_sweep_compiled(indptr, indices, probabilities, rewards, walls, utilities, policy_rows,
+                          discount_factor):
+    '''
+    Definition
+    __________
+
+    Compiled policy evaluation sweep, see policy_sweep()
+
+    '''
+
+    num_states = utilities.shape[0]
+    updated_utilities = np.zeros(num_states)
+    max_utility_change = 0.0
+    for state in range(num_states):
+        if not walls[state]:
+            updated_utilities[state] = rewards[state] + discount_factor * row_utility(
+                indptr, indices, probabilities, utilities, policy_rows[state])
+        max_utility_change = max(max_utility_change, abs(updated_utilities[state] - utilities[state]))
+    return updated_utilities, max_utility_change
+
+
+@numba.njit(cache=True)
+def get_greedy_actions_compiled(indptr, indices, probabilities, walls, utilities, num_actions,
+                                current_actions, tie_tolerance):
+    '''
+    Definition
+    __________
+
+    Compiled greedy action extraction, see get_greedy_actions()
+
+    '''
+
+    num_states = utilities.shape[0]
+    greedy_actions = np.full(num_states, -1, dtype=np.int64)
+    for state in range(num_states):
+        if walls[state]:
+            continue
+
+        best = -np.inf
+        current_utility = 0.0
+        for action_index in range(num_actions):
+            value = row_utility(indptr, indices, probabilities, utilities, action_index * num_states + state)
+            if action_index == current_actions[state]:
+                current_utility = value
+            if value > best:
+                best = value
+                greedy_actions[state] = action_index
+
+        # keep the current action when it ties with the greedy one
+        if current_actions[state] >= 0 and best - current_utility <= tie_tolerance * max(1.0, abs(best)):
+            greedy_actions[state] = current_actions[state]
+    return greedy_actions
+
+
+@numba.njit(cache=True)
+def get_q_values_compiled(indptr, indices, probabilities, rewards, walls, utilities, discount_factor,
+                          num_actions):
+    '''
+    Definition
+    __________
+
+    Compiled Q-value table, see get_q_values()
+
+    '''
+
+    num_states = utilities.shape[0]
+    q_values = np.full((num_actions, num_states), np.nan)
+    for state in range(num_states):
+        if walls[state]:
+            continue
+        for action_index in range(num_actions):
+            q_values[action_index, state] = rewards[state] + discount_factor * row_utility(
+                indptr, indices, probabilities, utilities, action_index * num_states + state)
+    return q_values
+
+
+@numba.njit(cache=True)
+def gauss_seidel_sweep_compiled(indptr, indices, probabilities, rewards, utilities, discount_factor,
+                                num_actions, sweep_order):
+    '''
+    Definition
+    __________
+
+    Compiled Gauss-Seidel sweep, see gauss_seidel_sweep()
+
+    '''
+
+    num_states = utilities.shape[0]
+    max_utility_change = 0.0
+    for state in sweep_order:
+        updated_utility = rewards[state] + discount_factor * optimal_utility(
+            indptr, indices, probabilities, utilities, num_states, num_actions, state)
+        max_utility_change = max(max_utility_change, abs(updated_utility - utilities[state]))
+        utilities[state] = updated_utility
+    return max_utility_change
+
+
+@numba.njit(cache=True)
+def solve_component_compiled(indptr, indices, probabilities, rewards, utilities, discount_factor, num_actions,
+                             states, threshold):
+    '''
+    Definition
+    __________
+
+    Compiled sweeps of a subset of the states until they settle, see solve_component()
+
+    '''
+
+    num_sweeps = 0
+    while True:
+        num_sweeps += 1
+        max_utility_change = gauss_seidel_sweep_compiled(indptr, indices, probabilities, rewards, utilities,
+                                                         discount_factor, num_actions, states)
+        if max_utility_change < threshold:
+            return num_sweeps, max_utility_change
@@ -0,0 +1,383 @@
+import importlib.util
+import numpy as np
+
+# the kernels are JIT-compiled with numba when it is installed, and fall back to numpy otherwise
+KERNEL_BACKENDS = ("numba", "numpy")
+KERNEL_BACKEND = "numba" if importlib.util.find_spec("numba") is not None else "numpy"
+
+# the compiled kernels are imported by get_compiled_kernels() on the first kernel call, so that importing the
+# solvers does not pay the numba and llvmlite import cost
+compiled_kernels = None
+
+
+def get_compiled_kernels():
+    '''
+    Definition
+    __________
+
+    Imports the numba kernels on first use, compiling them or loading them from the numba cache, and returns the
+    module
+
+    '''
+
+    global compiled_kernels
+    if compiled_kernels is None:
+        from algorithms import compiled_kernels as compiled_kernels_module
+        compiled_kernels = compiled_kernels_module
+    return compiled_kernels
+
+
+def set_kernel_backend(backend):
+    '''
+    Definition
+    __________
+
+    Selects the implementation of every kernel, such as the numpy one on a machine with numba to compare the two,
+    and returns the backend selected before
+
+
+    Parameters
+    __________
+
+    backend : string
+        'numba' for the JIT-compiled kernels, which requires numba to be installed, or 'numpy'
+
+    '''
+
+    global KERNEL_BACKEND
+    if backend not in KERNEL_BACKENDS or (backend == "numba" and importlib.util.find_spec("numba") is None):
+        raise ValueError("Unknown kernel backend: " + str(backend))
+
+    previous_backend = KERNEL_BACKEND
+    KERNEL_BACKEND = backend
+    return previous_backend
+
+
+def bellman_sweep(transition_model, utilities, discount_factor):
+    '''
+    Definition
+    __________
+
+    Carries out one synchronous Bellman sweep, U'(s) = R(s) + γ max over a of sum over s' of P(s'|s,a) * U(s'),
+    over every state at once. Walls keep a utility of 0. Returns the updated utilities and the maximum change in
+    utility across all states
+
+
+    Parameters
+    __________
+
+    transition_model : TransitionModel
+        The compiled transition model of the environment
+
+    utilities : one-dimensional numpy array
+        The utility value of each flat state
+
+    discount_factor : float
+        Factor with which future rewards are to be discounted
+
+    '''
+
+    if KERNEL_BACKEND == "numba":
+        return get_compiled_kernels().bellman_sweep_compiled(transition_model.indptr, transition_model.indices,
+                                                             transition_model.probabilities, transition_model.rewards,
+                                                             transition_model.walls, utilities, discount_factor,
+                                                             transition_model.num_actions)
+
+    # expected utility of every action at every state, followed by the utility of the optimal action
+    action_utilities = transition_model.get_action_utilities(utilities)
+    updated_utilities = transition_model.rewards + discount_factor * action_utilities.max(axis=0)
+    updated_utilities[transition_model.walls] = 0
+    return updated_utilities, float(np.abs(updated_utilities - utilities).max(initial=0))
+
+
+def policy_sweep(transition_model, utilities, policy_actions, discount_factor):
+    '''
+    Definition
+    __________
+
+    Carries out one synchronous policy evaluation sweep, U'(s) = R(s) + γ sum over s' of P(s'|s,π(s)) * U(s'),
+    over every state at once. Walls keep a utility of 0. Returns the updated utilities and the maximum change in
+    utility across all states
+
+
+    Parameters
+    __________
+
+    transition_model : TransitionModel
+        The compiled transition model of the environment
+
+    utilities : one-dimensional numpy array
+        The utility value of each flat state
+
+    policy_actions : one-dimensional numpy array
+        Index of the action taken by the policy at each flat state
+
+    discount_factor : float
+        Factor with which future rewards are to be discounted
+
+    '''
+
+    num_states = transition_model.num_states
+    policy_rows = policy_actions * num_states + np.arange(num_states)
+
+    if KERNEL_BACKEND == "numba":
+        return get_compiled_kernels().policy_sweep_compiled(transition_model.indptr, transition_model.indices,
+                                                            transition_model.probabilities, transition_model.rewards,
+                                                            transition_model.walls, utilities, policy_rows,
+                                                            discount_factor)
+
+    # gather the padded successors of the action taken at each state, accumulating one slot at a time
+    successor_indices, successor_probabilities = transition_model.get_padded_arrays()
+    states = np.arange(num_states)
+    policy_utilities = successor_probabilities[0, policy_actions, states] * \
+        utilities[successor_indices[0, policy_actions, states]]
+    for k in range(1, successor_indices.shape[0]):
+        policy_utilities += successor_probabilities[k, policy_actions, states] * \
+            utilities[successor_indices[k, policy_actions, states]]
+
+    updated_utilities = transition_model.rewards + discount_factor * policy_utilities
+    updated_utilities[transition_model.walls] = 0
+    return updated_utilities, float(np.abs(updated_utilities - utilities).max(initial=0))
+
+
+def get_greedy_actions(transition_model, utilities, current_actions=None, tie_tolerance=0):
+    '''
+    Definition
+    __________
+
+    Returns the index of the greedy action at every state, the one maximizing sum over s' of P(s'|s,a) * U(s').
+    Ties are broken in favour of the action appearing first, unless current_actions is given, in which case the
+    current action is kept whenever the best one beats it by at most tie_tolerance * max(1, |best|). Walls get -1
+
+
+    Parameters
+    __________
+
+    transition_model : TransitionModel
+        The compiled transition model of the environment
+
+    utilities : one-dimensional numpy array
+        The utility value of each flat state
+
+    current_actions : one-dimensional numpy array
+        Index of the action currently taken at each flat state, or None
+
+    tie_tolerance : float
+        Relative difference in utility below which the current action is kept
+
+    '''
+
+    if current_actions is None:
+        current_actions = np.full(transition_model.num_states, -1, dtype=np.int64)
+
+    if KERNEL_BACKEND == "numba":
+        return get_compiled_kernels().get_greedy_actions_compiled(transition_model.indptr, transition_model.indices,
+                                                                  transition_model.probabilities,
+                                                                  transition_model.walls, utilities,
+                                                                  transition_model.num_actions, current_actions,
+                                                                  tie_tolerance)
+
+    action_utilities = transition_model.get_action_utilities(utilities)
+    greedy_actions = action_utilities.argmax(axis=0)
+    best_utilities = action_utilities.max(axis=0)
+
+    # keep the current action when it ties with the greedy one
+    states = np.arange(transition_model.num_states)
+    current_utilities = action_utilities[np.maximum(current_actions, 0), states]
+    keep = (current_actions >= 0) & (best_utilities - current_utilities <=
+                                     tie_tolerance * np.maximum(1, np.abs(best_utilities)))
+    greedy_actions = np.where(keep, current_actions, greedy_actions)
+    greedy_actions[transition_model.walls] = -1
+    return greedy_actions
+
+
+def get_q_values(transition_model, utilities, discount_factor):
+    '''
+    Definition
+    __________
+
+    Returns the Q-value of every action at every state in one pass, Q(s, a) = R(s) + γ * sum over s' of
+    P(s'|s,a) * U(s'), as an array of shape (num_actions, num_states). Walls, which have no actions, get NaN. The
+    greedy action of get_greedy_actions() is the argmax over the actions of this array, R(s) being the same for
+    every action of a state
+
+
+    Parameters
+    __________
+
+    transition_model : TransitionModel
+        The compiled transition model of the environment
+
+    utilities : one-dimensional numpy array
+        The utility value of each flat state
+
+    discount_factor : float
+        The discount factor, γ
+
+    '''
+
+    if KERNEL_BACKEND == "numba":
+        return get_compiled_kernels().get_q_values_compiled(transition_model.indptr, transition_model.indices,
+                                                            transition_model.probabilities, transition_model.rewards,
+                                                            transition_model.walls, utilities, discount_factor,
+                                                            transition_model.num_actions)
+
+    q_values = transition_model.rewards + discount_factor * transition_model.get_action_utilities(utilities)
+    q_values[:, transition_model.walls] = np.nan
+    return q_values
+
+
+def get_action_gaps(q_values):
+    '''
+    Definition
+    __________
+
+    Returns the action gap at every state, the difference between the Q-values of the best and the second best
+    actions, from an array of Q-values with the actions along the first axis. States with a small gap are those
+    where the greedy action is barely preferred. Walls get NaN
+
+
+    Parameters
+    __________
+
+    q_values : numpy array
+        The Q-value of each action at each state, as returned by get_q_values(), indexed as [action_index, ...]
+
+    '''
+
+    # the two largest Q-values of every state end up last along the first axis
+    sorted_q_values = np.partition(q_values, q_values.shape[0] - 2, axis=0)
+    return sorted_q_values[-1] - sorted_q_values[-2]
+
+
+def gauss_seidel_sweep(transition_model, utilities, discount_factor, sweep_order):
+    '''
+    Definition
+    __________
+
+    Carries out one Gauss-Seidel sweep, updating the utilities in place in the given order so that later states
+    already see the updated values. Returns the maximum change in utility across the swept states
+
+
+    Parameters
+    __________
+
+    transition_model : TransitionModel
+        The compiled transition model of the environment
+
+    utilities : one-dimensional numpy array
+        The utility value of each flat state, updated in place
+
+    discount_factor : float
+        Factor with which future rewards are to be discounted
+
+    sweep_order : one-dimensional numpy array
+        Flat indices of the states to update, in order
+
+    '''
+
+    if KERNEL_BACKEND == "numba":
+        return get_compiled_kernels().gauss_seidel_sweep_compiled(transition_model.indptr, transition_model.indices,
+                                                                  transition_model.probabilities,
+                                                                  transition_model.rewards, utilities, discount_factor,
+                                                                  transition_model.num_actions, sweep_order)
+
+    # in-place updates cannot be vectorized, so the fallback loops over python lists
+    values = utilities.tolist()
+    rewards = transition_model.rewards.tolist()
+    max_utility_change = 0
+    for state in sweep_order.tolist():
+        updated_utility = rewards[state] + discount_factor * state_backup(transition_model, values, state)
+        max_utility_change = max(max_utility_change, abs(updated_utility - values[state]))
+        values[state] = updated_utility
+
+    utilities[:] = values
+    return max_utility_change
+
+
+def solve_component(transition_model, utilities, discount_factor, states, threshold):
+    '''
+    Definition
+    __________
+
+    Carries out Gauss-Seidel sweeps over a subset of the states, such as a strongly connected component, updating
+    the utilities in place until the maximum change in utility during a sweep is below the threshold. Returns the
+    number of sweeps and the maximum change in utility during the last one
+
+
+    Parameters
+    __________
+
+    transition_model : TransitionModel
+        The compiled transition model of the environment
+
+    utilities : one-dimensional numpy array
+        The utility value of each flat state, updated in place
+
+    discount_factor : float
+        Factor with which future rewards are to be discounted
+
+    states : one-dimensional numpy array
+        Flat indices of the states to update, in order
+
+    threshold : float
+        Maximum change in utility below which sweeping stops
+
+    '''
+
+    if KERNEL_BACKEND == "numba":
+        return get_compiled_kernels().solve_component_compiled(transition_model.indptr, transition_model.indices,
+                                                               transition_model.probabilities, transition_model.rewards,
+                                                               utilities, discount_factor, transition_model.num_actions,
+                                                               states, threshold)
+
+    num_sweeps = 0
+    while True:
+        num_sweeps += 1
+        max_utility_change = gauss_seidel_sweep(transition_model, utilities, discount_factor, states)
+        if max_utility_change < threshold:
+            return num_sweeps, max_utility_change
+
+
+def state_backup(transition_model, utilities, state):
+    '''
+    Definition
+    __________
+
+    Returns the expected utility of the optimal action at a single state, max over a of sum over s' of
+    P(s'|s,a) * U(s'). Used by prioritized sweeping, whose priority queue is driven from python, so it reads the
+    python list copies of the transition model
+
+
+    Parameters
+    __________
+
+    transition_model : TransitionModel
+        The compiled transition model of the environment
+
+    utilities : list
+        The utility value of each flat state
+
+    state : int
+        The flat index of the state to back up
+
+    '''
+
+    indptr, indices, probabilities = transition_model.get_python_arrays()
+
+    # initialize utility for the optimal action
+    optimal_action_utility = float("-inf")
+
+    # iterate through each possible action
+    for action_index in range(transition_model.num_actions):
+        curr_action_utility = 0
+
+        # iterate through each new state in the transition model: P(s'|s, a)
+        transition_row = action_index * transition_model.num_states + state
+        for k in range(indptr[transition_row], indptr[transition_row + 1]):
+            curr_action_utility += probabilities[k] * utilities[indices[k]]
+
+        # optimal action is the one with the maximum utility
+        optimal_action_utility = max(optimal_action_utility, curr_action_utility)
+
+    return optimal_action_utility
@@ -0,0 +1,356 @@
+import numpy as np
+from algorithms.value_iteration import ValueIteration
+from trace_recorder import TraceRecorder
+
+
+class MultigridValueIteration:
+
+    '''
+    Definition
+    __________
+
+    Class to perform coarse-to-fine Value Iteration. The grid is repeatedly coarsened into blocks of cells, the
+    coarsest grid is solved first, and the utilities of each level are prolonged onto the next finer grid as a
+    warm start. On every level, the synchronous sweeps are periodically interleaved with an aggregation correction,
+    which groups the states by their Bellman residual and solves a small linear system for the error common to
+    each group, so that slowly converging errors spanning many cells are removed at once. The groups act as an
+    algebraic coarse level, so a single geometric level already benefits from them
+
+
+    Class Attributes
+    ________________
+
+    discount_factor : float
+        Factor with which future rewards are to be discounted
+
+    coarsening_factor : int
+        Number of cells along each side of the block aggregated into one cell of the next coarser level
+
+    num_levels : int
+        Maximum number of geometric levels, including the original grid, or None to coarsen down to min_size
+
+    min_size : int
+        Grids are not coarsened once their height or width is at most min_size
+
+    num_groups : int
+        Number of groups of states of the aggregation correction, or 0 to only warm-start each level
+
+    correction_interval : int
+        Number of sweeps between two aggregation corrections
+
+    trace : TraceRecorder
+        Records the utility of each cell of the original grid across iterations for future analysis
+
+
+    Methods
+    _______
+
+    get_analysis_data() : Returns the data captured for analysis
+
+    get_levels(mdp) : Returns the environment and discount factor of every level, from the finest to the coarsest
+
+    solve_mdp(mdp, error) : Solves the Markov Decision Process
+
+    solve_level(mdp, discount_factor, error, initial_utilities, trace) : Solves a single level with synchronous sweeps
+    and aggregation corrections
+
+    get_correction(mdp, discount_factor, utilities) : Returns the aggregation correction of the utilities
+
+    '''
+
+    def __init__(self, discount_factor=0.99, coarsening_factor=2, num_levels=1, min_size=16, num_groups=32,
+                 correction_interval=10, trace=None):
+        '''
+        Definition
+        __________
+
+        Initializes the MultigridValueIteration class
+
+
+        Parameters
+        __________
+
+        discount_factor : float
+            Factor with which future rewards are to be discounted
+
+        coarsening_factor : int
+            Number of cells along each side of the block aggregated into one cell of the next coarser level
+
+        num_levels : int
+            Maximum number of geometric levels, including the original grid, or None to coarsen down to min_size.
+            Defaults to the original grid only, since the coarse warm start mostly pays off on grids whose utilities
+            vary smoothly
+
+        min_size : int
+            Grids are not coarsened once their height or width is at most min_size
+
+        num_groups : int
+            Number of groups of states of the aggregation correction, or 0 to only warm-start each level
+
+        correction_interval : int
+            Number of sweeps between two aggregation corrections
+
+        trace : TraceRecorder
+            Records the utility of each cell of the original grid across iterations for future analysis, defaults
+            to recording every iteration
+
+        '''
+
+        if coarsening_factor < 2:
+            raise ValueError("Unknown coarsening factor: " + str(coarsening_factor))
+
+        self.discount_factor = discount_factor
+        self.coarsening_factor = coarsening_factor
+        self.num_levels = num_levels
+        self.min_size = min_size
+        self.num_groups = num_groups
+        self.correction_interval = max(int(correction_interval), 1)
+        self.trace = trace if trace is not None else TraceRecorder()
+
+    def get_analysis_data(self):
+        '''
+        Definition
+        __________
+
+        Returns the data across iterations of the original grid stored for analysis
+
+        '''
+
+        return self.trace.to_dict()
+
+    def get_levels(self, mdp):
+        '''
+        Definition
+        __________
+
+        Returns the environment and discount factor of every level, from the original grid to the coarsest one.
+        One step on a level coarsened by a factor f covers about f cells of the level below, so its discount factor
+        is γ^f and the reward of each block is scaled by 1 + γ + ... + γ^(f-1), which keeps the utilities of every
+        level on the same scale as those of the original grid
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        '''
+
+        levels = [(mdp, self.discount_factor)]
+        while min(levels[-1][0].get_grid_height(), levels[-1][0].get_grid_width()) > self.min_size and \
+                (self.num_levels is None or len(levels) < self.num_levels):
+            fine_mdp, fine_discount_factor = levels[-1]
+
+            # rewards collected along the f steps of the finer level which one coarse step stands for
+            reward_scale = sum(fine_discount_factor ** step for step in range(self.coarsening_factor))
+            levels.append((fine_mdp.coarsen(self.coarsening_factor, reward_scale),
+                           fine_discount_factor ** self.coarsening_factor))
+
+        return levels
+
+    def solve_mdp(self, mdp, error):
+        '''
+        Definition
+        __________
+
+        Solves the Markov Decision Process using coarse-to-fine Value Iteration. Every level terminates with the
+        usual Value Iteration test on a plain synchronous sweep, with the threshold of its own discount factor, so
+        the original grid is solved to the same maximum error as with a plain ValueIteration. The number of
+        iterations reported is the number of sweeps of the original grid, while the number of backups also counts
+        the coarser levels and the aggregation corrections, each correction costing one sweep
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        error : float
+            The maximum acceptable error in utility value for each cell
+
+        '''
+
+        levels = self.get_levels(mdp)
+
+        # solve from the coarsest level up, each level warm-started from the one below it
+        utilities = None
+        num_iters_per_level = []
+        num_backups = 0
+        for level_index in range(len(levels) - 1, -1, -1):
+            level_mdp, level_discount_factor = levels[level_index]
+            transition_model = level_mdp.get_compiled_transition_model()
+
+            initial_utilities = None
+            if utilities is not None:
+                initial_utilities = level_mdp.prolong_utilities(utilities)
+
+            # only the original grid is traced
+            trace = self.trace if level_index == 0 else TraceRecorder("off")
+            utilities, num_iters, num_corrections = self.solve_level(
+                level_mdp, level_discount_factor, error, initial_utilities, trace)
+            utilities = utilities.reshape(transition_model.height, transition_model.width)
+            num_iters_per_level.append(num_iters)
+            num_backups += (num_iters + num_corrections) * int((~transition_model.walls).sum())
+
+        # get the optimal policy based on final utility values, ties going to the action appearing first
+        optimal_policy = ValueIteration(self.discount_factor, backend="numpy").get_optimal_policy_numpy(
+            mdp, utilities.reshape(-1))
+
+        # return the information to the caller, with the iterations of each level listed from the coarsest
+        return {
+            "num_iters": num_iters_per_level[-1],
+            "utilities": utilities.tolist(),
+            "optimal_policy": optimal_policy,
+            "num_backups": num_backups,
+            "num_iters_per_level": num_iters_per_level
+        }
+
+    def solve_level(self, mdp, discount_factor, error, initial_utilities=None, trace=None):
+        '''
+        Definition
+        __________
+
+        Solves a single level with synchronous sweeps, applying an aggregation correction once every
+        correction_interval sweeps. Returns the utility of each flat state as a numpy array, the number of sweeps
+        and the number of corrections
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the level, which specifies the transition model etc
+
+        discount_factor : float
+            Discount factor of the level
+
+        error : float
+            The maximum acceptable error in utility value for each cell
+
+        initial_utilities : two-dimensional list
+            The utility of each cell to start from, defaults to 0 at every cell
+
+        trace : TraceRecorder
+            Records the utility of each cell across iterations, or None
+
+        '''
+
+        transition_model = mdp.get_compiled_transition_model()
+        rewards = transition_model.rewards
+        walls = transition_model.walls
+
+        # initialize the utility of each state, walls staying at 0
+        utilities, num_iters = ValueIteration(discount_factor).get_initial_state(mdp, initial_utilities)
+
+        # calculate change threshold for terminating value iteration loop
+        threshold = error * (1 - discount_factor) / discount_factor
+
+        # initilize analysis data for each cell
+        if trace is None:
+            trace = TraceRecorder("off")
+        trace.start(mdp.get_grid_height(), mdp.get_grid_width())
+        trace.record(utilities)
+
+        # iterate while terminating condition is not met
+        num_corrections = 0
+        while True:
+            num_iters += 1
+
+            # expected utility of every action at every state, followed by the utility of the optimal action
+            action_utilities = transition_model.get_action_utilities(utilities)
+            updated_utilities = rewards + discount_factor * action_utilities.max(axis=0)
+
+            # walls always keep a utility of 0
+            updated_utilities[walls] = 0
+
+            # record change in utility as a result of the step
+            max_utility_change = np.abs(updated_utilities - utilities).max()
+
+            # update the utility values after each iteration, and record them for data analysis
+            utilities = updated_utilities
+            trace.record(utilities)
+
+            # if the change in utility across all cells is smaller than the change threshold, exit the loop
+            if max_utility_change < threshold:
+                break
+
+            # periodically remove the error shared by states with similar residuals
+            if self.num_groups > 0 and num_iters % self.correction_interval == 0:
+                utilities = utilities + self.get_correction(mdp, discount_factor, utilities)
+                num_corrections += 1
+
+        return utilities, num_iters, num_corrections
+
+    def get_correction(self, mdp, discount_factor, utilities):
+        '''
+        Definition
+        __________
+
+        Returns the aggregation correction of the utilities. With r = T(U) - U the Bellman residual and π the greedy
+        policy, the error e = U* - U approximately satisfies e = r + γ P_π e. The states are split into num_groups
+        groups of similar residual, e is assumed constant within each group, and the averaged equation
+        y = R r + γ R P_π D y is solved for the error y of each group, where D maps each state to its group and R
+        averages over each group. The correction is D y
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the level, which specifies the transition model etc
+
+        discount_factor : float
+            Discount factor of the level
+
+        utilities : one-dimensional numpy array
+            The utility value of each flat state
+
+        '''
+
+        transition_model = mdp.get_compiled_transition_model()
+        walls = transition_model.walls
+        num_states = transition_model.num_states
+
+        # Bellman residual and greedy action of every state
+        action_utilities = transition_model.get_action_utilities(utilities)
+        residuals = transition_model.rewards + discount_factor * action_utilities.max(axis=0) - utilities
+        residuals[walls] = 0
+        optimal_actions = action_utilities.argmax(axis=0)
+
+        # split the states into groups of equal width in residual, walls forming a group of their own
+        free_residuals = residuals[~walls]
+        if free_residuals.size == 0:
+            return np.zeros(num_states)
+        low, high = free_residuals.min(), free_residuals.max()
+        if high == low:
+            groups = np.zeros(num_states, dtype=np.int64)
+        else:
+            groups = np.minimum(((residuals - low) / (high - low) * self.num_groups).astype(np.int64),
+                                self.num_groups - 1)
+        groups[walls] = self.num_groups
+        num_groups = self.num_groups + 1
+        group_sizes = np.bincount(groups, minlength=num_groups)
+
+        # R P_π D, accumulated over the transitions of the action taken by the greedy policy at every state
+        policy_rows = optimal_actions * num_states + np.arange(num_states)
+        counts = transition_model.indptr[policy_rows + 1] - transition_model.indptr[policy_rows]
+        entries = np.repeat(transition_model.indptr[policy_rows] - np.cumsum(counts) + counts, counts) + \
+            np.arange(counts.sum())
+        source_groups = np.repeat(groups, counts)
+        target_groups = groups[transition_model.indices[entries]]
+        aggregated_transitions = np.bincount(source_groups * num_groups + target_groups,
+                                             weights=transition_model.probabilities[entries],
+                                             minlength=num_groups * num_groups).reshape(num_groups, num_groups)
+        aggregated_transitions /= np.maximum(group_sizes, 1)[:, None]
+        aggregated_residuals = np.bincount(groups, weights=residuals, minlength=num_groups) / \
+            np.maximum(group_sizes, 1)
+
+        # solve (I - γ R P_π D) y = R r, the walls group having no transitions and no residual
+        group_errors = np.linalg.solve(np.identity(num_groups) - discount_factor * aggregated_transitions,
+                                       aggregated_residuals)
+
+        correction = group_errors[groups]
+        correction[walls] = 0
+        return correction
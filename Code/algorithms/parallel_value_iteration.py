@@ -0,0 +1,331 @@
+import multiprocessing
+import threading
+import time
+import numpy as np
+from algorithms.value_iteration import ValueIteration
+from batch_solver import attach_environment, share_environment
+from trace_recorder import TraceRecorder
+
+# commands written by the main process into the control array before each sweep
+RUN_SWEEP = 0
+STOP = 1
+
+
+def run_band_worker(description, utilities_array, residuals_array, control_array, barrier, worker_index, start, end,
+                    discount_factor):
+    '''
+    Definition
+    __________
+
+    Worker process of ParallelValueIteration, which backs up the states of one band of rows at every sweep. The
+    utilities of the previous sweep are read from one half of the shared double buffer, including the rows of the
+    neighbouring bands, and the updated utilities of the band are written to the other half
+
+
+    Parameters
+    __________
+
+    description : dict
+        Layout of the shared memory block holding the environment, as returned by share_environment()
+
+    utilities_array : multiprocessing.RawArray
+        Shared double buffer of shape [2, states] holding the utilities of the previous and current sweeps
+
+    residuals_array : multiprocessing.RawArray
+        Shared array receiving the maximum change in utility of each band
+
+    control_array : multiprocessing.RawArray
+        Shared array holding the command and the half of the double buffer to read from
+
+    barrier : multiprocessing.Barrier
+        Barrier shared by the workers and the main process, waited on before and after every sweep
+
+    worker_index : int
+        Index of the worker, and of its entry in the residuals array
+
+    start : int
+        Flat index of the first state of the band
+
+    end : int
+        Flat index one past the last state of the band
+
+    discount_factor : float
+        Factor with which future rewards are to be discounted
+
+    '''
+
+    try:
+        transition_model = attach_environment(description).get_compiled_transition_model()
+
+        # pad the successors of the band only, reading its rows from the shared CSR arrays
+        successor_indices, successor_probabilities = transition_model.get_padded_block(start, end)
+        rewards = transition_model.rewards[start:end]
+        walls = transition_model.walls[start:end]
+
+        buffers = np.frombuffer(utilities_array, dtype=np.float64).reshape(2, transition_model.num_states)
+        residuals = np.frombuffer(residuals_array, dtype=np.float64)
+        control = np.frombuffer(control_array, dtype=np.int64)
+
+        while True:
+            barrier.wait()
+            if control[0] == STOP:
+                break
+
+            # one synchronous sweep over the band, in the same order of operations as the numpy backend
+            utilities = buffers[control[1]]
+            action_utilities = successor_probabilities[0] * utilities[successor_indices[0]]
+            for k in range(1, successor_indices.shape[0]):
+                action_utilities += successor_probabilities[k] * utilities[successor_indices[k]]
+            updated_utilities = rewards + discount_factor * action_utilities.max(axis=0)
+            updated_utilities[walls] = 0
+
+            residuals[worker_index] = np.abs(updated_utilities - utilities[start:end]).max(initial=0)
+            buffers[1 - control[1], start:end] = updated_utilities
+            barrier.wait()
+
+    except threading.BrokenBarrierError:
+        return
+    except BaseException:
+
+        # wake up the main process and the other workers instead of leaving them waiting forever
+        barrier.abort()
+        raise
+
+
+class ParallelValueIteration:
+
+    '''
+    Definition
+    __________
+
+    Class to perform synchronous Value Iteration across several worker processes. The grid is split into bands of
+    rows, one per worker, and every sweep reads the previous utilities from a shared double buffer, so that each
+    worker sees the rows of the neighbouring bands it needs without any explicit exchange. The maximum change in
+    utility of every band is reduced by the main process after each sweep to decide on termination, giving the same
+    utilities and number of iterations as ValueIteration with the numpy backend
+
+
+    Class Attributes
+    ________________
+
+    discount_factor : float
+        Factor with which future rewards are to be discounted
+
+    num_workers : int
+        Number of worker processes, defaults to the number of CPUs
+
+    trace : TraceRecorder
+        Records the utility of each cell across iterations for future analysis
+
+
+    Methods
+    _______
+
+    get_analysis_data() : Returns the data captured for analysis
+
+    get_bands(mdp) : Returns the range of flat states handled by each worker
+
+    solve_mdp(mdp, error, initial_utilities) : Solves the Markov Decision Process
+
+    get_scaling_report(mdp, error, worker_counts) : Returns the time taken to solve the Markov Decision Process with
+    each number of workers
+
+    '''
+
+    def __init__(self, discount_factor=0.99, num_workers=None, trace=None):
+        '''
+        Definition
+        __________
+
+        Initializes the ParallelValueIteration class
+
+
+        Parameters
+        __________
+
+        discount_factor : float
+            Factor with which future rewards are to be discounted
+
+        num_workers : int
+            Number of worker processes, defaults to the number of CPUs
+
+        trace : TraceRecorder
+            Records the utility of each cell across iterations for future analysis, defaults to recording every iteration
+
+        '''
+
+        if num_workers is not None and num_workers < 1:
+            raise ValueError("Unknown number of workers: " + str(num_workers))
+
+        self.discount_factor = discount_factor
+        self.num_workers = num_workers if num_workers is not None else multiprocessing.cpu_count()
+        self.trace = trace if trace is not None else TraceRecorder()
+
+    def get_analysis_data(self):
+        '''
+        Definition
+        __________
+
+        Returns the data across iterations stored for analysis
+
+        '''
+
+        return self.trace.to_dict()
+
+    def get_bands(self, mdp):
+        '''
+        Definition
+        __________
+
+        Returns the (start, end) range of flat states handled by each worker, splitting the rows of the grid as
+        evenly as possible, with at most one worker per row
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        '''
+
+        height, width = mdp.get_grid_height(), mdp.get_grid_width()
+        num_bands = max(min(self.num_workers, height), 1)
+        boundaries = [height * band // num_bands for band in range(num_bands + 1)]
+        return [(boundaries[band] * width, boundaries[band + 1] * width) for band in range(num_bands)]
+
+    def solve_mdp(self, mdp, error, initial_utilities=None):
+        '''
+        Definition
+        __________
+
+        Solves the Markov Decision Process using synchronous Value Iteration spread across the worker processes
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        error : float
+            The maximum acceptable error in utility value for each cell
+
+        initial_utilities : two-dimensional list or numpy array
+            The utility of each cell to start from, defaults to 0 at every cell
+
+        '''
+
+        # initialize the utility of each state as 0 before the value iteration, unless warm-started
+        serial_solver = ValueIteration(self.discount_factor, backend="numpy")
+        utilities, num_iters = serial_solver.get_initial_state(mdp, initial_utilities)
+        transition_model = mdp.get_compiled_transition_model()
+        num_states = transition_model.num_states
+
+        # calculate change threshold for terminating value iteration loop
+        threshold = error * (1 - self.discount_factor) / self.discount_factor
+
+        bands = self.get_bands(mdp)
+        utilities_array = multiprocessing.RawArray("d", 2 * num_states)
+        residuals_array = multiprocessing.RawArray("d", len(bands))
+        control_array = multiprocessing.RawArray("q", 2)
+        buffers = np.frombuffer(utilities_array, dtype=np.float64).reshape(2, num_states)
+        residuals = np.frombuffer(residuals_array, dtype=np.float64)
+        control = np.frombuffer(control_array, dtype=np.int64)
+        buffers[0] = utilities
+
+        # initilize analysis data for each cell
+        self.trace.start(mdp.get_grid_height(), mdp.get_grid_width())
+        self.trace.record(utilities)
+
+        block, description = share_environment(mdp)
+        barrier = multiprocessing.Barrier(len(bands) + 1)
+        workers = [multiprocessing.Process(target=run_band_worker, daemon=True, args=(
+            description, utilities_array, residuals_array, control_array, barrier, worker_index, start, end,
+            self.discount_factor)) for worker_index, (start, end) in enumerate(bands)]
+
+        try:
+            for worker in workers:
+                worker.start()
+
+            # iterate while terminating condition is not met
+            parity = 0
+            while True:
+                num_iters += 1
+
+                # release the workers for one sweep reading from the current half of the buffer, and wait for them
+                control[0] = RUN_SWEEP
+                control[1] = parity
+                barrier.wait()
+                barrier.wait()
+
+                # the maximum change across all bands decides on termination
+                max_utility_change = residuals.max()
+                parity = 1 - parity
+                self.trace.record(buffers[parity])
+
+                # if the change in utility across all cells is smaller than the change threshold, exit the loop
+                if max_utility_change < threshold:
+                    break
+
+            utilities = buffers[parity].copy()
+            control[0] = STOP
+            barrier.wait()
+
+        finally:
+            barrier.abort()
+            for worker in workers:
+                if worker.pid is not None:
+                    worker.join()
+            block.close()
+            block.unlink()
+
+        # get the optimal policy based on final utility values
+        optimal_policy = serial_solver.get_optimal_policy_numpy(mdp, utilities)
+
+        # return the information to the caller
+        return {
+            "num_iters": num_iters,
+            "utilities": transition_model.to_grid(utilities),
+            "optimal_policy": optimal_policy,
+            "num_backups": num_iters * int((~transition_model.walls).sum())
+        }
+
+    def get_scaling_report(self, mdp, error, worker_counts=(1, 2, 4, 8)):
+        '''
+        Definition
+        __________
+
+        Solves the Markov Decision Process once with each number of workers, and returns a list of dictionaries
+        holding the number of workers, the wall time of the solve and the speedup over the first number of workers
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        error : float
+            The maximum acceptable error in utility value for each cell
+
+        worker_counts : tuple
+            The numbers of workers to time
+
+        '''
+
+        report = []
+        for num_workers in worker_counts:
+            solver = ParallelValueIteration(self.discount_factor, num_workers, TraceRecorder("off"))
+
+            start = time.perf_counter()
+            solver.solve_mdp(mdp, error)
+            solve_time = time.perf_counter() - start
+
+            report.append({
+                "num_workers": num_workers,
+                "solve_time": solve_time,
+                "speedup": report[0]["solve_time"] / solve_time if report else 1.0
+            })
+
+        return report
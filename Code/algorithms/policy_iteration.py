@@ -1,4 +1,8 @@
-from copy import deepcopy
+import importlib.util
+import time
+import numpy as np
+from algorithms import kernels
+from trace_recorder import TraceRecorder
 
 
 class PolicyIteration:
@@ -19,8 +23,36 @@ class PolicyIteration:
     num_policy_eval_iters : int
         Number of iterations for the policy evaluation step
 
-    analysis_data : dict
-        Data stored during value iteration for future analysis
+    evaluation : string
+        Policy evaluation mode - 'iterative' for a fixed number of sweeps, 'exact' for solving the linear system
+        directly, 'modified' for modified policy iteration, which targets the accuracy of the utilities rather than a
+        stable policy - a fixed number of sweeps per policy, each improvement step backing the utilities up under the
+        greedy policy and stopping once the Bellman residual of that backup guarantees the error
+
+    linear_solver : string
+        Solver used by the exact evaluation mode - 'direct' for a sparse direct solve, 'bicgstab' for an iterative solve
+        warm-started from the previous utilities, falling back to the direct solve if it does not converge
+
+    eval_tolerance : float
+        Bellman residual below which the modified evaluation mode stops, which bounds the error of the final
+        utilities by eval_tolerance * γ / (1 - γ)
+
+    error : float
+        The maximum acceptable error in the utilities of the modified evaluation mode, from which eval_tolerance is
+        derived unless given
+
+    trace : TraceRecorder
+        Records the utility of each cell across evaluation sweeps for future analysis
+
+    checkpoint : Checkpoint
+        Periodically saves the utilities, policy and iteration count, so that a long solve can be resumed, or None
+
+    monitor : SweepMonitor
+        Receives live telemetry after every policy improvement step, or None
+
+    prune_unreachable : bool
+        Whether to evaluate and improve only the states reachable from the start cells of the environment, leaving
+        out the walls and the unreachable cells, whose utility stays at 0 and whose action is never changed
 
 
     Methods
@@ -30,15 +62,42 @@ class PolicyIteration:
 
     get_initial_policy() : Returns the initial policy, which defaults to going right at each cell
 
-    solve_mdp(mdp, error) : Solves the Markov Decision Process
+    get_transition_model(mdp) : Returns the transition model swept by the solver
+
+    solve_mdp(mdp, initial_utilities, initial_policy, resume_from) : Solves the Markov Decision Process, optionally
+    warm-started or resumed from a checkpoint
+
+    solve_mdp_incremental(mdp, previous_result) : Re-solves the Markov Decision Process after some of its cells have
+    changed, warm-started from a previous result
+
+    evaluate_policy(mdp, utilities, policy) : Policy evaluation step to evaluate the policy and return the utilites at
+    each cell
+
+    evaluate_policy_sweeps(mdp, utilities, policy, max_sweeps, tolerance) : Policy evaluation sweeps, stopping early
+    once utilities settle
 
-    evaluate_policy(mdp, utilities, policy) : Policy evaluation step to evaluate the policy and return the utilites at each cell
+    evaluate_policy_exact(mdp, utilities, policy) : Policy evaluation step which solves the linear system
+    (I - γ P_π) U = R
 
-    improve_policy(mdp, utilities, policy) : Policy improvement step to find optimal policy based on updated utilities   
+    get_policy_actions(mdp, policy) : Returns the index of the action taken by the policy at each flat state
+
+    get_greedy_backup(mdp, utilities) : Backs the utilities up under the greedy policy, returning the Bellman residual
+
+    improve_policy(mdp, utilities, policy) : Policy improvement step to find optimal policy based on updated
+    utilities
+
+    get_q_values(mdp, utilities) : Returns the Q-value of every action at every cell
 
     '''
 
-    def __init__(self, discount_factor, num_policy_eval_iters):
+    EVALUATIONS = ("iterative", "exact", "modified")
+    LINEAR_SOLVERS = ("direct", "bicgstab")
+
+    # relative difference in utility below which two actions are considered equally good
+    POLICY_TIE_TOLERANCE = 1e-9
+
+    def __init__(self, discount_factor, num_policy_eval_iters, evaluation="iterative", linear_solver="direct",
+                 eval_tolerance=None, trace=None, checkpoint=None, monitor=None, prune_unreachable=False, error=0.01):
         '''
         Definition
         __________
@@ -55,11 +114,69 @@ class PolicyIteration:
         num_policy_eval_iters : int
             Number of iterations for the policy evaluation step
 
+        evaluation : string
+            Policy evaluation mode - 'iterative' for num_policy_eval_iters sweeps per policy until the policy is
+            stable, 'exact' for solving the linear system directly, 'modified' for num_policy_eval_iters sweeps per
+            policy until the Bellman residual of the greedy backup of each improvement step falls below
+            eval_tolerance. The modified mode does not take fewer sweeps than the iterative one, but its utilities
+            are guaranteed to be within the error of the optimal ones, which those of the iterative mode are not
+
+        linear_solver : string
+            Solver used by the exact evaluation mode - 'direct' for a sparse direct solve, 'bicgstab' for an
+            iterative solve warm-started from the previous utilities, falling back to the direct solve if it does not
+            converge
+
+        eval_tolerance : float
+            Bellman residual below which the modified evaluation mode stops, or None to derive it from the error as
+            error * (1 - γ) / γ. Once the greedy backup changes the utilities by less than eval_tolerance, the
+            backed-up utilities are within eval_tolerance * γ / (1 - γ) of the optimal ones
+
+        trace : TraceRecorder
+            Records the utility of each cell across evaluation sweeps for future analysis, defaults to recording
+            every sweep
+
+        checkpoint : Checkpoint
+            Periodically saves the utilities, policy and iteration count after policy improvement steps, so that
+            a long solve can be resumed
+
+        monitor : SweepMonitor
+            Receives live telemetry after every policy improvement step, or None. Each event reports the largest
+            change in utility over the evaluation, the number of cells whose action changed, and the time split
+            between evaluation and improvement
+
+        prune_unreachable : bool
+            Whether to sweep only the states of Environment.get_pruned_transition_model(), reachable from the start
+            cells of the environment
+
+        error : float
+            The maximum acceptable error in the utilities of the modified evaluation mode, used when eval_tolerance
+            is None
+
         '''
 
+        if evaluation not in self.EVALUATIONS:
+            raise ValueError("Unknown policy evaluation mode: " + str(evaluation))
+        if linear_solver not in self.LINEAR_SOLVERS:
+            raise ValueError("Unknown linear solver: " + str(linear_solver))
+        if evaluation == "exact" and importlib.util.find_spec("scipy") is None:
+            raise ImportError(
+                "scipy is required for the exact policy evaluation mode")
+
         self.discount_factor = discount_factor
         self.num_policy_eval_iters = num_policy_eval_iters
-        self.analysis_data = {}
+        self.evaluation = evaluation
+        self.linear_solver = linear_solver
+        self.error = error
+
+        # stopping once the greedy backup changes the utilities by less than error * (1 - γ) / γ keeps them within
+        # the error of the optimal utilities
+        if eval_tolerance is None:
+            eval_tolerance = error * (1 - discount_factor) / discount_factor
+        self.eval_tolerance = eval_tolerance
+        self.trace = trace if trace is not None else TraceRecorder()
+        self.checkpoint = checkpoint
+        self.monitor = monitor
+        self.prune_unreachable = prune_unreachable
 
     def get_analysis_data(self):
         '''
@@ -70,7 +187,7 @@ class PolicyIteration:
 
         '''
 
-        return self.analysis_data
+        return self.trace.to_dict()
 
     def get_initial_policy(self, mdp):
         '''
@@ -91,7 +208,28 @@ class PolicyIteration:
             mdp.get_grid_width())] for row in range(mdp.get_grid_height())]
         return random_start_policy
 
-    def solve_mdp(self, mdp):
+    def get_transition_model(self, mdp):
+        '''
+        Definition
+        __________
+
+        Returns the transition model swept by the solver - the one restricted to the reachable states when
+        unreachable states are pruned, and the one of the whole grid otherwise
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        '''
+
+        if self.prune_unreachable:
+            return mdp.get_pruned_transition_model()
+        return mdp.get_compiled_transition_model()
+
+    def solve_mdp(self, mdp, initial_utilities=None, initial_policy=None, resume_from=None):
         '''
         Definition
         __________
@@ -105,44 +243,145 @@ class PolicyIteration:
         mdp : Environment
             The environment of the Markov Decision Process to solve, which specifies the transition model etc
 
+        initial_utilities : two-dimensional list
+            The utility of each cell to start from, defaults to 0 at every cell. Walls are reset to 0
+
+        initial_policy : two-dimensional list
+            The action of each cell to start from, defaults to get_initial_policy()
+
+        resume_from : Checkpoint
+            Checkpoint saved by an interrupted solve, to resume from with an identical result
+
         '''
 
-        # initialize the initial policy for each cell
-        policy = self.get_initial_policy(mdp)
+        # record how many times the policy was evaluated, and the wall time spent doing so
+        num_iters = 0
+        num_evaluations = 0
+        evaluation_time = 0
+
+        # a checkpoint restores every counter along with the utilities and policy
+        if resume_from is not None:
+            state = resume_from.load(mdp)
+            if state["algorithm"] != "policy_iteration":
+                raise ValueError("Checkpoint was saved by another algorithm: " + state["algorithm"])
+            initial_utilities = state["utilities"]
+            initial_policy = state["policy"]
+            num_iters = state["num_iters"]
+            num_evaluations = state["num_evaluations"]
+            evaluation_time = state["evaluation_time"]
 
-        # initialize the utility of each cell as 0 before the value iteration
-        utilities = [[0 for col in range(mdp.get_grid_width())]
-                     for row in range(mdp.get_grid_height())]
+        # initialize the initial policy for each cell
+        if initial_policy is None:
+            policy = self.get_initial_policy(mdp)
+        else:
+            policy = [list(policy_row) for policy_row in initial_policy]
+
+        # initialize the utility of each cell as 0 before the value iteration, unless warm-started
+        if initial_utilities is None:
+            utilities = [[0 for col in range(mdp.get_grid_width())]
+                         for row in range(mdp.get_grid_height())]
+        else:
+            utilities = np.where(mdp.get_walls(), 0, np.array(initial_utilities, dtype=np.float64)).tolist()
 
         # initilize analysis data for each cell
-        for row in range(mdp.get_grid_height()):
-            for col in range(mdp.get_grid_width()):
-                analysis_data_key = "(" + str(col) + "," + str(row) + ")"
-                self.analysis_data[analysis_data_key] = [0]
+        self.trace.start(mdp.get_grid_height(), mdp.get_grid_width())
+        self.trace.record(utilities)
+        transition_model = self.get_transition_model(mdp)
+        if self.monitor is not None:
+            self.monitor.start("policy_iteration", transition_model)
 
-        num_iters = 0
+        num_free_cells = max(int((~transition_model.walls).sum()), 1)
 
         # use a variable to record whether policy has changed in the policy improvement step
         policy_unchanged = False
 
         # iterate while the policy is still changing at each improvement step
         while not policy_unchanged:
+            max_utility_change = float("nan")
 
             # evaluate policy to get utilies at each cell
-            utilities = self.evaluate_policy(mdp, utilities, policy)
-            num_iters += self.num_policy_eval_iters
+            previous_utilities = utilities
+            previous_num_iters = num_iters
+            evaluation_start = time.perf_counter()
+            if self.evaluation == "exact":
+                utilities = self.evaluate_policy_exact(mdp, utilities, policy)
+                num_iters += 1
+            else:
+                utilities = self.evaluate_policy(mdp, utilities, policy)
+                num_iters += self.num_policy_eval_iters
+            step_evaluation_time = time.perf_counter() - evaluation_start
+            evaluation_time += step_evaluation_time
+            num_evaluations += 1
 
             # improve policy based on the updated utilities, to get the final optimal policy
-            policy, policy_unchanged = self.improve_policy(mdp,
-                                                           utilities, policy)
-
-        # Return the required information to the caller
+            improvement_start = time.perf_counter()
+            improved_policy, policy_unchanged = self.improve_policy(mdp,
+                                                                    utilities, policy)
+
+            # report the evaluation and improvement step
+            if self.monitor is not None:
+                improvement_time = time.perf_counter() - improvement_start
+                self.monitor.record_sweep(
+                    num_evaluations, np.abs(np.subtract(utilities, previous_utilities)).max(initial=0),
+                    step_evaluation_time + improvement_time,
+                    sum(improved_action != action for improved_row, policy_row in zip(
+                        improved_policy, policy) for improved_action, action in zip(improved_row, policy_row)),
+                    num_eval_sweeps=num_iters - previous_num_iters, evaluation_time=step_evaluation_time,
+                    improvement_time=improvement_time)
+
+            # modified policy iteration backs the utilities up under the greedy policy, which starts its evaluation,
+            # and stops on the Bellman residual of that backup rather than on a stable policy
+            if self.evaluation == "modified":
+                utilities, max_utility_change = self.get_greedy_backup(mdp, utilities)
+                num_iters += 1
+                policy_unchanged = max_utility_change < self.eval_tolerance
+
+            policy = improved_policy
+
+            # save the state of the solver every few improvement steps, so that the solve can be resumed
+            if self.checkpoint is not None and not policy_unchanged and self.checkpoint.is_due(num_evaluations):
+                self.checkpoint.save("policy_iteration", mdp, utilities, policy, num_iters, max_utility_change,
+                                     num_evaluations=num_evaluations, evaluation_time=evaluation_time)
+
+        # Return the required information to the caller, counting one backup of every free cell per evaluation
+        # sweep (or exact evaluation) and per improvement step
+        if self.monitor is not None:
+            self.monitor.finish(num_iters, (num_iters + num_evaluations) * num_free_cells)
         return {
             "num_iters": num_iters,
             "utilities": utilities,
-            "optimal_policy": policy
+            "optimal_policy": policy,
+            "num_evaluations": num_evaluations,
+            "evaluation_time": evaluation_time,
+            "num_backups": (num_iters + num_evaluations) * num_free_cells
         }
 
+    def solve_mdp_incremental(self, mdp, previous_result):
+        '''
+        Definition
+        __________
+
+        Re-solves the Markov Decision Process after some of its cells have been changed with Environment.set_cell(),
+        starting from the utilities and policy of a previous result, so that only the actions around the changed
+        cells usually need to be improved before the policy is stable again
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        previous_result : dict
+            The result of a previous solve of the same environment, before its cells were changed
+
+        '''
+
+        # the changed states are not needed, since every state is evaluated, but are consumed all the same
+        mdp.pop_changed_states()
+
+        return self.solve_mdp(mdp, previous_result["utilities"], previous_result["optimal_policy"])
+
     def evaluate_policy(self, mdp, utilities, policy):
         '''
         Definition
@@ -166,56 +405,190 @@ class PolicyIteration:
         '''
 
         # carry out policy evaluation for a specific number of steps
-        for i in range(self.num_policy_eval_iters):
+        utilities, num_sweeps, max_utility_change = self.evaluate_policy_sweeps(
+            mdp, utilities, policy, self.num_policy_eval_iters)
+
+        # return the utilities of each cell after evaluation is done
+        return utilities
+
+    def evaluate_policy_sweeps(self, mdp, utilities, policy, max_sweeps, tolerance=None):
+        '''
+        Definition
+        __________
 
-            # create a deecopy of utilities to make changes on
-            updated_utilities = deepcopy(utilities)
+        Policy evaluation sweeps, which stop after max_sweeps sweeps or as soon as the maximum change in utility
+        falls below the tolerance. Returns the utilities at each cell, the number of sweeps carried out and the
+        maximum change in utility during the last sweep
 
-            for row in range(mdp.get_grid_height()):
-                for col in range(mdp.get_grid_width()):
 
-                    # key for the analysis_data dictionary
-                    analysis_data_key = "(" + str(col) + "," + str(row) + ")"
+        Parameters
+        __________
 
-                    # if current cell is a wall, update analysis data with 0 change in utility
-                    if mdp.is_wall(row, col):
-                        self.analysis_data[analysis_data_key].append(0)
-                    else:
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
 
-                        # initialize the current action and set its utility to 0
-                        curr_action = policy[row][col]
-                        curr_action_utility = 0
+        utilities : two-dimensional list
+            The utility value of each cell in the grid
 
-                        # retrieve the transition model: P(s'|s,a)
-                        transition_model = mdp.get_transition_model(
-                            row, col, curr_action)
+        policy : two-dimensional list
+            The existing action to be taken at each cell
 
-                        # iterate through each new state in the transition model
-                        # the robot can be in a state different than the intended one due to the nature of the transition model
-                        for new_state in transition_model:
-                            transition_probability = transition_model[new_state]
-                            transition_utility = utilities[new_state[0]
-                                                           ][new_state[1]]
+        max_sweeps : int
+            Maximum number of sweeps to carry out
 
-                            # add the utility of transition multiplied by the probability of that transition happening
-                            curr_action_utility += transition_probability * transition_utility
+        tolerance : float
+            Maximum change in utility below which sweeping stops, or None to always carry out max_sweeps sweeps
 
-                        # collect reward for transition
-                        reward = mdp.get_reward(row, col)
+        '''
 
-                        # record the updated utility
-                        updated_utilities[row][col] = reward + \
-                            self.discount_factor * curr_action_utility
+        # retrieve the transition model swept by the solver, compiled once by the environment
+        transition_model = self.get_transition_model(mdp)
 
-                        # record update utility for data analysis
-                        self.analysis_data[analysis_data_key].append(
-                            updated_utilities[row][col])
+        # flatten the utilities, and look up the index of the action taken by the policy at each state
+        utilities = transition_model.gather(np.array(utilities, dtype=np.float64).reshape(-1))
+        policy_actions = transition_model.gather(self.get_policy_actions(mdp, policy))
 
-            # update the utility values after each iteration
-            utilities = deepcopy(updated_utilities)
+        # start recording analysis data if evaluation is run outside of solve_mdp()
+        if not self.trace.is_started():
+            self.trace.start(mdp.get_grid_height(), mdp.get_grid_width())
+
+        # carry out policy evaluation for at most the specified number of steps
+        num_sweeps = 0
+        max_utility_change = float("inf")
+        while num_sweeps < max_sweeps:
+            num_sweeps += 1
+
+            # back up every state under the action of the policy with the shared kernel, walls keeping a utility of 0
+            utilities, max_utility_change = kernels.policy_sweep(
+                transition_model, utilities, policy_actions, self.discount_factor)
+
+            # record the updated utilities for data analysis
+            self.trace.record(transition_model.scatter(utilities))
+
+            # stop early once the utilities have settled
+            if tolerance is not None and max_utility_change < tolerance:
+                break
 
         # return the utilities of each cell after evaluation is done
-        return utilities
+        return transition_model.to_grid(transition_model.scatter(utilities)), num_sweeps, max_utility_change
+
+    def get_policy_actions(self, mdp, policy):
+        '''
+        Definition
+        __________
+
+        Returns the index of the action taken by the policy at each flat state, as a numpy array
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        policy : two-dimensional list
+            The existing action to be taken at each cell
+
+        '''
+
+        action_indices = {action: action_index for action_index,
+                          action in enumerate(mdp.get_actions())}
+        return np.array([action_indices[action] for policy_row in policy for action in policy_row], dtype=np.int64)
+
+    def evaluate_policy_exact(self, mdp, utilities, policy):
+        '''
+        Definition
+        __________
+
+        Policy evaluation step which computes the exact utilities of the policy, by building the sparse
+        linear system (I - γ P_π) U = R and solving it
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        utilities : two-dimensional list
+            The utility value of each cell in the grid, used as the starting point of iterative linear solvers
+
+        policy : two-dimensional list
+            The existing action to be taken at each cell
+
+        '''
+
+        # scipy is only imported once the exact evaluation mode is used
+        from scipy import sparse
+        from scipy.sparse import linalg as sparse_linalg
+
+        transition_model = self.get_transition_model(mdp)
+        num_states = transition_model.num_states
+
+        # look up the CSR row of the action taken by the policy at each state
+        policy_rows = transition_model.gather(self.get_policy_actions(mdp, policy)) * num_states + \
+            np.arange(num_states)
+
+        # P_π holds the transition probabilities of the action chosen by the policy at each state,
+        # walls have no transitions and no reward, so that their utility solves to 0
+        transition_matrix = sparse.csr_matrix(
+            (transition_model.probabilities, transition_model.indices, transition_model.indptr),
+            shape=(transition_model.num_actions * num_states, num_states))
+        policy_matrix = transition_matrix[policy_rows]
+        rewards = np.where(transition_model.walls, 0, transition_model.rewards)
+
+        # solve (I - γ P_π) U = R
+        system = (sparse.identity(num_states, format="csr") -
+                  self.discount_factor * policy_matrix).tocsc()
+        if self.linear_solver == "direct":
+            solved_utilities = sparse_linalg.spsolve(system, rewards)
+        else:
+            initial_utilities = transition_model.gather(np.array(utilities, dtype=np.float64).reshape(-1))
+            solved_utilities, info = sparse_linalg.bicgstab(
+                system, rewards, x0=initial_utilities, rtol=1e-12, atol=0)
+
+            # an iterative solve which did not converge, or broke down, falls back to the direct solve, otherwise the
+            # inexact utilities can make policy improvement flip between actions forever
+            if info != 0:
+                solved_utilities = sparse_linalg.spsolve(system, rewards)
+
+        # record the exact utilities for data analysis
+        if not self.trace.is_started():
+            self.trace.start(mdp.get_grid_height(), mdp.get_grid_width())
+        self.trace.record(transition_model.scatter(solved_utilities))
+
+        # return the utilities of each cell after evaluation is done
+        return transition_model.to_grid(transition_model.scatter(solved_utilities))
+
+    def get_greedy_backup(self, mdp, utilities):
+        '''
+        Definition
+        __________
+
+        Backs the utilities up once under the greedy action of every state, with the shared kernel. Returns the
+        backed-up utilities at each cell and the Bellman residual, the maximum change in utility, which bounds the
+        distance of the backed-up utilities to the optimal ones by residual * γ / (1 - γ)
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        utilities : two-dimensional list
+            The utility value of each cell in the grid
+
+        '''
+
+        transition_model = self.get_transition_model(mdp)
+        flat_utilities = transition_model.gather(np.array(utilities, dtype=np.float64).reshape(-1))
+        utilities, max_utility_change = kernels.bellman_sweep(transition_model, flat_utilities, self.discount_factor)
+
+        # record the backed-up utilities for data analysis
+        self.trace.record(transition_model.scatter(utilities))
+
+        return transition_model.to_grid(transition_model.scatter(utilities)), max_utility_change
 
     def improve_policy(self, mdp, utilities, policy):
         '''
@@ -239,48 +612,50 @@ class PolicyIteration:
 
         '''
 
-        # create a deepcopy of the current policy to make changes on
-        improved_policy = deepcopy(policy)
+        transition_model = self.get_transition_model(mdp)
+        actions = mdp.get_actions()
 
-        # iterate over all cells to determine policy
-        for row in range(mdp.get_grid_height()):
-            for col in range(mdp.get_grid_width()):
+        # greedy action at every state, computed by the shared kernel, keeping the current action when it ties with
+        # the optimal one up to rounding errors, otherwise the policy can oscillate forever between equally good actions
+        flat_utilities = transition_model.gather(np.array(utilities, dtype=np.float64).reshape(-1))
+        greedy_actions = transition_model.scatter(kernels.get_greedy_actions(
+            transition_model, flat_utilities, transition_model.gather(self.get_policy_actions(mdp, policy)),
+            self.POLICY_TIE_TOLERANCE), fill=-1).tolist()
 
-                # if the current cell is not a wall, process it
-                if not mdp.is_wall(row, col):
+        # walls, and the cells left out of a pruned transition model, keep their current action
+        flat_policy = [action for policy_row in policy for action in policy_row]
+        improved_policy = transition_model.to_grid([action if greedy_action < 0 else actions[greedy_action]
+                                                    for action, greedy_action in zip(flat_policy, greedy_actions)])
 
-                    # initialize optimal action and corresponding optimal utility
-                    optimal_action = None
-                    optimal_action_utility = float("-inf")
+        # return the improved policy to the caller, with a flag to indicate whether it has changed or not
+        return improved_policy, improved_policy == policy
+
+    def get_q_values(self, mdp, utilities):
+        '''
+        Definition
+        __________
 
-                    # iterate over all the actions
-                    for curr_action in mdp.get_actions():
+        Returns the Q-value of every action at every cell, R(s) + γ * sum over s' of P(s'|s,a) * U(s'), computed from
+        the utility values in one pass by the shared kernel, as a numpy array indexed as [action_index, row, col] in
+        the order of mdp.get_actions(). Walls, and the cells left out of a pruned transition model, get NaN.
+        kernels.get_action_gaps() turns it into the action gap of every cell
 
-                        # initiallize utility of current action to 0
-                        curr_action_utility = 0
 
-                        # retrieve the transition model: P(s'|s,a)
-                        transition_model = mdp.get_transition_model(
-                            row, col, curr_action)
+        Parameters
+        __________
 
-                        # iterate through each new state in the transition model
-                        # the robot can be in a state different than the intended one due to the nature of the transition model
-                        for new_state in transition_model:
-                            transition_probability = transition_model[new_state]
-                            transition_utility = utilities[new_state[0]
-                                                           ][new_state[1]]
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
 
-                            # add the utility of transition multiplied by the probability of that transition happening
-                            curr_action_utility += transition_probability * transition_utility
+        utilities : two-dimensional list
+            The utility value of each cell in the grid
 
-                        # if utility of current action is more than the best one so far
-                        # then the current action is the optimal action so far
-                        if curr_action_utility > optimal_action_utility:
-                            optimal_action = curr_action
-                            optimal_action_utility = curr_action_utility
+        '''
 
-                    # record the most optimal action for the current cell
-                    improved_policy[row][col] = optimal_action
+        transition_model = self.get_transition_model(mdp)
+        flat_utilities = transition_model.gather(np.array(utilities, dtype=np.float64).reshape(-1))
+        q_values = kernels.get_q_values(transition_model, flat_utilities, self.discount_factor)
 
-        # return the improved policy to the caller, with a flag to indicate whether it has changed or not
-        return improved_policy, improved_policy == policy
+        # scatter the Q-values of each action back to the grid, the cells left out of a pruned model getting NaN
+        return np.array([transition_model.scatter(action_q_values, fill=np.nan) for action_q_values in q_values]) \
+            .reshape(transition_model.num_actions, transition_model.height, transition_model.width)
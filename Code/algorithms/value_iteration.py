@@ -1,5 +1,12 @@
+import heapq
+import math
+import os
+import time
 import numpy as np
-from copy import deepcopy
+from collections import deque
+from algorithms import kernels
+from compact_grid import CELL_TYPES
+from trace_recorder import TraceRecorder
 
 
 class ValueIteration:
@@ -17,8 +24,37 @@ class ValueIteration:
     discount_factor : float
         Factor with which future rewards are to be discounted
 
-    analysis_data : dict
-        Data stored during value iteration for future analysis
+    backend : string
+        Implementation of the synchronous Bellman backup - 'kernel' for the shared kernels of algorithms.kernels,
+        JIT-compiled with numba when it is installed and written with numpy otherwise, 'numpy' for vectorized sweeps
+
+    mode : string
+        Order of the updates - 'synchronous' for sweeps reading only the previous utilities, 'gauss_seidel' for
+        in-place sweeps, 'prioritized' for prioritized sweeping on the Bellman residual, 'topological' for in-place
+        sweeps of one strongly connected component at a time, each solved to convergence
+
+    sweep_order : string
+        Order of the states in a Gauss-Seidel sweep - 'row_major', or 'goal_distance' for increasing reverse
+        BFS distance from the goal ('G') cells
+
+    trace : TraceRecorder
+        Records the utility of each cell across iterations for future analysis
+
+    checkpoint : Checkpoint
+        Periodically saves the utilities and iteration count, so that a long solve can be resumed, or None
+
+    monitor : SweepMonitor
+        Receives live telemetry after every sweep, or None
+
+    buffer_directory : string
+        Directory to memory-map the double buffer of utilities from, or None to keep the utilities in memory
+
+    chunk_size : int
+        Number of states backed up at once when the utilities are memory-mapped
+
+    prune_unreachable : bool
+        Whether to sweep only the states reachable from the start cells of the environment, leaving out the walls
+        and the unreachable cells, whose utility stays at 0
 
 
     Methods
@@ -26,13 +62,55 @@ class ValueIteration:
 
     get_analysis_data() : Returns the data captured for analysis
 
-    solve_mdp(mdp, error) : Solves the Markov Decision Process
+    solve_mdp(mdp, error, initial_utilities, resume_from) : Solves the Markov Decision Process, optionally warm-started
+    or resumed from a checkpoint
+
+    get_transition_model(mdp) : Returns the transition model swept by the solver
+
+    get_initial_state(mdp, initial_utilities, resume_from) : Returns the utilities and iteration count to start from
+
+    solve_mdp_numpy(mdp, error) : Solves the Markov Decision Process with vectorized sweeps over all states and actions
+
+    solve_mdp_memmap(mdp, error, initial_utilities, resume_from) : Solves the Markov Decision Process with the utilities
+    memory-mapped from two files, swept one chunk of states at a time
+
+    solve_mdp_batch(mdp, error, discount_factors, reward_mappings) : Solves the Markov Decision Process for several
+    discount factors and reward mappings at once, with one batched sweep serving every configuration
+
+    solve_mdp_gauss_seidel(mdp, error) : Solves the Markov Decision Process with in-place sweeps
+
+    solve_mdp_prioritized(mdp, error) : Solves the Markov Decision Process with prioritized sweeping
+
+    solve_mdp_topological(mdp, error, initial_utilities, resume_from) : Solves the Markov Decision Process one strongly
+    connected component at a time, in reverse topological order
+
+    solve_mdp_incremental(mdp, error, previous_result, changed_states) : Re-solves the Markov Decision Process after
+    some of its cells have changed, propagating outward from the changed states
+
+    run_prioritized_sweeping(mdp, utilities, states, threshold, num_iters) : Runs prioritized sweeping from the given
+    states
+
+    get_sweep_order(mdp) : Returns the order in which states are updated during a Gauss-Seidel sweep
+
+    get_state_backup(mdp, utilities, state) : Returns the utility of the optimal action at a state
 
     get_optimal_policy(mdp, utilities) : Returns the greedy optimal policy based on utilites calculated
 
+    get_optimal_policy_numpy(mdp, utilities) : Returns the greedy optimal policy based on a flat utility array
+
+    get_q_values(mdp, utilities) : Returns the Q-value of every action at every cell
+
     '''
 
-    def __init__(self, discount_factor=0.99):
+    BACKENDS = ("kernel", "numpy")
+
+    # former names of the backends, still accepted
+    BACKEND_ALIASES = {"python": "kernel"}
+    MODES = ("synchronous", "gauss_seidel", "prioritized", "topological")
+    SWEEP_ORDERS = ("row_major", "goal_distance")
+
+    def __init__(self, discount_factor=0.99, backend="kernel", mode="synchronous", sweep_order="row_major", trace=None,
+                 checkpoint=None, monitor=None, buffer_directory=None, chunk_size=1 << 20, prune_unreachable=False):
         '''
         Definition
         __________
@@ -46,10 +124,80 @@ class ValueIteration:
         discount_factor : float
             Factor with which future rewards are to be discounted
 
+        backend : string
+            Implementation of the synchronous Bellman backup - 'kernel' for the shared kernels of algorithms.kernels,
+            JIT-compiled with numba when it is installed and written with numpy otherwise, 'numpy' for vectorized
+            sweeps. 'python', the former name of 'kernel', is still accepted
+
+        mode : string
+            Order of the updates - 'synchronous' for sweeps reading only the previous utilities, 'gauss_seidel' for
+            in-place sweeps, 'prioritized' for prioritized sweeping on the Bellman residual, 'topological' for
+            in-place sweeps of one strongly connected component at a time, each solved to convergence
+
+        sweep_order : string
+            Order of the states in a Gauss-Seidel sweep - 'row_major', or 'goal_distance' for increasing reverse
+            BFS distance from the goal ('G') cells. Also orders the states inside each component of the topological
+            mode
+
+        trace : TraceRecorder
+            Records the utility of each cell across iterations for future analysis, defaults to recording every
+            iteration, or to recording nothing when the utilities are memory-mapped, which do not support a full trace
+
+        checkpoint : Checkpoint
+            Periodically saves the utilities and iteration count, so that a long solve can be resumed. Not supported
+            by the prioritized mode, whose priority queue cannot be saved, nor by the topological mode
+
+        monitor : SweepMonitor
+            Receives live telemetry after every sweep, or None. The prioritized and incremental solves report once
+            every sweep-equivalent of backups, and the topological solve once every component
+
+        buffer_directory : string
+            Directory to memory-map the double buffer of utilities from, so that the size of the grid is limited by
+            disk rather than RAM, or None to keep the utilities in memory. Only supported by the synchronous mode
+
+        chunk_size : int
+            Number of states backed up at once when the utilities are memory-mapped
+
+        prune_unreachable : bool
+            Whether to sweep only the states of Environment.get_pruned_transition_model(), reachable from the start
+            cells of the environment. Only supported by the synchronous, gauss_seidel and topological modes, in
+            memory
+
         '''
 
+        backend = self.BACKEND_ALIASES.get(backend, backend)
+        if backend not in self.BACKENDS:
+            raise ValueError("Unknown value iteration backend: " + str(backend))
+        if mode not in self.MODES:
+            raise ValueError("Unknown value iteration mode: " + str(mode))
+        if sweep_order not in self.SWEEP_ORDERS:
+            raise ValueError("Unknown sweep order: " + str(sweep_order))
+        if backend == "numpy" and mode != "synchronous":
+            raise ValueError("The numpy backend only supports synchronous updates")
+        if checkpoint is not None and mode in ("prioritized", "topological"):
+            raise ValueError("Checkpoints are not supported by the " + mode + " mode")
+        if buffer_directory is not None and mode != "synchronous":
+            raise ValueError("Memory-mapped utilities are only supported by the synchronous mode")
+        if buffer_directory is not None and trace is not None and trace.mode == "full":
+            raise ValueError("A full trace keeps every sweep in memory, use an 'off', 'every_nth' or 'ring' trace with "
+                             "memory-mapped utilities")
+        if prune_unreachable and (mode == "prioritized" or buffer_directory is not None):
+            raise ValueError("Pruning unreachable states is only supported by in-memory synchronous, gauss_seidel "
+                             "and topological modes")
+
         self.discount_factor = discount_factor
-        self.analysis_data = {}
+        self.backend = backend
+        self.mode = mode
+        self.sweep_order = sweep_order
+        # memory-mapped utilities are not recorded by default, since a full trace would hold every sweep in memory
+        if trace is None:
+            trace = TraceRecorder("off") if buffer_directory is not None else TraceRecorder()
+        self.trace = trace
+        self.checkpoint = checkpoint
+        self.monitor = monitor
+        self.buffer_directory = buffer_directory
+        self.chunk_size = max(int(chunk_size), 1)
+        self.prune_unreachable = prune_unreachable
 
     def get_analysis_data(self):
         '''
@@ -60,9 +208,9 @@ class ValueIteration:
 
         '''
 
-        return self.analysis_data
+        return self.trace.to_dict()
 
-    def solve_mdp(self, mdp, error):
+    def solve_mdp(self, mdp, error, initial_utilities=None, resume_from=None):
         '''
         Definition
         __________
@@ -79,98 +227,972 @@ class ValueIteration:
         error : float
             The maximum acceptable error in utility value for each cell
 
+        initial_utilities : two-dimensional list or numpy array
+            The utility of each cell to start from, such as the solution of a similar grid or one prolonged from a
+            coarser grid with Environment.prolong_utilities(), defaults to 0 at every cell
+
+        resume_from : Checkpoint
+            Checkpoint saved by an interrupted solve, to resume from with an identical result
+
         '''
 
-        # initialize the utility of each cell as 0 before the value iteration
-        utilities = [[0 for i in range(mdp.get_grid_width())]
-                     for j in range(mdp.get_grid_height())]
+        # dispatch to the memory-mapped, vectorized or asynchronous implementations if they have been selected
+        if self.buffer_directory is not None:
+            return self.solve_mdp_memmap(mdp, error, initial_utilities, resume_from)
+        if self.backend == "numpy":
+            return self.solve_mdp_numpy(mdp, error, initial_utilities, resume_from)
+        if self.mode == "gauss_seidel":
+            return self.solve_mdp_gauss_seidel(mdp, error, initial_utilities, resume_from)
+        if self.mode == "prioritized":
+            return self.solve_mdp_prioritized(mdp, error, initial_utilities, resume_from)
+        if self.mode == "topological":
+            return self.solve_mdp_topological(mdp, error, initial_utilities, resume_from)
+
+        # retrieve the transition model swept by the solver, compiled once by the environment
+        setup_start = time.perf_counter()
+        transition_model = self.get_transition_model(mdp)
+        walls = transition_model.walls
+
+        # initialize the utility of each state as 0 before the value iteration, unless warm-started or resumed
+        utilities, num_iters = self.get_initial_state(mdp, initial_utilities, resume_from)
 
         # calculate change threshold for terminating value iteration loop
         threshold = error * (1 - self.discount_factor) / self.discount_factor
 
         # initilize analysis data for each cell
-        for row in range(mdp.get_grid_height()):
-            for col in range(mdp.get_grid_width()):
-                analysis_data_key = "(" + str(col) + "," + str(row) + ")"
-                self.analysis_data[analysis_data_key] = [0]
+        self.trace.start(mdp.get_grid_height(), mdp.get_grid_width())
+        self.trace.record(transition_model.scatter(utilities))
+        if self.monitor is not None:
+            self.monitor.start("value_iteration", transition_model, time.perf_counter() - setup_start)
 
         # iterate while terminating condition is not met
+        while True:
+            num_iters += 1
+            sweep_start = time.perf_counter()
+
+            # back up every state with the shared kernel, walls keeping a utility of 0
+            utilities, max_utility_change = kernels.bellman_sweep(
+                transition_model, utilities, self.discount_factor)
+
+            # record the updated utilities for data analysis, and report the sweep
+            self.trace.record(transition_model.scatter(utilities))
+            if self.monitor is not None:
+                self.monitor.record_sweep(num_iters, max_utility_change, time.perf_counter() - sweep_start,
+                                          self.monitor.count_policy_changes(transition_model, utilities))
+
+            # if the change in utility across all cells is smaller than the change threshold, exit the loop
+            if max_utility_change < threshold:
+                break
+
+            # save the state of the solver every few sweeps, so that the solve can be resumed
+            if self.checkpoint is not None and self.checkpoint.is_due(num_iters):
+                self.checkpoint.save("value_iteration", mdp, transition_model.scatter(utilities), None, num_iters,
+                                     max_utility_change)
+
+        # get the optimal policy based on final utility values
+        optimal_policy = self.get_optimal_policy_numpy(mdp, utilities)
+        num_backups = num_iters * int((~walls).sum())
+        if self.monitor is not None:
+            self.monitor.finish(num_iters, num_backups)
+
+        # return the information to the caller
+        return {
+            "num_iters": num_iters,
+            "utilities": transition_model.to_grid(transition_model.scatter(utilities)),
+            "optimal_policy": optimal_policy,
+            "num_backups": num_backups
+        }
+
+    def get_transition_model(self, mdp):
+        '''
+        Definition
+        __________
+
+        Returns the transition model swept by the solver - the one restricted to the reachable states when
+        unreachable states are pruned, and the one of the whole grid otherwise
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        '''
+
+        if self.prune_unreachable:
+            return mdp.get_pruned_transition_model()
+        return mdp.get_compiled_transition_model()
+
+    def get_initial_state(self, mdp, initial_utilities=None, resume_from=None):
+        '''
+        Definition
+        __________
+
+        Returns the utility of each flat state to start the value iteration from, as a numpy array with walls at 0,
+        along with the number of iterations already carried out
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        initial_utilities : two-dimensional list or numpy array
+            The utility of each cell to start from, defaults to 0 at every cell
+
+        resume_from : Checkpoint
+            Checkpoint saved by an interrupted solve, whose utilities and iteration count take precedence
+
+        '''
+
+        transition_model = self.get_transition_model(mdp)
         num_iters = 0
+
+        if resume_from is not None:
+            state = resume_from.load(mdp)
+            if state["algorithm"] != "value_iteration":
+                raise ValueError("Checkpoint was saved by another algorithm: " + state["algorithm"])
+            initial_utilities = state["utilities"]
+            num_iters = state["num_iters"]
+
+        if initial_utilities is None:
+            return np.zeros(transition_model.num_states), num_iters
+
+        # walls always keep a utility of 0
+        utilities = transition_model.gather(np.array(initial_utilities, dtype=np.float64).reshape(-1))
+        utilities[transition_model.walls] = 0
+        return utilities, num_iters
+
+    def solve_mdp_numpy(self, mdp, error, initial_utilities=None, resume_from=None):
+        '''
+        Definition
+        __________
+
+        Solves the Markov Decision Process using Value Iteration, where each sweep is a batched
+        gather / multiply / max over all states and all actions at once
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        error : float
+            The maximum acceptable error in utility value for each cell
+
+        initial_utilities : two-dimensional list or numpy array
+            The utility of each cell to start from, defaults to 0 at every cell
+
+        resume_from : Checkpoint
+            Checkpoint saved by an interrupted solve, to resume from with an identical result
+
+        '''
+
+        # retrieve the transition model swept by the solver, compiled once by the environment
+        setup_start = time.perf_counter()
+        transition_model = self.get_transition_model(mdp)
+        transition_model.get_padded_arrays()
+        rewards = transition_model.rewards
+        walls = transition_model.walls
+
+        # initialize the utility of each state as 0 before the value iteration, unless warm-started or resumed
+        utilities, num_iters = self.get_initial_state(mdp, initial_utilities, resume_from)
+
+        # calculate change threshold for terminating value iteration loop
+        threshold = error * (1 - self.discount_factor) / self.discount_factor
+
+        # initilize analysis data for each cell
+        self.trace.start(mdp.get_grid_height(), mdp.get_grid_width())
+        self.trace.record(transition_model.scatter(utilities))
+        if self.monitor is not None:
+            self.monitor.start("value_iteration", transition_model, time.perf_counter() - setup_start)
+
+        # iterate while terminating condition is not met
         while True:
             num_iters += 1
-            max_utility_change = float("-inf")
+            sweep_start = time.perf_counter()
+
+            # expected utility of every action at every state, gathered from the transition model, followed by the
+            # utility of the optimal action
+            action_utilities = transition_model.get_action_utilities(utilities)
+            lookup_time = time.perf_counter() - sweep_start
+            updated_utilities = rewards + self.discount_factor * \
+                action_utilities.max(axis=0)
+
+            # walls always keep a utility of 0
+            updated_utilities[walls] = 0
+
+            # record change in utility as a result of the step
+            max_utility_change = np.abs(updated_utilities - utilities).max()
+
+            # update the utility values after each iteration, record them for data analysis, and report the sweep
+            utilities = updated_utilities
+            self.trace.record(transition_model.scatter(utilities))
+            if self.monitor is not None:
+                sweep_time = time.perf_counter() - sweep_start
+                self.monitor.record_sweep(num_iters, max_utility_change, sweep_time,
+                                          self.monitor.count_policy_changes(transition_model, utilities),
+                                          lookup_time=lookup_time, arithmetic_time=sweep_time - lookup_time)
+
+            # if the change in utility across all cells is smaller than the change threshold, exit the loop
+            if max_utility_change < threshold:
+                break
+
+            # save the state of the solver every few sweeps, so that the solve can be resumed
+            if self.checkpoint is not None and self.checkpoint.is_due(num_iters):
+                self.checkpoint.save("value_iteration", mdp, transition_model.scatter(utilities), None, num_iters,
+                                     max_utility_change)
+
+        # get the optimal policy based on final utility values
+        optimal_policy = self.get_optimal_policy_numpy(mdp, utilities)
+        num_backups = num_iters * int((~walls).sum())
+        if self.monitor is not None:
+            self.monitor.finish(num_iters, num_backups)
+
+        # return the information to the caller
+        return {
+            "num_iters": num_iters,
+            "utilities": transition_model.to_grid(transition_model.scatter(utilities)),
+            "optimal_policy": optimal_policy,
+            "num_backups": num_backups
+        }
 
-            # create a deecopy of utilities to make changes on
-            updated_utilities = deepcopy(utilities)
+    def solve_mdp_memmap(self, mdp, error, initial_utilities=None, resume_from=None):
+        '''
+        Definition
+        __________
 
-            for row in range(mdp.get_grid_height()):
-                for col in range(mdp.get_grid_width()):
+        Solves the Markov Decision Process using synchronous Value Iteration, with the utilities held in two .npy
+        files of the buffer directory which are memory-mapped and swapped after every sweep, instead of being copied.
+        Each sweep reads the previous utilities from one file and writes the updated ones to the other, one chunk of
+        states at a time, so that memory stays proportional to the chunk size. Gives the same utilities and number
+        of iterations as the numpy backend. The utilities and the optimal policy are returned as memory-mapped
+        arrays of shape [height, width], the policy holding the index of each action in mdp.get_actions(), and -1
+        at walls
 
-                    # key for the analysis_data dictionary
-                    analysis_data_key = "(" + str(col) + "," + str(row) + ")"
 
-                    # if current cell is a wall, update analysis data with 0 change in utility
-                    if mdp.is_wall(row, col):
-                        self.analysis_data[analysis_data_key].append(0)
-                    else:
+        Parameters
+        __________
 
-                        # initialize utility for the optimal action
-                        optimal_action_utility = float("-inf")
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
 
-                        # iterate through each possible action
-                        for action in mdp.get_actions():
-                            curr_action_utility = 0
+        error : float
+            The maximum acceptable error in utility value for each cell
 
-                            # retrieve the transition model: P(s'|s, a)
-                            transition_model = mdp.get_transition_model(
-                                row, col, action)
+        initial_utilities : two-dimensional list or numpy array
+            The utility of each cell to start from, defaults to 0 at every cell
 
-                            # iterate through each new state in the transition model
-                            # the robot can be in a state different than the intended one due to the nature of the transition model
-                            for new_state in transition_model:
-                                transition_probability = transition_model[new_state]
-                                transition_utility = utilities[new_state[0]
-                                                               ][new_state[1]]
+        resume_from : Checkpoint
+            Checkpoint saved by an interrupted solve, to resume from with an identical result
 
-                                # add the utility of transition multiplied by the probability of that transition happening
-                                curr_action_utility += transition_probability * transition_utility
+        '''
 
-                            # optimal action is the one with the maximum utility
-                            optimal_action_utility = max(
-                                optimal_action_utility, curr_action_utility)
+        # retrieve the transition model of the whole grid, compiled once by the environment
+        setup_start = time.perf_counter()
+        transition_model = mdp.get_compiled_transition_model()
+        num_states = transition_model.num_states
+        chunks = [(start, min(start + self.chunk_size, num_states))
+                  for start in range(0, num_states, self.chunk_size)]
 
-                        # collect reward for transition
-                        reward = mdp.get_reward(row, col)
+        # the double buffer of utilities, new files starting at 0 at every cell
+        os.makedirs(self.buffer_directory, exist_ok=True)
+        buffers = [np.lib.format.open_memmap(os.path.join(self.buffer_directory, "utilities_" + str(index) + ".npy"),
+                                             mode="w+", dtype=np.float64, shape=(num_states,)) for index in range(2)]
 
-                        # record the updated utility
-                        updated_utilities[row][col] = reward + \
-                            self.discount_factor * optimal_action_utility
+        # warm-start or resume from earlier utilities
+        num_iters = 0
+        if initial_utilities is not None or resume_from is not None:
+            buffers[0][:], num_iters = self.get_initial_state(mdp, initial_utilities, resume_from)
 
-                        # record change in utility as a result of the step
-                        max_utility_change = max(
-                            max_utility_change, abs(updated_utilities[row][col] - utilities[row][col]))
+        # calculate change threshold for terminating value iteration loop
+        threshold = error * (1 - self.discount_factor) / self.discount_factor
 
-                        # record update utility for data analysis
-                        self.analysis_data[analysis_data_key].append(
-                            updated_utilities[row][col])
+        # initilize analysis data for each cell
+        current = 0
+        self.trace.start(mdp.get_grid_height(), mdp.get_grid_width())
+        self.trace.record(buffers[current])
+        if self.monitor is not None:
+            self.monitor.start("value_iteration", transition_model, time.perf_counter() - setup_start)
 
-            # update the utility values after each iteration
-            utilities = deepcopy(updated_utilities)
+        # iterate while terminating condition is not met
+        while True:
+            num_iters += 1
+            sweep_start = time.perf_counter()
+            utilities, updated_utilities = buffers[current], buffers[1 - current]
+
+            # back up every chunk of states from one buffer into the other, walls keeping a utility of 0
+            max_utility_change = 0
+            for start, end in chunks:
+                action_utilities = transition_model.get_action_utilities_block(utilities, start, end)
+                updated_block = transition_model.rewards[start:end] + self.discount_factor * \
+                    action_utilities.max(axis=0)
+                updated_block[transition_model.walls[start:end]] = 0
+                max_utility_change = max(max_utility_change, float(
+                    np.abs(updated_block - utilities[start:end]).max(initial=0)))
+                updated_utilities[start:end] = updated_block
+
+            # swap the buffers, record the updated utilities for data analysis, and report the sweep
+            current = 1 - current
+            self.trace.record(buffers[current])
+            if self.monitor is not None:
+                self.monitor.record_sweep(num_iters, max_utility_change, time.perf_counter() - sweep_start)
 
             # if the change in utility across all cells is smaller than the change threshold, exit the loop
             if max_utility_change < threshold:
                 break
 
+            # save the state of the solver every few sweeps, so that the solve can be resumed
+            if self.checkpoint is not None and self.checkpoint.is_due(num_iters):
+                self.checkpoint.save("value_iteration", mdp, buffers[current], None, num_iters, max_utility_change)
+
+        # get the greedy action of every chunk of states based on final utility values, ties going to the action
+        # appearing first
+        utilities = buffers[current]
+        optimal_policy = np.lib.format.open_memmap(os.path.join(self.buffer_directory, "policy.npy"), mode="w+",
+                                                   dtype=np.int8, shape=(num_states,))
+        num_free_states = 0
+        for start, end in chunks:
+            greedy_actions = transition_model.get_action_utilities_block(utilities, start, end).argmax(axis=0)
+            walls = transition_model.walls[start:end]
+            greedy_actions[walls] = -1
+            optimal_policy[start:end] = greedy_actions
+            num_free_states += int((~walls).sum())
+
+        for buffer in buffers + [optimal_policy]:
+            buffer.flush()
+        if self.monitor is not None:
+            self.monitor.finish(num_iters, num_iters * num_free_states)
+
+        # return the information to the caller
+        shape = (mdp.get_grid_height(), mdp.get_grid_width())
+        return {
+            "num_iters": num_iters,
+            "utilities": utilities.reshape(shape),
+            "optimal_policy": optimal_policy.reshape(shape),
+            "num_backups": num_iters * num_free_states
+        }
+
+    def solve_mdp_batch(self, mdp, error, discount_factors=None, reward_mappings=None):
+        '''
+        Definition
+        __________
+
+        Solves the Markov Decision Process using Value Iteration for K configurations at once, each pairing a
+        discount factor with a reward mapping. The utilities are stacked into a [K, states] array so that every
+        sweep backs up all the configurations with the same batched gathers, and each configuration stops being
+        updated as soon as it meets its own termination condition, giving the same result as a separate run of
+        solve_mdp_numpy(). The trace is not used by batched solves
+
+        Returns a dictionary holding the number of iterations of each configuration, the utilities as a
+        [K, height, width] numpy array, and the list of the K optimal policies
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        error : float
+            The maximum acceptable error in utility value for each cell
+
+        discount_factors : list of float
+            Discount factor of each configuration, defaults to the discount factor of the class
+
+        reward_mappings : list of dict
+            Reward of each cell type ('wall', 'G', 'B', '') for each configuration, defaults to the rewards of the
+            environment. A single discount factor or reward mapping is shared by every configuration
+
+        '''
+
+        transition_model = mdp.get_compiled_transition_model()
+        walls = transition_model.walls
+        num_states = transition_model.num_states
+
+        if discount_factors is None:
+            discount_factors = [self.discount_factor]
+        if reward_mappings is None:
+            reward_mappings = [None]
+
+        # pair the discount factors with the reward mappings, broadcasting a single value to every configuration
+        num_configs = max(len(discount_factors), len(reward_mappings))
+        if len(discount_factors) not in (1, num_configs) or len(reward_mappings) not in (1, num_configs):
+            raise ValueError("Mismatched number of discount factors and reward mappings: " +
+                             str(len(discount_factors)) + " and " + str(len(reward_mappings)))
+        discount_factors = np.broadcast_to(np.array(discount_factors, dtype=np.float64), num_configs).copy()
+
+        # reward of every state in every configuration, mapped from the cell types of the compact grid, so that
+        # environments without a grid of strings, such as raster and shared ones, can be solved too
+        cell_types = mdp.to_compact().cell_types.reshape(-1)
+        present_types = np.unique(cell_types).tolist()
+        rewards = np.empty((num_configs, num_states))
+        for config in range(num_configs):
+            reward_mapping = reward_mappings[config % len(reward_mappings)]
+            if reward_mapping is None:
+                rewards[config] = transition_model.rewards
+            else:
+                # only the cell types found in the grid need a reward
+                type_rewards = np.zeros(len(CELL_TYPES))
+                for cell_type in present_types:
+                    type_rewards[cell_type] = reward_mapping[CELL_TYPES[cell_type]]
+                rewards[config] = type_rewards[cell_types]
+
+        # initialize the utility of each state as 0 before the value iteration
+        utilities = np.zeros((num_configs, num_states))
+
+        # calculate change threshold for terminating the value iteration loop of each configuration
+        thresholds = error * (1 - discount_factors) / discount_factors
+
+        # configurations still being iterated, and the number of iterations each one took
+        active = np.arange(num_configs)
+        num_iters = np.zeros(num_configs, dtype=np.int64)
+
+        # iterate while some configuration has not met its terminating condition
+        while active.size > 0:
+            num_iters[active] += 1
+            active_utilities = utilities[active]
+
+            # expected utility of every action at every state, followed by the utility of the optimal action,
+            # for the active configurations only
+            action_utilities = transition_model.get_action_utilities(active_utilities)
+            updated_utilities = rewards[active] + discount_factors[active, None] * \
+                action_utilities.max(axis=1)
+
+            # walls always keep a utility of 0
+            updated_utilities[:, walls] = 0
+
+            # record change in utility of each configuration as a result of the step
+            max_utility_changes = np.abs(updated_utilities - active_utilities).max(axis=1)
+            utilities[active] = updated_utilities
+
+            # freeze the configurations whose change in utility is smaller than their change threshold
+            active = active[max_utility_changes >= thresholds[active]]
+
+        # get the optimal policy of every configuration, ties going to the action appearing first
+        actions = mdp.get_actions()
+        optimal_actions = transition_model.get_action_utilities(utilities).argmax(axis=1).tolist()
+        optimal_policies = []
+        for config in range(num_configs):
+            policy = [(1, 0) if wall else actions[optimal_action] for wall, optimal_action in zip(
+                walls.tolist(), optimal_actions[config])]
+            optimal_policies.append(transition_model.to_grid(policy))
+
+        # return the information to the caller
+        return {
+            "discount_factors": discount_factors.tolist(),
+            "num_iters": num_iters.tolist(),
+            "utilities": utilities.reshape(num_configs, transition_model.height, transition_model.width),
+            "optimal_policy": optimal_policies,
+            "num_backups": (num_iters * int((~walls).sum())).tolist()
+        }
+
+    def solve_mdp_gauss_seidel(self, mdp, error, initial_utilities=None, resume_from=None):
+        '''
+        Definition
+        __________
+
+        Solves the Markov Decision Process using Gauss-Seidel Value Iteration, where each sweep updates
+        the utilities in place so that later states in the sweep already see the updated values
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        error : float
+            The maximum acceptable error in utility value for each cell
+
+        initial_utilities : two-dimensional list or numpy array
+            The utility of each cell to start from, defaults to 0 at every cell
+
+        resume_from : Checkpoint
+            Checkpoint saved by an interrupted solve, to resume from with an identical result
+
+        '''
+
+        setup_start = time.perf_counter()
+        transition_model = self.get_transition_model(mdp)
+
+        # initialize the utility of each state as 0 before the value iteration, unless warm-started or resumed
+        utilities, num_iters = self.get_initial_state(mdp, initial_utilities, resume_from)
+
+        # calculate change threshold for terminating value iteration loop
+        threshold = error * (1 - self.discount_factor) / self.discount_factor
+
+        # order in which the non-wall states are updated during each sweep
+        sweep_order = np.array(self.get_sweep_order(mdp), dtype=np.int64)
+
+        # initilize analysis data for each cell
+        self.trace.start(mdp.get_grid_height(), mdp.get_grid_width())
+        self.trace.record(transition_model.scatter(utilities))
+        if self.monitor is not None:
+            self.monitor.start("value_iteration", transition_model, time.perf_counter() - setup_start)
+
+        # iterate while terminating condition is not met
+        while True:
+            num_iters += 1
+            sweep_start = time.perf_counter()
+
+            # update each state in place, in the chosen order, with the shared kernel
+            max_utility_change = kernels.gauss_seidel_sweep(
+                transition_model, utilities, self.discount_factor, sweep_order)
+
+            # record updated utilities for data analysis, walls staying at 0, and report the sweep
+            self.trace.record(transition_model.scatter(utilities))
+            if self.monitor is not None:
+                self.monitor.record_sweep(num_iters, max_utility_change, time.perf_counter() - sweep_start,
+                                          self.monitor.count_policy_changes(transition_model, utilities))
+
+            # if the change in utility across all cells is smaller than the change threshold, exit the loop
+            if max_utility_change < threshold:
+                break
+
+            # save the state of the solver every few sweeps, so that the solve can be resumed
+            if self.checkpoint is not None and self.checkpoint.is_due(num_iters):
+                self.checkpoint.save("value_iteration", mdp, transition_model.scatter(utilities), None, num_iters,
+                                     max_utility_change)
+
         # get the optimal policy based on final utility values
+        optimal_policy = self.get_optimal_policy_numpy(mdp, utilities)
+        if self.monitor is not None:
+            self.monitor.finish(num_iters, num_iters * len(sweep_order))
+
+        # return the information to the caller
+        return {
+            "num_iters": num_iters,
+            "utilities": transition_model.to_grid(transition_model.scatter(utilities)),
+            "optimal_policy": optimal_policy,
+            "num_backups": num_iters * len(sweep_order)
+        }
+
+    def solve_mdp_prioritized(self, mdp, error, initial_utilities=None, resume_from=None):
+        '''
+        Definition
+        __________
+
+        Solves the Markov Decision Process using prioritized sweeping, which repeatedly backs up the state with the
+        largest Bellman residual, and then refreshes the residuals of the states that can transition into it.
+        Terminates once every residual is below the same threshold as synchronous value iteration. The number of
+        iterations reported is the number of backups divided by the number of non-wall states, rounded up
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        error : float
+            The maximum acceptable error in utility value for each cell
+
+        initial_utilities : two-dimensional list or numpy array
+            The utility of each cell to start from, defaults to 0 at every cell
+
+        resume_from : Checkpoint
+            Checkpoint whose utilities are used as a warm start, since the priority queue itself is not saved
+
+        '''
+
+        transition_model = mdp.get_compiled_transition_model()
+        walls = transition_model.walls.tolist()
+        num_free_states = max(walls.count(False), 1)
+
+        # initialize the utility of each state as 0 before the value iteration, unless warm-started
+        utilities, num_iters = self.get_initial_state(mdp, initial_utilities, resume_from)
+        utilities = utilities.tolist()
+
+        # calculate change threshold for terminating value iteration loop
+        threshold = error * (1 - self.discount_factor) / self.discount_factor
+
+        # initilize analysis data for each cell
+        self.trace.start(mdp.get_grid_height(), mdp.get_grid_width())
+        self.trace.record(utilities)
+
+        if self.monitor is not None:
+            self.monitor.start("value_iteration", transition_model)
+
+        # every non-wall state starts in the priority queue
+        num_backups = self.run_prioritized_sweeping(mdp, utilities, [state for state in range(
+            transition_model.num_states) if not walls[state]], threshold, num_iters)
+
+        # convert the utilities back into a grid, and get the optimal policy based on final utility values
+        utilities = transition_model.to_grid(utilities)
         optimal_policy = self.get_optimal_policy(mdp, utilities)
+        if self.monitor is not None:
+            self.monitor.finish(num_iters + math.ceil(num_backups / num_free_states), num_backups)
+
+        # return the information to the caller
+        return {
+            "num_iters": num_iters + math.ceil(num_backups / num_free_states),
+            "utilities": utilities,
+            "optimal_policy": optimal_policy,
+            "num_backups": num_backups
+        }
+
+    def solve_mdp_topological(self, mdp, error, initial_utilities=None, resume_from=None):
+        '''
+        Definition
+        __________
+
+        Solves the Markov Decision Process one strongly connected component of its transition graph at a time, such
+        as the regions separated by walls. Components are solved in reverse topological order, each with in-place
+        sweeps over its own states until its largest change in utility is below the same threshold as synchronous
+        value iteration, so that the components it transitions into have already settled and a component is never
+        swept again once solved. The number of iterations reported is the number of backups divided by the number
+        of non-wall states, rounded up. The trace records the utilities once per component
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        error : float
+            The maximum acceptable error in utility value for each cell
+
+        initial_utilities : two-dimensional list or numpy array
+            The utility of each cell to start from, defaults to 0 at every cell
+
+        resume_from : Checkpoint
+            Checkpoint whose utilities are used as a warm start
+
+        '''
+
+        setup_start = time.perf_counter()
+        transition_model = self.get_transition_model(mdp)
+        component_indptr, component_states = transition_model.get_components()
+        num_free_states = max(component_states.size, 1)
+
+        # initialize the utility of each state as 0 before the value iteration, unless warm-started
+        utilities, num_iters = self.get_initial_state(mdp, initial_utilities, resume_from)
+
+        # calculate change threshold for terminating the value iteration loop of each component
+        threshold = error * (1 - self.discount_factor) / self.discount_factor
+
+        # order the states inside each component by their position in the chosen sweep order
+        if self.sweep_order != "row_major":
+            ranks = np.zeros(transition_model.num_states, dtype=np.int64)
+            ranks[np.array(self.get_sweep_order(mdp), dtype=np.int64)] = np.arange(component_states.size)
+            component_states = component_states.copy()
+            for component in range(component_indptr.size - 1):
+                states = component_states[component_indptr[component]:component_indptr[component + 1]]
+                states[:] = states[np.argsort(ranks[states])]
+
+        # initilize analysis data for each cell
+        self.trace.start(mdp.get_grid_height(), mdp.get_grid_width())
+        self.trace.record(transition_model.scatter(utilities))
+        if self.monitor is not None:
+            self.monitor.start("value_iteration", transition_model, time.perf_counter() - setup_start)
+
+        # solve every component to convergence, after the components it transitions into
+        num_backups = 0
+        for component in range(component_indptr.size - 1):
+            component_start = time.perf_counter()
+            states = component_states[component_indptr[component]:component_indptr[component + 1]]
+
+            # sweep the states of the component in place with the shared kernel, until they settle
+            num_component_sweeps, max_utility_change = kernels.solve_component(
+                transition_model, utilities, self.discount_factor, states, threshold)
+            num_backups += num_component_sweeps * states.size
+
+            # record the utilities for data analysis, and report the component
+            self.trace.record(transition_model.scatter(utilities))
+            if self.monitor is not None:
+                self.monitor.record_sweep(num_iters + math.ceil(num_backups / num_free_states), max_utility_change,
+                                          time.perf_counter() - component_start, component=component,
+                                          num_component_states=int(states.size),
+                                          num_component_sweeps=num_component_sweeps)
+
+        # get the optimal policy based on final utility values
+        num_iters += math.ceil(num_backups / num_free_states)
+        optimal_policy = self.get_optimal_policy_numpy(mdp, utilities)
+        if self.monitor is not None:
+            self.monitor.finish(num_iters, num_backups)
 
         # return the information to the caller
         return {
             "num_iters": num_iters,
+            "utilities": transition_model.to_grid(transition_model.scatter(utilities)),
+            "optimal_policy": optimal_policy,
+            "num_backups": num_backups
+        }
+
+    def solve_mdp_incremental(self, mdp, error, previous_result, changed_states=None):
+        '''
+        Definition
+        __________
+
+        Re-solves the Markov Decision Process after some of its cells have been changed with Environment.set_cell(),
+        starting from the utilities of a previous result. Only the changed states are backed up at first, and the
+        changes are propagated outward through prioritized sweeping, so that regions whose utilities do not move by
+        more than the threshold are never touched. The number of iterations reported is the number of backups
+        divided by the number of non-wall states, rounded up
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        error : float
+            The maximum acceptable error in utility value for each cell
+
+        previous_result : dict
+            The result of a previous solve of the same environment, before its cells were changed
+
+        changed_states : list
+            Flat indices of the states affected by the changes, defaults to mdp.pop_changed_states()
+
+        '''
+
+        if self.prune_unreachable:
+            raise ValueError("Pruning unreachable states is not supported by incremental solves")
+        if changed_states is None:
+            changed_states = mdp.pop_changed_states()
+
+        transition_model = mdp.get_compiled_transition_model()
+        walls = transition_model.walls.tolist()
+        num_free_states = max(walls.count(False), 1)
+
+        # warm start from the previous utilities, cells which have become walls dropping to 0
+        utilities, num_iters = self.get_initial_state(mdp, previous_result["utilities"])
+        utilities = utilities.tolist()
+
+        # calculate change threshold for terminating value iteration loop
+        threshold = error * (1 - self.discount_factor) / self.discount_factor
+
+        # initilize analysis data for each cell
+        self.trace.start(mdp.get_grid_height(), mdp.get_grid_width())
+        self.trace.record(utilities)
+
+        if self.monitor is not None:
+            self.monitor.start("value_iteration", transition_model)
+
+        # only the changed states start in the priority queue
+        num_backups = self.run_prioritized_sweeping(mdp, utilities, [state for state in sorted(
+            changed_states) if not walls[state]], threshold)
+
+        # convert the utilities back into a grid, and get the optimal policy based on final utility values
+        utilities = transition_model.to_grid(utilities)
+        optimal_policy = self.get_optimal_policy(mdp, utilities)
+        if self.monitor is not None:
+            self.monitor.finish(math.ceil(num_backups / num_free_states), num_backups)
+
+        # return the information to the caller
+        return {
+            "num_iters": math.ceil(num_backups / num_free_states),
             "utilities": utilities,
-            "optimal_policy": optimal_policy
+            "optimal_policy": optimal_policy,
+            "num_backups": num_backups
         }
 
+    def run_prioritized_sweeping(self, mdp, utilities, states, threshold, num_iters=0):
+        '''
+        Definition
+        __________
+
+        Runs prioritized sweeping in place on a flat list of utilities. The given states are queued with their
+        Bellman residual, then the state with the largest residual is repeatedly backed up, and the residuals of
+        the states that can transition into it are refreshed, until every queued residual is below the threshold.
+        Records the utilities, and reports to the monitor, once every sweep-equivalent of backups, and records them
+        once more at the end. Returns the number of backups
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        utilities : list
+            The utility value of each flat state, updated in place
+
+        states : list
+            Flat indices of the non-wall states to queue initially
+
+        threshold : float
+            Residual below which a state is not backed up
+
+        num_iters : int
+            Number of iterations carried out before, to number the sweep-equivalents reported to the monitor
+
+        '''
+
+        transition_model = mdp.get_compiled_transition_model()
+        predecessor_indptr, predecessor_states = transition_model.get_predecessors()
+        predecessor_indptr = predecessor_indptr.tolist()
+        predecessor_states = predecessor_states.tolist()
+        rewards = transition_model.rewards.tolist()
+        walls = transition_model.walls.tolist()
+        num_free_states = max(walls.count(False), 1)
+
+        # the priority queue holds (-residual, state) entries, with residuals kept up to date in a separate list
+        # so that entries superseded by a later push can be skipped when popped
+        residuals = [0 for state in range(transition_model.num_states)]
+        priority_queue = []
+        for state in states:
+            residuals[state] = abs(rewards[state] + self.discount_factor *
+                                   self.get_state_backup(mdp, utilities, state) - utilities[state])
+            if residuals[state] >= threshold:
+                priority_queue.append((-residuals[state], state))
+        heapq.heapify(priority_queue)
+
+        # back up states in order of decreasing residual until every residual is below the threshold
+        num_backups = 0
+        sweep_start = time.perf_counter()
+        while priority_queue:
+            negative_residual, state = heapq.heappop(priority_queue)
+            if -negative_residual != residuals[state]:
+                continue
+
+            utilities[state] = rewards[state] + self.discount_factor * \
+                self.get_state_backup(mdp, utilities, state)
+            residuals[state] = 0
+            num_backups += 1
+
+            # refresh the residuals of the states whose backup depends on the updated state
+            for k in range(predecessor_indptr[state], predecessor_indptr[state + 1]):
+                predecessor = predecessor_states[k]
+                residual = abs(rewards[predecessor] + self.discount_factor *
+                               self.get_state_backup(mdp, utilities, predecessor) - utilities[predecessor])
+                if residual != residuals[predecessor]:
+                    residuals[predecessor] = residual
+                    if residual >= threshold:
+                        heapq.heappush(priority_queue, (-residual, predecessor))
+
+            # record utilities for data analysis once every sweep-equivalent of backups, and report the largest
+            # residual still queued
+            if num_backups % num_free_states == 0:
+                self.trace.record(utilities)
+                if self.monitor is not None:
+                    self.monitor.record_sweep(num_iters + num_backups // num_free_states,
+                                              -priority_queue[0][0] if priority_queue else 0,
+                                              time.perf_counter() - sweep_start,
+                                              self.monitor.count_policy_changes(transition_model, utilities))
+                    sweep_start = time.perf_counter()
+
+        # record the final utilities for data analysis
+        self.trace.record(utilities)
+
+        return num_backups
+
+    def get_sweep_order(self, mdp):
+        '''
+        Definition
+        __________
+
+        Returns the non-wall states in the order in which a Gauss-Seidel sweep updates them. For the 'goal_distance'
+        order, states are sorted by increasing BFS distance from the goal ('G') cells along reversed transitions,
+        so that utility flows outward from the goals within a single sweep; unreachable states come last
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        '''
+
+        transition_model = self.get_transition_model(mdp)
+        walls = transition_model.walls.tolist()
+        row_major_order = [state for state in range(
+            transition_model.num_states) if not walls[state]]
+
+        if self.sweep_order == "row_major":
+            return row_major_order
+
+        # breadth first search from every goal cell at once, over the predecessor index
+        predecessor_indptr, predecessor_states = transition_model.get_predecessors()
+        predecessor_indptr = predecessor_indptr.tolist()
+        predecessor_states = predecessor_states.tolist()
+        goal_cells = transition_model.gather(mdp.to_compact().cell_types.reshape(-1) == CELL_TYPES.index("G"))
+        goal_cells = goal_cells.tolist()
+        goal_states = [state for state in row_major_order if goal_cells[state]]
+        visited = set(goal_states)
+        sweep_order = []
+        queue = deque(goal_states)
+        while queue:
+            state = queue.popleft()
+            sweep_order.append(state)
+            for k in range(predecessor_indptr[state], predecessor_indptr[state + 1]):
+                predecessor = predecessor_states[k]
+                if predecessor not in visited:
+                    visited.add(predecessor)
+                    queue.append(predecessor)
+
+        # states which cannot reach any goal are updated last, in row major order
+        sweep_order.extend(
+            state for state in row_major_order if state not in visited)
+        return sweep_order
+
+    def get_state_backup(self, mdp, utilities, state):
+        '''
+        Definition
+        __________
+
+        Returns the expected utility of the optimal action at a single state, max over a of sum over s' of
+        P(s'|s,a) * U(s')
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        utilities : list
+            The utility value of each flat state
+
+        state : int
+            The flat index of the state to back up
+
+        '''
+
+        return kernels.state_backup(mdp.get_compiled_transition_model(), utilities, state)
+
+    def get_optimal_policy_numpy(self, mdp, utilities):
+        '''
+        Definition
+        __________
+
+        Returns the greedy optimal policy based on a flat array of utility values.
+        Ties are broken in favour of the action appearing first in the list of actions
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
+
+        utilities : one-dimensional numpy array
+            The utility value of each flat state
+
+        '''
+
+        transition_model = self.get_transition_model(mdp)
+        actions = mdp.get_actions()
+
+        # index of the optimal action at every state, computed by the shared kernel
+        optimal_actions = transition_model.scatter(kernels.get_greedy_actions(
+            transition_model, np.asarray(utilities, dtype=np.float64)), fill=-1).tolist()
+
+        # walls, and the cells left out of a pruned transition model, keep the default policy of going down
+        policy = [(1, 0) if optimal_action < 0 else actions[optimal_action]
+                  for optimal_action in optimal_actions]
+
+        # return the optimal policy to the caller
+        return transition_model.to_grid(policy)
+
     def get_optimal_policy(self, mdp, utilities):
         '''
         Definition
@@ -190,49 +1212,36 @@ class ValueIteration:
 
         '''
 
-        # initialize the policy to go down at all cells
-        policy = [[(1, 0) for col in range(mdp.get_grid_width())]
-                  for row in range(mdp.get_grid_height())]
-
-        # iterate over all cells to determine policy
-        for row in range(mdp.get_grid_height()):
-            for col in range(mdp.get_grid_width()):
+        # flatten the utilities, and extract the policy with the shared kernel
+        return self.get_optimal_policy_numpy(mdp, self.get_transition_model(mdp).gather(
+            np.array(utilities, dtype=np.float64).reshape(-1)))
 
-                # if the current cell is not a wall, only then process it
-                if not mdp.is_wall(row, col):
-
-                    # initialize optimal action and corresponding optimal utility
-                    optimal_action = None
-                    optimal_action_utility = float("-inf")
+    def get_q_values(self, mdp, utilities):
+        '''
+        Definition
+        __________
 
-                    # iterate over all the actions
-                    for curr_action in mdp.get_actions():
+        Returns the Q-value of every action at every cell, R(s) + γ * sum over s' of P(s'|s,a) * U(s'), computed from
+        the utility values in one pass by the shared kernel, as a numpy array indexed as [action_index, row, col] in
+        the order of mdp.get_actions(). Walls, and the cells left out of a pruned transition model, get NaN.
+        kernels.get_action_gaps() turns it into the action gap of every cell
 
-                        # initiallize utility of current action to 0
-                        curr_action_utility = 0
 
-                        # retrieve the transition model: P(s'|s,a)
-                        transition_model = mdp.get_transition_model(
-                            row, col, curr_action)
+        Parameters
+        __________
 
-                        # iterate through each new state in the transition model
-                        # the robot can be in a state different than the intended one due to the nature of the transition model
-                        for new_state in transition_model:
-                            transition_probability = transition_model[new_state]
-                            transition_utility = utilities[new_state[0]
-                                                           ][new_state[1]]
+        mdp : Environment
+            The environment of the Markov Decision Process to solve, which specifies the transition model etc
 
-                            # add the utility of transition multiplied by the probability of that transition happening
-                            curr_action_utility += transition_probability * transition_utility
+        utilities : two-dimensional list
+            The utility value of each cell in the grid
 
-                        # if utility of current action is more than the best one so far
-                        # then the current action is the optimal action so far
-                        if curr_action_utility > optimal_action_utility:
-                            optimal_action = curr_action
-                            optimal_action_utility = curr_action_utility
+        '''
 
-                    # record the most optimal action for the current cell
-                    policy[row][col] = optimal_action
+        transition_model = self.get_transition_model(mdp)
+        flat_utilities = transition_model.gather(np.array(utilities, dtype=np.float64).reshape(-1))
+        q_values = kernels.get_q_values(transition_model, flat_utilities, self.discount_factor)
 
-        # return the optimal policy to the caller
-        return policy
+        # scatter the Q-values of each action back to the grid, the cells left out of a pruned model getting NaN
+        return np.array([transition_model.scatter(action_q_values, fill=np.nan) for action_q_values in q_values]) \
+            .reshape(transition_model.num_actions, transition_model.height, transition_model.width)
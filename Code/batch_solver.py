@@ -0,0 +1,340 @@
+import itertools
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+from algorithms.value_iteration import ValueIteration
+from algorithms.policy_iteration import PolicyIteration
+from compact_grid import CompactGrid
+from environment import Environment
+from trace_recorder import TraceRecorder
+from transition_model import TransitionModel
+
+# cell types shared with the workers as a uint8 raster, instead of pickling the grid of strings
+CELL_TYPES = Environment.CELL_TYPES
+
+# shared memory blocks already attached by the current worker process, keyed by block name
+attached_environments = {}
+
+
+class SharedEnvironment(Environment):
+
+    '''
+    Definition
+    __________
+
+    Environment rebuilt inside a worker process from the compiled transition model and cell types held in shared
+    memory, without access to the original grid of strings
+
+
+    Class Attributes
+    ________________
+
+    cell_types : two-dimensional numpy array
+        Index of the type of each cell in CELL_TYPES
+
+
+    Methods
+    _______
+
+    is_wall(row, col) : Returns whether the specified cell is a wall or not
+
+    is_goal(row, col) : Returns whether the specified cell is a goal ('G') or not
+
+    get_walls() : Returns the wall bitmap of the grid
+
+    get_reward(row, col) : Returns the reward for a particular cell in the grid
+
+    to_compact() : Returns the cell types and the compiled rewards as a CompactGrid
+
+    '''
+
+    def __init__(self, transition_model, cell_types):
+        '''
+        Definition
+        __________
+
+        Initializes the SharedEnvironment class
+
+
+        Parameters
+        __________
+
+        transition_model : TransitionModel
+            The compiled transition model, backed by shared memory
+
+        cell_types : two-dimensional numpy array
+            Index of the type of each cell in CELL_TYPES, backed by shared memory
+
+        '''
+
+        super().__init__(None, transition_model.height, transition_model.width,
+                         transition_model.actions, None)
+        self.cell_types = cell_types
+        self.compiled_transition_model = transition_model
+
+    def get_reward(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns the reward for a particular cell in the grid
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        '''
+
+        return float(self.compiled_transition_model.rewards[row * self.width + col])
+
+    def is_wall(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns whether the specified cell is a wall or not
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        '''
+
+        return self.cell_types[row, col] == CELL_TYPES.index("wall")
+
+    def is_goal(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns whether the specified cell is a goal ('G') or not
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        '''
+
+        return self.cell_types[row, col] == CELL_TYPES.index("G")
+
+    def get_walls(self):
+        '''
+        Definition
+        __________
+
+        Returns the wall bitmap of the grid, as a two-dimensional boolean numpy array
+
+        '''
+
+        return self.cell_types == CELL_TYPES.index("wall")
+
+    def to_compact(self):
+        '''
+        Definition
+        __________
+
+        Returns the cell types held in shared memory and the rewards of the compiled transition model as a
+        CompactGrid, built on first use
+
+        '''
+
+        if self.compact is None:
+            self.compact = CompactGrid(self.cell_types, self.compiled_transition_model.rewards.reshape(
+                self.height, self.width))
+        return self.compact
+
+
+def share_environment(mdp):
+    '''
+    Definition
+    __________
+
+    Compiles the transition model of an environment and copies its arrays, along with the cell types, into a
+    single shared memory block. Returns the block and a small picklable description of its layout
+
+
+    Parameters
+    __________
+
+    mdp : Environment
+        The environment to share with the worker processes
+
+    '''
+
+    transition_model = mdp.get_compiled_transition_model()
+    cell_types = mdp.to_compact().cell_types
+    arrays = {
+        "indptr": transition_model.indptr,
+        "indices": transition_model.indices,
+        "probabilities": transition_model.probabilities,
+        "rewards": transition_model.rewards,
+        "walls": transition_model.walls,
+        "cell_types": cell_types
+    }
+
+    # lay the arrays out one after the other, each aligned on 8 bytes
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = (offset, array.dtype.str, array.shape)
+        offset += array.nbytes + (-array.nbytes % 8)
+
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for name, array in arrays.items():
+        start, dtype, shape = layout[name]
+        np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=start)[...] = array
+
+    description = {
+        "name": block.name,
+        "layout": layout,
+        "height": transition_model.height,
+        "width": transition_model.width,
+        "actions": transition_model.actions
+    }
+    return block, description
+
+
+def attach_environment(description):
+    '''
+    Definition
+    __________
+
+    Attaches to a shared memory block created by share_environment() and returns the SharedEnvironment it holds.
+    Attachments are cached, so each worker process maps each block once
+
+
+    Parameters
+    __________
+
+    description : dict
+        Layout of the shared memory block, as returned by share_environment()
+
+    '''
+
+    name = description["name"]
+    if name not in attached_environments:
+        block = shared_memory.SharedMemory(name=name)
+
+        arrays = {}
+        for array_name, (start, dtype, shape) in description["layout"].items():
+            arrays[array_name] = np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=start)
+
+        transition_model = TransitionModel(description["height"], description["width"], description["actions"],
+                                           arrays["indptr"], arrays["indices"], arrays["probabilities"],
+                                           arrays["rewards"], arrays["walls"])
+        attached_environments[name] = (block, SharedEnvironment(transition_model, arrays["cell_types"]))
+
+    return attached_environments[name][1]
+
+
+def solve_job(description, config):
+    '''
+    Definition
+    __________
+
+    Solves one environment with one solver configuration inside a worker process, and returns the result
+
+
+    Parameters
+    __________
+
+    description : dict
+        Layout of the shared memory block holding the environment
+
+    config : dict
+        Solver configuration - 'algorithm' ('value_iteration' or 'policy_iteration'), 'error' for value iteration,
+        and any keyword argument of the solver's constructor. Tracing is off unless 'trace' is given
+
+    '''
+
+    mdp = attach_environment(description)
+    solver_args = dict(config)
+    algorithm = solver_args.pop("algorithm", "value_iteration")
+    solver_args.setdefault("trace", TraceRecorder("off"))
+
+    start = time.perf_counter()
+    if algorithm == "value_iteration":
+        error = solver_args.pop("error")
+        result = ValueIteration(**solver_args).solve_mdp(mdp, error)
+    else:
+        result = PolicyIteration(**solver_args).solve_mdp(mdp)
+    result["solve_time"] = time.perf_counter() - start
+
+    return result
+
+
+def solve_batch(environments, configs, max_workers=None):
+    '''
+    Definition
+    __________
+
+    Solves every environment with every solver configuration across a pool of worker processes, and yields
+    (environment index, config index, result) tuples as soon as each solve completes. The compiled transition
+    model of each environment is passed to the workers through shared memory rather than by pickling the grid.
+    Closing the generator early cancels the solves which have not started yet
+
+
+    Parameters
+    __________
+
+    environments : iterable of Environment
+        The environments to solve
+
+    configs : iterable of dict
+        Solver configurations, see solve_job()
+
+    max_workers : int
+        Number of worker processes, defaults to the number of CPUs
+
+    '''
+
+    environments = list(environments)
+    configs = list(configs)
+
+    blocks, descriptions = [], []
+    executor = None
+    try:
+        for mdp in environments:
+            block, description = share_environment(mdp)
+            blocks.append(block)
+            descriptions.append(description)
+
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        futures = {}
+        for environment_index, config_index in itertools.product(range(len(environments)), range(len(configs))):
+            future = executor.submit(
+                solve_job, descriptions[environment_index], configs[config_index])
+            futures[future] = (environment_index, config_index)
+
+        # stream results back in completion order
+        for future in as_completed(futures):
+            environment_index, config_index = futures[future]
+            yield environment_index, config_index, future.result()
+    finally:
+        # a caller breaking out of the loop or closing the generator only waits for the solves already running, the
+        # queued ones being cancelled, before the shared memory they read is unlinked
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        for block in blocks:
+            block.close()
+            block.unlink()
@@ -0,0 +1,474 @@
+# import the required files to run the benchmarks
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+from algorithms.value_iteration import ValueIteration
+from algorithms.policy_iteration import PolicyIteration
+from algorithms.multigrid_value_iteration import MultigridValueIteration
+from algorithms.parallel_value_iteration import ParallelValueIteration
+from algorithms import kernels
+from environment import Environment
+from trace_recorder import TraceRecorder
+
+# rewards of each cell type, as in complex_constants
+REWARD_MAPPING = {
+    'wall': 0,
+    'G': 1,
+    'B': -1,
+    '': -0.04
+}
+
+# solver configurations timed by the benchmark, as (constructor, keyword arguments, whether it takes an error).
+# A 'kernel_backend' argument selects the implementation of algorithms.kernels for the case, a 'buffer_directory'
+# argument is replaced by a temporary directory, and a 'num_workers' argument by each worker count benchmarked
+SOLVERS = {
+    "value_iteration_kernel": (ValueIteration, {"backend": "kernel"}, True),
+    "value_iteration_kernel_numpy": (ValueIteration, {"backend": "kernel", "kernel_backend": "numpy"}, True),
+    "value_iteration_numpy": (ValueIteration, {"backend": "numpy"}, True),
+    "value_iteration_memmap": (ValueIteration, {"backend": "numpy", "buffer_directory": None}, True),
+    "parallel_value_iteration": (ParallelValueIteration, {"num_workers": None}, True),
+    "value_iteration_gauss_seidel": (ValueIteration, {"mode": "gauss_seidel"}, True),
+    "value_iteration_prioritized": (ValueIteration, {"mode": "prioritized"}, True),
+    "value_iteration_topological": (ValueIteration, {"mode": "topological"}, True),
+    "multigrid_value_iteration": (MultigridValueIteration, {}, True),
+    "policy_iteration_iterative": (PolicyIteration, {"evaluation": "iterative"}, False),
+    "policy_iteration_modified": (PolicyIteration, {"evaluation": "modified"}, False),
+    "policy_iteration_exact": (PolicyIteration, {"evaluation": "exact"}, False),
+    "policy_iteration_bicgstab": (PolicyIteration, {"evaluation": "exact", "linear_solver": "bicgstab"}, False)
+}
+
+# former names of solver configurations, so that older reports can still be compared
+SOLVER_ALIASES = {"value_iteration_python": "value_iteration_kernel"}
+
+# metrics compared against the baseline, where a larger value is a regression
+COMPARED_METRICS = ("solve_time", "peak_memory")
+
+
+def generate_grid(size, wall_density=0.25, goal_density=0.15, bad_density=0.15, seed=0):
+    '''
+    Definition
+    __________
+
+    Returns a random square grid along with its rewards, drawing the type of each cell the same way as
+    complex_constants but from a seeded generator, so that every run benchmarks the same grid
+
+
+    Parameters
+    __________
+
+    size : int
+        Number of rows and columns of the grid
+
+    wall_density : float
+        Probability of a cell being a wall
+
+    goal_density : float
+        Probability of a cell being a goal ('G')
+
+    bad_density : float
+        Probability of a cell being a bad cell ('B')
+
+    seed : int
+        Seed of the random generator
+
+    '''
+
+    if wall_density + goal_density + bad_density > 1:
+        raise ValueError("Unknown cell densities: " + str((wall_density, goal_density, bad_density)))
+
+    generator = random.Random(seed)
+    grid = []
+    for row in range(size):
+        grid_row = []
+        for col in range(size):
+            random_num = generator.uniform(0, 1)
+            if random_num <= wall_density:
+                grid_row.append("wall")
+            elif random_num <= wall_density + goal_density:
+                grid_row.append("G")
+            elif random_num <= wall_density + goal_density + bad_density:
+                grid_row.append("B")
+            else:
+                grid_row.append("")
+        grid.append(grid_row)
+
+    rewards = [[REWARD_MAPPING[cell] for cell in grid_row] for grid_row in grid]
+    return grid, rewards
+
+
+def run_case(solver_name, size, wall_density, seed, goal_density=0.15, bad_density=0.15, discount_factor=0.99,
+             error=0.1, num_policy_eval_iters=100, repeats=5, num_workers=None):
+    '''
+    Definition
+    __________
+
+    Solves one random grid with one solver configuration, and returns its measurements as a dictionary. The wall
+    time is the best of the repeats, the slowest one being kept as a measure of noise, and peak memory is the
+    largest amount allocated through python and numpy during a solve, the environment itself excluded
+
+
+    Parameters
+    __________
+
+    solver_name : string
+        Key of the solver configuration in SOLVERS
+
+    size : int
+        Number of rows and columns of the grid
+
+    wall_density : float
+        Probability of a cell being a wall
+
+    seed : int
+        Seed of the random generator
+
+    goal_density : float
+        Probability of a cell being a goal ('G')
+
+    bad_density : float
+        Probability of a cell being a bad cell ('B')
+
+    discount_factor : float
+        Factor with which future rewards are to be discounted
+
+    error : float
+        The maximum acceptable error in utility value for each cell, for the value iteration solvers
+
+    num_policy_eval_iters : int
+        Number of policy evaluation sweeps, for the policy iteration solvers
+
+    repeats : int
+        Number of timed solves
+
+    num_workers : int
+        Number of worker processes of the solvers which take one, defaults to the number of CPUs
+
+    '''
+
+    if solver_name not in SOLVERS:
+        raise ValueError("Unknown solver: " + str(solver_name))
+    solver_class, solver_args, takes_error = SOLVERS[solver_name]
+    solver_args = dict(solver_args)
+    kernel_backend = solver_args.pop("kernel_backend", kernels.KERNEL_BACKEND)
+    if "num_workers" in solver_args:
+        solver_args["num_workers"] = num_workers or os.cpu_count() or 1
+
+    grid, rewards = generate_grid(size, wall_density, goal_density, bad_density, seed)
+    actions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    mdp = Environment(grid, size, size, actions, rewards)
+
+    # the transition model is compiled once per environment, so it is timed on its own
+    start = time.perf_counter()
+    mdp.get_compiled_transition_model()
+    compile_time = time.perf_counter() - start
+
+    def solve():
+        if solver_class is PolicyIteration:
+            solver = PolicyIteration(discount_factor, num_policy_eval_iters, trace=TraceRecorder("off"),
+                                     **solver_args)
+        else:
+            solver = solver_class(discount_factor, trace=TraceRecorder("off"), **solver_args)
+        return solver.solve_mdp(mdp, error) if takes_error else solver.solve_mdp(mdp)
+
+    # the memory-mapped utilities are kept in a temporary directory, and the kernels are switched to the backend of
+    # the case until it is measured
+    temporary_directory = None
+    if "buffer_directory" in solver_args:
+        temporary_directory = tempfile.TemporaryDirectory()
+        solver_args["buffer_directory"] = temporary_directory.name
+    previous_kernel_backend = kernels.set_kernel_backend(kernel_backend)
+    try:
+        # untimed solve, which compiles the kernels and builds the cached arrays of the transition model, so that
+        # neither counts towards the time or memory of the solves measured afterwards
+        solve()
+        tracemalloc.start()
+        result = solve()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        solve_times = []
+        for _ in range(max(int(repeats), 1)):
+            start = time.perf_counter()
+            result = solve()
+            solve_times.append(time.perf_counter() - start)
+        solve_time = min(solve_times)
+    finally:
+        kernels.set_kernel_backend(previous_kernel_backend)
+        if temporary_directory is not None:
+            temporary_directory.cleanup()
+
+    case = {
+        "solver": solver_name,
+        "size": size,
+        "wall_density": wall_density,
+        "goal_density": goal_density,
+        "bad_density": bad_density,
+        "seed": seed,
+        "num_states": size * size,
+        "compile_time": compile_time,
+        "solve_time": solve_time,
+        "solve_time_max": max(solve_times),
+        "num_iters": result["num_iters"],
+        "num_backups": result["num_backups"],
+        "backups_per_second": result["num_backups"] / solve_time if solve_time > 0 else float("inf"),
+        "peak_memory": peak_memory,
+        "kernel_backend": kernel_backend
+    }
+    if "num_workers" in solver_args:
+        case["num_workers"] = solver_args["num_workers"]
+    return case
+
+
+def get_case_key(case):
+    '''
+    Definition
+    __________
+
+    Returns the key identifying a case across reports, followed by the number of workers for the solvers which
+    take one. Reports written before the goal and bad cell densities could be changed used the default densities,
+    and solvers renamed since are keyed by their current name
+
+
+    Parameters
+    __________
+
+    case : dict
+        Measurements of a case, as returned by run_case()
+
+    '''
+
+    key = [SOLVER_ALIASES.get(case["solver"], case["solver"]), str(case["size"]), str(case["wall_density"]),
+           str(case.get("goal_density", 0.15)), str(case.get("bad_density", 0.15)), str(case["seed"])]
+    if "num_workers" in case:
+        key.append(str(case["num_workers"]) + "_workers")
+    return "/".join(key)
+
+
+def run_benchmarks(solver_names, sizes, wall_densities, seeds, goal_densities=(0.15,), bad_densities=(0.15,),
+                   repeats=5, max_states=None, log=None, worker_counts=(None,)):
+    '''
+    Definition
+    __________
+
+    Runs every combination of solver, grid size, wall, goal and bad cell density and seed, and returns the report
+    as a dictionary holding the environment of the run and the measurements of each case
+
+
+    Parameters
+    __________
+
+    solver_names : iterable of string
+        Keys of the solver configurations in SOLVERS
+
+    sizes : iterable of int
+        Numbers of rows and columns of the grids
+
+    wall_densities : iterable of float
+        Probabilities of a cell being a wall
+
+    seeds : iterable of int
+        Seeds of the random generator
+
+    goal_densities : iterable of float
+        Probabilities of a cell being a goal ('G')
+
+    bad_densities : iterable of float
+        Probabilities of a cell being a bad cell ('B')
+
+    repeats : int
+        Number of timed solves of each case
+
+    max_states : dict
+        Largest number of states each solver is run on, keyed by solver name, for the solvers too slow for the
+        larger grids
+
+    log : file
+        Stream to report the progress to, or None
+
+    worker_counts : iterable of int
+        Numbers of worker processes the solvers which take one are run with, None standing for the number of CPUs
+
+    '''
+
+    max_states = max_states or {}
+    cases = []
+    for solver_name in solver_names:
+
+        # only the solvers which take a number of workers are run with each worker count
+        solver_worker_counts = worker_counts if "num_workers" in SOLVERS[solver_name][1] else (None,)
+        for size in sizes:
+            if size * size > max_states.get(solver_name, float("inf")):
+                continue
+            for wall_density, goal_density, bad_density, seed, num_workers in itertools.product(
+                    wall_densities, goal_densities, bad_densities, seeds, solver_worker_counts):
+                case = run_case(solver_name, size, wall_density, seed, goal_density, bad_density,
+                                repeats=repeats, num_workers=num_workers)
+                cases.append(case)
+                if log is not None:
+                    log.write("{:<64} {:>10.4f}s {:>8} iters {:>14.0f} backups/s\n".format(
+                        get_case_key(case), case["solve_time"], str(case["num_iters"]), case["backups_per_second"]))
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "kernel_backend": kernels.KERNEL_BACKEND,
+            "machine": platform.machine(),
+            "processor": platform.processor()
+        },
+        "cases": cases
+    }
+
+
+def compare_reports(report, baseline, tolerance=0.25, min_time_difference=0.05):
+    '''
+    Definition
+    __________
+
+    Compares a report with a baseline report, and returns a list of dictionaries, one per case found in both, each
+    holding the ratio of every compared metric to its baseline value and whether it regressed by more than the
+    tolerance. Timings are noisy, so the solve time only counts as a regression when it is also slower than the
+    slowest repeat of the baseline, and by at least min_time_difference seconds, the timings of the fastest cases
+    being mostly scheduling and cache noise. Cases whose number of iterations changed are flagged too, since the
+    solvers are deterministic
+
+
+    Parameters
+    __________
+
+    report : dict
+        Report returned by run_benchmarks()
+
+    baseline : dict
+        Report to compare against
+
+    tolerance : float
+        Relative increase of a metric above which it counts as a regression
+
+    min_time_difference : float
+        Increase in solve time, in seconds, below which the solve time never counts as a regression
+
+    '''
+
+    baseline_cases = {get_case_key(case): case for case in baseline["cases"]}
+    comparisons = []
+    for case in report["cases"]:
+        baseline_case = baseline_cases.get(get_case_key(case))
+        if baseline_case is None:
+            continue
+
+        comparison = {"case": get_case_key(case), "regressions": []}
+        for metric in COMPARED_METRICS:
+            ratio = case[metric] / baseline_case[metric] if baseline_case[metric] else float("inf")
+            comparison[metric + "_ratio"] = ratio
+            if ratio > 1 + tolerance and (metric != "solve_time" or (
+                    case[metric] > baseline_case["solve_time_max"] and
+                    case[metric] - baseline_case[metric] >= min_time_difference)):
+                comparison["regressions"].append(metric)
+        if case["num_iters"] != baseline_case["num_iters"]:
+            comparison["regressions"].append("num_iters")
+        comparisons.append(comparison)
+
+    return comparisons
+
+
+def parse_args(argv=None):
+    '''
+    Definition
+    __________
+
+    Parses the command line arguments
+
+
+    Parameters
+    __________
+
+    argv : list
+        Command line arguments, defaults to sys.argv[1:]
+
+    '''
+
+    parser = argparse.ArgumentParser(description="Benchmark the solvers on random grids")
+    parser.add_argument("--solvers", nargs="+", choices=sorted(SOLVERS), default=sorted(SOLVERS),
+                        help="solver configurations to benchmark")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[18, 50, 100],
+                        help="numbers of rows and columns of the grids")
+    parser.add_argument("--wall-densities", nargs="+", type=float, default=[0.25],
+                        help="probabilities of a cell being a wall")
+    parser.add_argument("--goal-densities", nargs="+", type=float, default=[0.15],
+                        help="probabilities of a cell being a goal")
+    parser.add_argument("--bad-densities", nargs="+", type=float, default=[0.15],
+                        help="probabilities of a cell being a bad cell")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0],
+                        help="seeds of the grid generator")
+    parser.add_argument("--num-workers", nargs="+", type=int, default=[None],
+                        help="numbers of worker processes parallel value iteration is run with, defaults to the "
+                             "number of CPUs")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="number of timed solves of each case, the best one being reported")
+    parser.add_argument("--output",
+                        help="file to write the JSON report to, defaults to standard output")
+    parser.add_argument("--baseline",
+                        help="JSON report to compare against, exiting with status 1 on any regression")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative increase in time or memory over the baseline counted as a regression")
+    parser.add_argument("--min-time-difference", type=float, default=0.05,
+                        help="increase in solve time, in seconds, below which it is not counted as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    '''
+    Definition
+    __________
+
+    Entry point of the benchmark suite
+
+
+    Parameters
+    __________
+
+    argv : list
+        Command line arguments, defaults to sys.argv[1:]
+
+    '''
+
+    args = parse_args(argv)
+
+    # prioritized sweeping drives its queue from python, so it is kept to the smaller grids
+    report = run_benchmarks(args.solvers, args.sizes, args.wall_densities, args.seeds, args.goal_densities,
+                            args.bad_densities, args.repeats, max_states={"value_iteration_prioritized": 400},
+                            log=sys.stderr, worker_counts=args.num_workers)
+
+    regressions = []
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            report["comparison"] = compare_reports(report, json.load(baseline_file), args.tolerance,
+                                                   args.min_time_difference)
+        regressions = [comparison for comparison in report["comparison"] if comparison["regressions"]]
+        for comparison in regressions:
+            sys.stderr.write("regression in " + comparison["case"] + ": " + ", ".join(
+                comparison["regressions"]) + "\n")
+
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        sys.stdout.write(output + "\n")
+    else:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import os
+import numpy as np
+
+
+class Checkpoint:
+
+    '''
+    Definition
+    __________
+
+    Class to periodically save the state of a solver to a compact binary .npz file, so that a long solve can be
+    resumed after a crash or a timeout
+
+
+    Class Attributes
+    ________________
+
+    file_path : string
+        Path of the checkpoint file
+
+    interval : int
+        Number of iterations between two checkpoints - sweeps for Value Iteration, policy improvement steps for
+        Policy Iteration
+
+
+    Methods
+    _______
+
+    is_due(num_iters) : Returns whether a checkpoint should be saved after the specified iteration
+
+    save(algorithm, mdp, utilities, policy, num_iters, residual, **state) : Saves the state of a solver to the file
+
+    load(mdp) : Loads the state of a solver saved to the file, as a dictionary
+
+    exists() : Returns whether the checkpoint file exists
+
+    '''
+
+    def __init__(self, file_path, interval=1):
+        '''
+        Definition
+        __________
+
+        Initializes the Checkpoint class
+
+
+        Parameters
+        __________
+
+        file_path : string
+            Path of the checkpoint file
+
+        interval : int
+            Number of iterations between two checkpoints - sweeps for Value Iteration, policy improvement steps for
+            Policy Iteration
+
+        '''
+
+        self.file_path = file_path
+        self.interval = max(int(interval), 1)
+
+    def is_due(self, num_iters):
+        '''
+        Definition
+        __________
+
+        Returns whether a checkpoint should be saved after the specified iteration
+
+
+        Parameters
+        __________
+
+        num_iters : int
+            Number of iterations carried out so far
+
+        '''
+
+        return num_iters % self.interval == 0
+
+    def save(self, algorithm, mdp, utilities, policy, num_iters, residual, **state):
+        '''
+        Definition
+        __________
+
+        Saves the state of a solver to the checkpoint file. The file is written next to the checkpoint first and then
+        renamed over it, so that a crash while saving never leaves a truncated checkpoint behind
+
+
+        Parameters
+        __________
+
+        algorithm : string
+            'value_iteration' or 'policy_iteration'
+
+        mdp : Environment
+            The environment of the Markov Decision Process being solved
+
+        utilities : list or numpy array
+            The utility of each cell, either flat in row major order or as a two-dimensional grid
+
+        policy : two-dimensional list
+            The action taken at each cell, or None if the solver has no policy yet
+
+        num_iters : int
+            Number of iterations carried out so far
+
+        residual : float
+            Maximum change in utility during the last iteration
+
+        **state : int or float
+            Any other scalar needed by the solver to resume identically
+
+        '''
+
+        height, width = mdp.get_grid_height(), mdp.get_grid_width()
+        arrays = {
+            "algorithm": np.array(algorithm),
+            "utilities": np.reshape(np.asarray(utilities, dtype=np.float64), (height, width)),
+            "num_iters": np.array(num_iters, dtype=np.int64),
+            "residual": np.array(residual, dtype=np.float64)
+        }
+
+        # store the policy as the index of each action, which takes a byte per cell
+        if policy is not None:
+            actions = mdp.get_actions()
+            arrays["policy"] = np.array([[actions.index(action) for action in policy_row]
+                                         for policy_row in policy], dtype=np.int8)
+
+        for name, value in state.items():
+            arrays["state_" + name] = np.array(value)
+
+        temporary_path = self.file_path + ".tmp"
+        with open(temporary_path, "wb") as checkpoint_file:
+            np.savez(checkpoint_file, **arrays)
+        os.replace(temporary_path, self.file_path)
+
+    def load(self, mdp):
+        '''
+        Definition
+        __________
+
+        Loads the state of a solver saved to the checkpoint file, as a dictionary holding the algorithm, the
+        utilities as a two-dimensional numpy array, the policy as a two-dimensional list (or None), the number of
+        iterations, the residual and any other state passed to save()
+
+
+        Parameters
+        __________
+
+        mdp : Environment
+            The environment of the Markov Decision Process being solved, which must match the saved grid
+
+        '''
+
+        with np.load(self.file_path) as arrays:
+            utilities = arrays["utilities"]
+            if utilities.shape != (mdp.get_grid_height(), mdp.get_grid_width()):
+                raise ValueError("Checkpoint grid size does not match the environment: " + str(utilities.shape))
+
+            state = {
+                "algorithm": str(arrays["algorithm"]),
+                "utilities": utilities,
+                "policy": None,
+                "num_iters": int(arrays["num_iters"]),
+                "residual": float(arrays["residual"])
+            }
+
+            # convert the action indices back into actions
+            if "policy" in arrays:
+                actions = mdp.get_actions()
+                state["policy"] = [[actions[action_index] for action_index in policy_row]
+                                   for policy_row in arrays["policy"].tolist()]
+
+            for name in arrays.files:
+                if name.startswith("state_"):
+                    state[name[len("state_"):]] = arrays[name].item()
+
+        return state
+
+    def exists(self):
+        '''
+        Definition
+        __________
+
+        Returns whether the checkpoint file exists
+
+        '''
+
+        return os.path.exists(self.file_path)
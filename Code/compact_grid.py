@@ -0,0 +1,277 @@
+import numpy as np
+
+# cell types in the order of their index in compact uint8 rasters
+CELL_TYPES = ("", "wall", "G", "B")
+
+
+class CompactGrid:
+
+    '''
+    Definition
+    __________
+
+    Class to hold a grid world as flat arrays rather than nested lists of strings - a uint8 index of the type of each
+    cell in CELL_TYPES, a precomputed wall bitmap, a float32 reward per cell, and an index of the states which are
+    not walls. A cell takes a few bytes instead of the pointers and float objects of the nested lists, and looking a
+    cell up is an array indexing rather than a string comparison
+
+
+    Class Attributes
+    ________________
+
+    height : int
+        Height of the grid
+
+    width : int
+        Width of the grid
+
+    cell_types : two-dimensional numpy array
+        Index of the type of each cell in CELL_TYPES, as uint8
+
+    walls : two-dimensional numpy array
+        Whether each cell is a wall or not
+
+    rewards : two-dimensional numpy array
+        The reward at each cell, as float32
+
+    free_states : one-dimensional numpy array
+        Flat index, row * width + col, of every cell which is not a wall, in increasing order
+
+    state_indices : one-dimensional numpy array
+        Position of each flat state in free_states, or -1 for walls
+
+
+    Methods
+    _______
+
+    update_index() : Recomputes the wall bitmap and the index of the states which are not walls
+
+    is_wall(row, col) : Returns whether the specified cell is a wall or not
+
+    is_goal(row, col) : Returns whether the specified cell is a goal ('G') or not
+
+    get_reward(row, col) : Returns the reward for a particular cell in the grid
+
+    get_cell(row, col) : Returns the type of a particular cell, as in the nested lists format
+
+    set_cell(row, col, cell, reward) : Changes the type and reward of a cell
+
+    to_lists() : Returns the grid and rewards as nested lists
+
+    get_nbytes() : Returns the number of bytes held by the arrays
+
+    '''
+
+    __slots__ = ("height", "width", "cell_types", "walls", "rewards", "free_states", "state_indices")
+
+    def __init__(self, cell_types, rewards):
+        '''
+        Definition
+        __________
+
+        Initializes the CompactGrid class. Arrays of the right type, such as memory-mapped rasters, are used
+        without being copied
+
+
+        Parameters
+        __________
+
+        cell_types : two-dimensional numpy array
+            Index of the type of each cell in CELL_TYPES
+
+        rewards : two-dimensional numpy array
+            The reward at each cell in the grid
+
+        '''
+
+        self.cell_types = np.asarray(cell_types, dtype=np.uint8)
+        self.rewards = np.asarray(rewards, dtype=np.float32)
+        if self.cell_types.ndim != 2 or self.rewards.shape != self.cell_types.shape:
+            raise ValueError("Unknown grid shape: " + str((self.cell_types.shape, self.rewards.shape)))
+
+        self.height, self.width = self.cell_types.shape
+        self.walls = None
+        self.free_states = None
+        self.state_indices = None
+        self.update_index()
+
+    def update_index(self):
+        '''
+        Definition
+        __________
+
+        Recomputes the wall bitmap and the index of the states which are not walls from the cell types
+
+        '''
+
+        self.walls = self.cell_types == CELL_TYPES.index("wall")
+
+        # 32-bit indices are enough for grids of up to two billion cells
+        index_type = np.int32 if self.height * self.width < 2 ** 31 else np.int64
+        self.free_states = np.flatnonzero(~self.walls).astype(index_type)
+        self.state_indices = np.full(self.height * self.width, -1, dtype=index_type)
+        self.state_indices[self.free_states] = np.arange(self.free_states.size, dtype=index_type)
+
+    def is_wall(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns whether the specified cell is a wall or not
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        '''
+
+        return bool(self.walls[row, col])
+
+    def is_goal(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns whether the specified cell is a goal ('G') or not
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        '''
+
+        return self.cell_types[row, col] == CELL_TYPES.index("G")
+
+    def get_reward(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns the reward for a particular cell in the grid
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        '''
+
+        return float(self.rewards[row, col])
+
+    def get_cell(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns the type of a particular cell, as in the nested lists format - 'G' / 'B' / 'wall' / ''
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        '''
+
+        return CELL_TYPES[self.cell_types[row, col]]
+
+    def set_cell(self, row, col, cell, reward):
+        '''
+        Definition
+        __________
+
+        Changes the type and reward of a cell, updating the index of the states which are not walls if the cell
+        becomes or stops being a wall
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified cell
+
+        col : int
+            The column (indexed from 0) of the specified cell
+
+        cell : string
+            The new type of the cell - 'wall', 'G', 'B' or ''
+
+        reward : float
+            The new reward of the cell
+
+        '''
+
+        was_wall = self.is_wall(row, col)
+        self.cell_types[row, col] = CELL_TYPES.index(cell)
+        self.rewards[row, col] = reward
+        if (cell == "wall") != was_wall:
+            self.update_index()
+
+    def to_lists(self):
+        '''
+        Definition
+        __________
+
+        Returns the grid and the rewards as nested lists, in the format used by Environment
+
+        '''
+
+        grid = np.array(CELL_TYPES, dtype=object)[self.cell_types].tolist()
+        return grid, self.rewards.tolist()
+
+    def get_nbytes(self):
+        '''
+        Definition
+        __________
+
+        Returns the number of bytes held by the arrays
+
+        '''
+
+        return sum(array.nbytes for array in (self.cell_types, self.walls, self.rewards, self.free_states,
+                                               self.state_indices))
+
+
+def compact_from_lists(grid, rewards):
+    '''
+    Definition
+    __________
+
+    Converts a grid and its rewards from nested lists into a CompactGrid
+
+
+    Parameters
+    __________
+
+    grid : two-dimensional list
+        The grid, with each cell having one of the following values: 'G' / 'B' / 'wall' / ''
+
+    rewards : two-dimensional list
+        The reward at each cell in the grid
+
+    '''
+
+    cell_indices = {cell: index for index, cell in enumerate(CELL_TYPES)}
+    cell_types = np.array([[cell_indices[cell] for cell in grid_row] for grid_row in grid], dtype=np.uint8)
+    return CompactGrid(cell_types, np.array(rewards, dtype=np.float32))
@@ -0,0 +1,12 @@
+# display settings for the grid in complex_constants.py
+from display_constants import *
+
+# display settings
+cell_size = 50
+height = 900
+width = 900
+
+UTILITY_FONT_SIZE = 15
+UTILITY_CELL_OFFSET = (7, 14)
+POLICY_FONT_SIZE = 20
+POLICY_CELL_OFFSET = (18, 10)
@@ -1,6 +1,3 @@
-import pygame
-pygame.init()
-
 # value iteration settings
 val_iter_discount_factor = 0.99
 val_iter_scaler = 0.05
@@ -33,28 +30,3 @@ reward_mapping = {
 }
 rewards = [[reward_mapping[grid[row][col]]
             for col in range(grid_width)] for row in range(grid_height)]
-
-# mapping for action to arrow symbol
-ACTION_TUPLE_CONVERSION = {(1, 0): '⬇', (-1, 0): '⬆',
-                           (0, 1): '➡', (0, -1): '⬅'}
-
-# display settings
-cell_size = 80
-height = 480
-width = 480
-
-UTILITY_FONT_SIZE = 15
-UTILITY_CELL_OFFSET = (20, 25)
-POLICY_FONT_SIZE = 30
-POLICY_CELL_OFFSET = (30, 15)
-POLICY_FONT = pygame.font.Font(
-    "seguisym.ttf", int(POLICY_FONT_SIZE))
-UTILITY_FONT = pygame.font.Font(
-    "seguisym.ttf", int(UTILITY_FONT_SIZE))
-
-# user interface settings
-SCREEN_COLOR = (0, 0, 0)
-WHITE = (255, 255, 255)
-GREY = (169, 169, 169)
-GREEN = (0, 255, 0)
-BROWN = (255, 140, 0)
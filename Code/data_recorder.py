@@ -1,4 +1,7 @@
-import pandas as pd
+import importlib.util
+import os
+import zipfile
+import numpy as np
 
 
 class DataRecorder:
@@ -22,6 +25,11 @@ class DataRecorder:
 
     record(file_name, dict_data) : Stores the recorded data into a csv file of the specified name, in the specified directory
 
+    open_stream(file_name, height, width, file_format, layout, chunk_size) : Opens a DataStream to write recorded data
+    incrementally, in chunks, while a solver is running
+
+    load(file_name) : Loads recorded data written by record() or by a DataStream, memory-mapping binary files
+
     '''
 
     def __init__(self, file_path):
@@ -61,5 +69,370 @@ class DataRecorder:
 
         '''
 
+        import pandas as pd
+
         df = pd.DataFrame.from_dict(dict_data)
         df.to_csv(self.file_path + file_name, index=None)
+
+    def open_stream(self, file_name, height, width, file_format=None, layout="wide", chunk_size=64):
+        '''
+        Definition
+        __________
+
+        Opens a DataStream to write recorded data incrementally, in chunks, while a solver is running.
+        Pass it to a TraceRecorder to stream every recorded sweep to disk
+
+
+        Parameters
+        __________
+
+        file_name : string
+            Name of the file to store the recorded data in
+
+        height : int
+            Height of the grid
+
+        width : int
+            Width of the grid
+
+        file_format : string
+            One of 'npy', 'npz', 'parquet' or 'csv', defaults to the extension of file_name
+
+        layout : string
+            Layout of tabular formats - 'wide' for one column per cell, 'long' for one (sweep, row, col, utility) row
+            per cell per sweep
+
+        chunk_size : int
+            Number of sweeps buffered in memory before being written to disk
+
+        '''
+
+        if file_format is None:
+            file_format = os.path.splitext(file_name)[1].lstrip(".")
+
+        return DataStream(self.file_path + file_name, height, width, file_format, layout, chunk_size)
+
+    def load(self, file_name, file_format=None):
+        '''
+        Definition
+        __________
+
+        Loads recorded data written by record() or by a DataStream. 'npy' files are memory-mapped, so that
+        sweeps are only read from disk when accessed, and 'npz' files are returned as lazily loaded chunks
+
+
+        Parameters
+        __________
+
+        file_name : string
+            Name of the file the recorded data is stored in
+
+        file_format : string
+            One of 'npy', 'npz', 'parquet' or 'csv', defaults to the extension of file_name
+
+        '''
+
+        if file_format is None:
+            file_format = os.path.splitext(file_name)[1].lstrip(".")
+
+        full_path = self.file_path + file_name
+        if file_format == "npy":
+            return np.load(full_path, mmap_mode="r")
+        if file_format == "npz":
+            return np.load(full_path)
+
+        # pandas is only imported for tabular formats
+        import pandas as pd
+        if file_format == "parquet":
+            return pd.read_parquet(full_path)
+        if file_format == "csv":
+            return pd.read_csv(full_path)
+
+        raise ValueError("Unknown recorded data format: " + str(file_format))
+
+
+class DataStream:
+
+    '''
+    Definition
+    __________
+
+    Class to write the utility of each cell after every recorded sweep to disk incrementally, in chunks,
+    so that memory use stays flat however long the solver runs
+
+
+    Class Attributes
+    ________________
+
+    full_path : string
+        Path of the file being written
+
+    height : int
+        Height of the grid
+
+    width : int
+        Width of the grid
+
+    file_format : string
+        One of 'npy' (a single memory-mappable [sweeps, height, width] array), 'npz' (one array per chunk),
+        'parquet' or 'csv'
+
+    layout : string
+        Layout of tabular formats - 'wide' for one column per cell, 'long' for one (sweep, row, col, utility) row
+        per cell per sweep
+
+    chunk_size : int
+        Number of sweeps buffered in memory before being written to disk
+
+    buffer : three-dimensional numpy array
+        Sweeps waiting to be written to disk
+
+    num_buffered : int
+        Number of sweeps currently held in the buffer
+
+    num_written : int
+        Number of sweeps already written to disk
+
+
+    Methods
+    _______
+
+    write(utilities, sweep) : Buffers the utilities of every cell after a sweep, writing a chunk once the buffer is full
+
+    flush() : Writes the buffered sweeps to disk
+
+    close() : Flushes the remaining sweeps and finalizes the file
+
+    '''
+
+    FORMATS = ("npy", "npz", "parquet", "csv")
+    LAYOUTS = ("wide", "long")
+
+    # placeholder number of sweeps used to reserve room for the final .npy header
+    NPY_HEADER_PLACEHOLDER = 10 ** 18
+
+    def __init__(self, full_path, height, width, file_format="npy", layout="wide", chunk_size=64):
+        '''
+        Definition
+        __________
+
+        Initializes the DataStream class and opens the file for writing
+
+
+        Parameters
+        __________
+
+        full_path : string
+            Path of the file to write
+
+        height : int
+            Height of the grid
+
+        width : int
+            Width of the grid
+
+        file_format : string
+            One of 'npy', 'npz', 'parquet' or 'csv'
+
+        layout : string
+            Layout of tabular formats - 'wide' or 'long'
+
+        chunk_size : int
+            Number of sweeps buffered in memory before being written to disk
+
+        '''
+
+        if file_format not in self.FORMATS:
+            raise ValueError("Unknown recorded data format: " + str(file_format))
+        if layout not in self.LAYOUTS:
+            raise ValueError("Unknown recorded data layout: " + str(layout))
+        if file_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+            raise ImportError("pyarrow is required to record data as parquet")
+
+        self.full_path = full_path
+        self.height = height
+        self.width = width
+        self.file_format = file_format
+        self.layout = layout
+        self.chunk_size = max(int(chunk_size), 1)
+        self.buffer = np.zeros((self.chunk_size, height, width))
+        self.sweeps = np.zeros(self.chunk_size, dtype=np.int64)
+        self.num_buffered = 0
+        self.num_written = 0
+
+        # cell column names, formatted as (col, row) like record()
+        self.columns = ["(" + str(col) + "," + str(row) + ")"
+                        for row in range(height) for col in range(width)]
+
+        self.file = None
+        self.header_length = 0
+        if file_format == "npy":
+            self.file = open(full_path, "wb")
+            self.header_length = self.write_npy_header(self.NPY_HEADER_PLACEHOLDER)
+        elif file_format == "npz":
+            self.file = zipfile.ZipFile(full_path, "w", allowZip64=True)
+        elif file_format == "csv":
+            self.file = open(full_path, "w", newline="")
+
+        # the parquet writer needs the schema of the first chunk, so it is opened on the first flush
+        self.parquet_writer = None
+
+    def write(self, utilities, sweep=None):
+        '''
+        Definition
+        __________
+
+        Buffers the utilities of every cell after a sweep, writing a chunk to disk once the buffer is full
+
+
+        Parameters
+        __________
+
+        utilities : list or numpy array
+            The utility of each cell, either flat in row major order or as a two-dimensional grid
+
+        sweep : int
+            Index of the sweep, defaults to the number of sweeps written so far
+
+        '''
+
+        if sweep is None:
+            sweep = self.num_written + self.num_buffered
+
+        self.buffer[self.num_buffered] = np.reshape(utilities, (self.height, self.width))
+        self.sweeps[self.num_buffered] = sweep
+        self.num_buffered += 1
+
+        if self.num_buffered == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        '''
+        Definition
+        __________
+
+        Writes the buffered sweeps to disk
+
+        '''
+
+        if self.num_buffered == 0:
+            return
+
+        chunk = self.buffer[:self.num_buffered]
+        sweeps = self.sweeps[:self.num_buffered]
+
+        if self.file_format == "npy":
+            self.file.write(np.ascontiguousarray(chunk, dtype="<f8").tobytes())
+        elif self.file_format == "npz":
+            for name, array in (("chunk_%08d" % self.num_written, chunk), ("sweeps_%08d" % self.num_written, sweeps)):
+                with self.file.open(name + ".npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array(member, np.ascontiguousarray(array))
+        else:
+            table = self.get_table(chunk, sweeps)
+            if self.file_format == "csv":
+                table.to_csv(self.file, index=None, header=self.num_written == 0)
+            else:
+                import pyarrow
+                import pyarrow.parquet
+
+                arrow_table = pyarrow.Table.from_pandas(table, preserve_index=False)
+                if self.parquet_writer is None:
+                    self.parquet_writer = pyarrow.parquet.ParquetWriter(
+                        self.full_path, arrow_table.schema)
+                self.parquet_writer.write_table(arrow_table)
+
+        self.num_written += self.num_buffered
+        self.num_buffered = 0
+
+    def close(self):
+        '''
+        Definition
+        __________
+
+        Flushes the remaining sweeps and finalizes the file
+
+        '''
+
+        self.flush()
+
+        if self.file_format == "npy":
+
+            # rewrite the header, now that the number of sweeps is known
+            self.file.seek(0)
+            self.write_npy_header(self.num_written, self.header_length)
+            self.file.close()
+        elif self.file_format == "parquet":
+            if self.parquet_writer is not None:
+                self.parquet_writer.close()
+        else:
+            self.file.close()
+
+    def get_table(self, chunk, sweeps):
+        '''
+        Definition
+        __________
+
+        Returns a chunk of sweeps as a pandas DataFrame in the layout of the stream
+
+
+        Parameters
+        __________
+
+        chunk : three-dimensional numpy array
+            The utilities of every cell, with shape [sweeps, height, width]
+
+        sweeps : one-dimensional numpy array
+            The index of each sweep in the chunk
+
+        '''
+
+        import pandas as pd
+
+        num_sweeps = chunk.shape[0]
+        if self.layout == "wide":
+            table = pd.DataFrame(chunk.reshape(num_sweeps, -1), columns=self.columns)
+            table.insert(0, "sweep", sweeps)
+            return table
+
+        rows, cols = np.divmod(np.arange(self.height * self.width), self.width)
+        return pd.DataFrame({
+            "sweep": np.repeat(sweeps, self.height * self.width),
+            "row": np.tile(rows, num_sweeps),
+            "col": np.tile(cols, num_sweeps),
+            "utility": chunk.reshape(-1)
+        })
+
+    def write_npy_header(self, num_sweeps, header_length=None):
+        '''
+        Definition
+        __________
+
+        Writes a .npy header for a float64 array of shape [num_sweeps, height, width], padded with spaces to
+        header_length bytes so that the final header can overwrite the placeholder one. Returns the header length
+
+
+        Parameters
+        __________
+
+        num_sweeps : int
+            Number of sweeps in the array
+
+        header_length : int
+            Total length in bytes the header must occupy, or None for the shortest valid length
+
+        '''
+
+        header = repr({"descr": "<f8", "fortran_order": False,
+                       "shape": (num_sweeps, self.height, self.width)})
+        prefix_length = len(np.lib.format.MAGIC_PREFIX) + 2 + 2
+
+        # pad the header so that the data starts on a 64 byte boundary, as required by the format
+        if header_length is None:
+            header_length = prefix_length + len(header) + 1
+            header_length += -header_length % 64
+        header = header.ljust(header_length - prefix_length - 1) + "\n"
+
+        self.file.write(np.lib.format.magic(1, 0))
+        self.file.write(len(header).to_bytes(2, "little"))
+        self.file.write(header.encode("latin1"))
+        return header_length
@@ -0,0 +1,24 @@
+# display settings for the grid in constants.py
+# kept apart from the Markov Decision Process settings, so that solvers never depend on the display
+
+# mapping for action to arrow symbol
+ACTION_TUPLE_CONVERSION = {(1, 0): '⬇', (-1, 0): '⬆',
+                           (0, 1): '➡', (0, -1): '⬅'}
+
+# display settings
+cell_size = 80
+height = 480
+width = 480
+
+UTILITY_FONT_SIZE = 15
+UTILITY_CELL_OFFSET = (20, 25)
+POLICY_FONT_SIZE = 30
+POLICY_CELL_OFFSET = (30, 15)
+FONT_FILE = "seguisym.ttf"
+
+# user interface settings
+SCREEN_COLOR = (0, 0, 0)
+WHITE = (255, 255, 255)
+GREY = (169, 169, 169)
+GREEN = (0, 255, 0)
+BROWN = (255, 140, 0)
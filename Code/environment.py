@@ -1,4 +1,7 @@
+import numpy as np
 from collections import defaultdict
+from transition_model import TransitionModel
+from compact_grid import CELL_TYPES, compact_from_lists
 
 
 class Environment:
@@ -28,6 +31,26 @@ class Environment:
     rewards : two-dimensional list
         The reward at each cell in the grid
 
+    slip_probabilities : numpy array
+        Probability of moving in each direction relative to the action taken, see get_slip_offsets(), either shared
+        by every cell with shape [4] or given per cell with shape [height, width, 4]
+
+    start_cells : list
+        The (row, col) cells the agent may start from, or None for every cell which is not a wall
+
+    compiled_transition_model : TransitionModel
+        The transition model of the whole grid, compiled once on first use
+
+    pruned_transition_model : TransitionModel
+        The transition model restricted to the states reachable from the start cells, built on first use
+
+    changed_states : set
+        Flat indices of the states affected by set_cell() since the last call to pop_changed_states()
+
+    compact : CompactGrid
+        The grid and rewards as flat arrays, built on first use by to_compact() and kept up to date by write_cell(),
+        from which get_walls() and the vectorized callers read
+
 
     Methods
     _______
@@ -40,13 +63,55 @@ class Environment:
 
     get_grid_width() : Returns the width of the grid
 
+    get_slip_offsets(action) : Returns the four directions of movement relative to an action
+
+    get_slip_probabilities(row, col) : Returns the probability of moving in each direction relative to the action
+
+    get_slip_directions(action, row, col) : Returns the possible directions of movement, with their probabilities, for
+    an action
+
     get_transition_model(row, col, action) : Returns the transition model P(s'|s,a) for a particular state and action
 
+    get_compiled_transition_model() : Returns the transition model of the whole grid as a sparse TransitionModel
+
+    get_reachable_states(start_cells) : Returns the states which can be reached from the start cells
+
+    get_pruned_transition_model() : Returns the transition model restricted to the states reachable from the start
+    cells
+
+    compile_transition_model() : Compiles the transition model of the whole grid into a sparse TransitionModel
+
+    compile_transition_rows(states, walls) : Compiles the rows of the transition model for a subset of the states
+
+    get_affected_states(row, col) : Returns the states whose transition model depends on a particular cell
+
+    set_cell(row, col, cell, reward) : Changes the type and reward of a cell, patching the compiled transition model
+
+    write_cell(row, col, cell, reward) : Writes the type and reward of a cell into the grid and rewards
+
+    pop_changed_states() : Returns the states affected by set_cell() since the last call, and clears them
+
+    prolong_utilities(coarse_utilities) : Maps the utilities solved on a coarser version of the grid onto this grid
+
+    coarsen(factor, reward_scale) : Returns a coarser Environment whose cells aggregate blocks of cells of this grid
+
     is_wall(row, col) : Returns whether the specified cell is a wall or not
 
+    is_goal(row, col) : Returns whether the specified cell is a goal ('G') or not
+
+    get_walls() : Returns the wall bitmap of the grid
+
+    to_compact() : Returns the grid and rewards converted into a CompactGrid
+
     '''
 
-    def __init__(self, grid, height, width, actions, rewards):
+    # the intended direction with probability 0.8, and each perpendicular direction with probability 0.1
+    DEFAULT_SLIP_PROBABILITIES = (0.8, 0.1, 0.1, 0)
+
+    # cell types in the order of their index in compact uint8 rasters
+    CELL_TYPES = CELL_TYPES
+
+    def __init__(self, grid, height, width, actions, rewards, slip_probabilities=None, start_cells=None):
         '''
         Definition
         __________
@@ -72,13 +137,40 @@ class Environment:
         rewards : two-dimensional list
             The reward at each cell in the grid
 
+        slip_probabilities : list or numpy array
+            Probability of moving in the intended direction, in each of the two perpendicular directions and in the
+            reverse direction, either shared by every cell as 4 values or given per cell with shape
+            [height, width, 4]. The reverse direction may be left out. Defaults to DEFAULT_SLIP_PROBABILITIES
+
+        start_cells : list
+            The (row, col) cells the agent may start from, which decide the states kept by
+            get_pruned_transition_model(), defaults to every cell which is not a wall
+
         '''
 
+        if slip_probabilities is None:
+            slip_probabilities = self.DEFAULT_SLIP_PROBABILITIES
+        slip_probabilities = np.asarray(slip_probabilities, dtype=np.float64)
+
+        # a kernel without the reverse direction never moves backwards
+        if slip_probabilities.ndim in (1, 3) and slip_probabilities.shape[-1] == 3:
+            slip_probabilities = np.concatenate(
+                [slip_probabilities, np.zeros(slip_probabilities.shape[:-1] + (1,))], axis=-1)
+        if slip_probabilities.shape not in ((4,), (height, width, 4)) or (slip_probabilities < 0).any() or \
+                not np.allclose(slip_probabilities.sum(axis=-1), 1):
+            raise ValueError("Unknown slip probabilities: " + str(slip_probabilities.tolist()))
+
         self.grid = grid
         self.height = height
         self.width = width
         self.actions = actions
         self.rewards = rewards
+        self.slip_probabilities = slip_probabilities
+        self.start_cells = start_cells
+        self.compiled_transition_model = None
+        self.pruned_transition_model = None
+        self.changed_states = set()
+        self.compact = None
 
     def get_reward(self, row, col):
         '''
@@ -134,12 +226,33 @@ class Environment:
 
         return self.width
 
-    def get_transition_model(self, row, col, action):
+    def get_slip_offsets(self, action):
         '''
         Definition
         __________
 
-        Returns the transition model P(s'|s,a) for a particular state and action
+        Returns the four directions of movement relative to an action, in the order of the slip probabilities - the
+        intended direction, the two perpendicular directions and the reverse direction
+
+
+        Parameters
+        __________
+
+        action: tuple
+            The action that is being taken
+
+        '''
+
+        return [action, (-action[1], -action[0]), (action[1], action[0]), (-action[0], -action[1])]
+
+    def get_slip_probabilities(self, row=None, col=None):
+        '''
+        Definition
+        __________
+
+        Returns the probability of moving in each direction relative to the action taken at a cell, as an array of
+        4 values in the order of get_slip_offsets(). Without a cell, returns the probabilities of every cell with
+        shape [height, width, 4] if they are given per cell
 
 
         Parameters
@@ -151,33 +264,80 @@ class Environment:
         col : int
             The column (indexed from 0) of the specified state
 
+        '''
+
+        if self.slip_probabilities.ndim == 1 or row is None:
+            return self.slip_probabilities
+        return self.slip_probabilities[row, col]
+
+    def get_slip_directions(self, action, row=None, col=None):
+        '''
+        Definition
+        __________
+
+        Returns the possible directions of movement when taking an action at a cell, along with their probabilities,
+        leaving out the directions which cannot happen
+
+
+        Parameters
+        __________
+
         action: tuple
             The action that is being taken
 
-        '''
+        row : int
+            The row (indexed from 0) of the specified state, only needed with per-cell slip probabilities
 
-        # initialize the transition model as a dictionary to store the mappings
-        transition_model = defaultdict(int)
+        col : int
+            The column (indexed from 0) of the specified state, only needed with per-cell slip probabilities
+
+        '''
 
         # dir_and_probability lists the probability of a particular direction of movement
         # as well as the offset to be added to the current coordinates to retrieve the
         # updated coordinates
         dir_and_probability = [
-            [0.8, action],
-            [0.1, (-action[1], -action[0])],
-            [0.1, (action[1], action[0])]
+            [probability, direction] for probability, direction in zip(
+                self.get_slip_probabilities(row, col).tolist(), self.get_slip_offsets(action)) if probability > 0
         ]
 
+        return dir_and_probability
+
+    def get_transition_model(self, row, col, action):
+        '''
+        Definition
+        __________
+
+        Returns the transition model P(s'|s,a) for a particular state and action
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        action: tuple
+            The action that is being taken
+
+        '''
+
+        # initialize the transition model as a dictionary to store the mappings
+        transition_model = defaultdict(int)
+
         # iterate over all the possible directions of movement
-        for probability, direction in dir_and_probability:
+        for probability, direction in self.get_slip_directions(action, row, col):
             new_row = row + direction[0]
             new_col = col + direction[1]
 
             # process further only if the new coordinates are valid coordinates
-            if 0 <= new_row < self.get_grid_height() and 0 <= new_col < self.get_grid_width():
+            if 0 <= new_row < self.height and 0 <= new_col < self.width:
 
                 # if the new coordinates are that of a wall, then the agent stays in the current state
-                if self.grid[new_row][new_col] == "wall":
+                if self.is_wall(new_row, new_col):
                     new_row, new_col = row, col
 
             # otherwise the agent remains in the current state
@@ -209,4 +369,458 @@ class Environment:
 
         '''
 
+        # a direct lookup in the nested lists is faster than indexing the compact grid for a single cell
         return self.grid[row][col] == "wall"
+
+    def is_goal(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns whether the specified cell is a goal ('G') or not
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        '''
+
+        return self.grid[row][col] == "G"
+
+    def get_walls(self):
+        '''
+        Definition
+        __________
+
+        Returns the wall bitmap of the grid, as a two-dimensional boolean numpy array, copied from the compact grid
+
+        '''
+
+        return self.to_compact().walls.copy()
+
+    def to_compact(self):
+        '''
+        Definition
+        __________
+
+        Returns the grid and rewards as a CompactGrid, with a few bytes per cell. It is converted from the nested
+        lists on first use and kept up to date by set_cell(), so it must not be modified directly
+
+        '''
+
+        if self.compact is None:
+            self.compact = compact_from_lists(self.grid, self.rewards)
+        return self.compact
+
+    def get_compiled_transition_model(self):
+        '''
+        Definition
+        __________
+
+        Returns the transition model of the whole grid as a sparse TransitionModel, compiling it on first use
+
+        '''
+
+        if self.compiled_transition_model is None:
+            self.compiled_transition_model = self.compile_transition_model()
+        return self.compiled_transition_model
+
+    def get_reachable_states(self, start_cells=None):
+        '''
+        Definition
+        __________
+
+        Returns the sorted flat indices of the states which can be reached from the start cells, with a non-zero
+        probability under some sequence of actions, found by a breadth first search over the compiled transition
+        model which expands a whole frontier of states at once. Walls are never reached
+
+
+        Parameters
+        __________
+
+        start_cells : list
+            The (row, col) cells to start from, defaults to the start_cells of the environment, and to every cell
+            which is not a wall if those are None too
+
+        '''
+
+        transition_model = self.get_compiled_transition_model()
+        num_states = transition_model.num_states
+        if start_cells is None:
+            start_cells = self.start_cells
+        if start_cells is None:
+            return np.flatnonzero(~transition_model.walls)
+
+        # start from every given cell, which must be inside the grid and not a wall
+        frontier = []
+        for row, col in start_cells:
+            if not (0 <= row < self.height and 0 <= col < self.width) or self.is_wall(row, col):
+                raise ValueError("Unknown start cell: " + str((row, col)))
+            frontier.append(row * self.width + col)
+        frontier = np.unique(np.array(frontier, dtype=np.int64))
+        reached = np.zeros(num_states, dtype=bool)
+        reached[frontier] = True
+
+        while frontier.size > 0:
+
+            # every successor of the frontier under every action, read from the CSR rows
+            rows = (np.arange(transition_model.num_actions)[:, None] * num_states + frontier).reshape(-1)
+            counts = transition_model.indptr[rows + 1] - transition_model.indptr[rows]
+            positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - transition_model.indptr[rows],
+                                                            counts)
+            successors = transition_model.indices[positions]
+
+            # the successors reached for the first time make up the next frontier
+            frontier = np.unique(successors[~reached[successors]])
+            reached[frontier] = True
+
+        return np.flatnonzero(reached)
+
+    def get_pruned_transition_model(self):
+        '''
+        Definition
+        __________
+
+        Returns the compiled transition model restricted to the states reachable from the start cells, renumbered
+        densely, so that a solver sweeps neither the walls nor the cells the agent can never reach. Built on first
+        use, and again after set_cell()
+
+        '''
+
+        if self.pruned_transition_model is None:
+            self.pruned_transition_model = self.get_compiled_transition_model().restrict(self.get_reachable_states())
+        return self.pruned_transition_model
+
+    def compile_transition_model(self):
+        '''
+        Definition
+        __________
+
+        Compiles the transition model P(s'|s,a) of every state and action into a sparse TransitionModel.
+        Each state is stored with flat index row * width + col, and each (action, state) pair owns one
+        row of the CSR structure, holding its successor states in the same order as get_transition_model()
+
+        '''
+
+        height, width = self.get_grid_height(), self.get_grid_width()
+        num_states = height * width
+
+        # wall mask and reward of every state
+        walls = self.get_walls().reshape(num_states)
+        rewards = np.array(self.rewards, dtype=np.float64).reshape(num_states)
+
+        # compile the rows of every state, and turn the counts of successors into CSR row pointers
+        counts, indices, probabilities = self.compile_transition_rows(np.arange(num_states), walls)
+        indptr = np.zeros(counts.size + 1, dtype=np.int64)
+        np.cumsum(counts.reshape(-1), out=indptr[1:])
+
+        return TransitionModel(height, width, self.get_actions(), indptr, indices,
+                               probabilities, rewards, walls)
+
+    def compile_transition_rows(self, states, walls):
+        '''
+        Definition
+        __________
+
+        Compiles the rows of the transition model P(s'|s,a) for a subset of the states, in the layout of
+        TransitionModel. Returns the number of successors of each (action, state) pair as an array of shape
+        (num_actions, len(states)), and the successor states and probabilities of every row, one block of rows
+        per action, with the successors of each row in the same order as get_transition_model()
+
+
+        Parameters
+        __________
+
+        states : one-dimensional numpy array
+            The flat indices of the states to compile
+
+        walls : one-dimensional numpy array
+            Whether each flat state of the grid is a wall or not
+
+        '''
+
+        height, width = self.get_grid_height(), self.get_grid_width()
+
+        # coordinates of the compiled states, and whether they are walls themselves
+        rows, cols = np.divmod(states, width)
+        state_walls = walls[states]
+
+        # probability of each direction of movement at each compiled state, leaving out the directions which
+        # cannot happen at any of them
+        slip_probabilities = self.get_slip_probabilities()
+        if slip_probabilities.ndim == 1:
+            state_probabilities = np.tile(slip_probabilities, (states.size, 1))
+        else:
+            state_probabilities = slip_probabilities.reshape(-1, 4)[states]
+        used_directions = np.flatnonzero((state_probabilities > 0).any(axis=0))
+        state_probabilities = state_probabilities[:, used_directions].T
+
+        action_indices, action_probabilities, action_keep = [], [], []
+        for action in self.get_actions():
+            slip_directions = [self.get_slip_offsets(action)[k] for k in used_directions]
+            num_directions = len(slip_directions)
+
+            # successor state of each direction of movement, staying in the current state
+            # if the new coordinates are outside the grid or are that of a wall
+            targets = np.empty((num_directions, states.size), dtype=np.int64)
+            for k, direction in enumerate(slip_directions):
+                new_rows = rows + direction[0]
+                new_cols = cols + direction[1]
+                valid = (0 <= new_rows) & (new_rows < height) & (
+                    0 <= new_cols) & (new_cols < width)
+                new_states = np.where(valid, new_rows * width + new_cols, 0)
+                valid &= ~walls[new_states]
+                targets[k] = np.where(valid, new_states, states)
+
+            # merge directions leading to the same successor into the first entry for that successor,
+            # accumulating the probabilities in the same order as get_transition_model(), and drop the
+            # directions which cannot happen at a state
+            merged = np.zeros((num_directions, states.size))
+            keep = np.zeros((num_directions, states.size), dtype=bool)
+            for k in range(num_directions):
+                probabilities = state_probabilities[k]
+                placed = state_walls | (probabilities == 0)
+                for j in range(k):
+                    match = ~placed & keep[j] & (targets[j] == targets[k])
+                    merged[j][match] += probabilities[match]
+                    placed |= match
+                keep[k] = ~placed
+                merged[k][keep[k]] = probabilities[keep[k]]
+
+            action_indices.append(targets.T)
+            action_probabilities.append(merged.T)
+            action_keep.append(keep.T)
+
+        # flatten the kept entries, one block of rows per action
+        keep = np.stack(action_keep)
+        return keep.sum(axis=2), np.stack(action_indices)[keep], np.stack(action_probabilities)[keep]
+
+    def get_affected_states(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns the flat indices of the states whose transition model depends on a particular cell, which are the
+        cell itself and every state that can slip into it under some action
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified cell
+
+        col : int
+            The column (indexed from 0) of the specified cell
+
+        '''
+
+        # every offset the agent can move by, under any action, at any cell
+        possible = self.get_slip_probabilities().reshape(-1, 4).max(axis=0) > 0
+        offsets = {(0, 0)}
+        for action in self.get_actions():
+            for k, direction in enumerate(self.get_slip_offsets(action)):
+                if possible[k]:
+                    offsets.add(tuple(direction))
+
+        affected_states = set()
+        for offset_row, offset_col in offsets:
+            state_row, state_col = row - offset_row, col - offset_col
+            if 0 <= state_row < self.get_grid_height() and 0 <= state_col < self.get_grid_width():
+                affected_states.add(state_row * self.get_grid_width() + state_col)
+
+        return sorted(affected_states)
+
+    def set_cell(self, row, col, cell, reward):
+        '''
+        Definition
+        __________
+
+        Changes the type and reward of a cell, updating the grid and rewards lists in place. If the transition model
+        has already been compiled, only the rows of the states which depend on the cell are recompiled. The affected
+        states are added to changed_states, so that a solver can re-solve incrementally from its previous result.
+        Returns the affected states
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified cell
+
+        col : int
+            The column (indexed from 0) of the specified cell
+
+        cell : string
+            The new type of the cell - 'wall', 'G', 'B' or ''
+
+        reward : float
+            The new reward of the cell
+
+        '''
+
+        self.write_cell(row, col, cell, reward)
+        affected_states = self.get_affected_states(row, col)
+        self.changed_states.update(affected_states)
+
+        # the reachable states may have changed, so the pruned transition model is rebuilt on its next use
+        self.pruned_transition_model = None
+
+        # patch the compiled transition model, instead of compiling the whole grid again
+        if self.compiled_transition_model is not None:
+            transition_model = self.compiled_transition_model
+            state = transition_model.get_state(row, col)
+            transition_model.walls[state] = self.is_wall(row, col)
+            transition_model.rewards[state] = reward
+
+            states = np.array(affected_states, dtype=np.int64)
+            counts, indices, probabilities = self.compile_transition_rows(states, transition_model.walls)
+            transition_model.replace_rows(states, counts, indices, probabilities)
+
+        return affected_states
+
+    def write_cell(self, row, col, cell, reward):
+        '''
+        Definition
+        __________
+
+        Writes the type and reward of a cell into the grid and rewards lists
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified cell
+
+        col : int
+            The column (indexed from 0) of the specified cell
+
+        cell : string
+            The new type of the cell - 'wall', 'G', 'B' or ''
+
+        reward : float
+            The new reward of the cell
+
+        '''
+
+        self.grid[row][col] = cell
+        self.rewards[row][col] = reward
+        if self.compact is not None:
+            self.compact.set_cell(row, col, cell, reward)
+
+    def pop_changed_states(self):
+        '''
+        Definition
+        __________
+
+        Returns the sorted flat indices of the states affected by set_cell() since the last call, and clears them
+
+        '''
+
+        changed_states = sorted(self.changed_states)
+        self.changed_states = set()
+        return changed_states
+
+    def prolong_utilities(self, coarse_utilities):
+        '''
+        Definition
+        __________
+
+        Maps the utilities solved on a coarser version of the grid onto this grid, each cell taking the utility of
+        the coarse cell covering it, so that they can warm-start a solver. Walls get a utility of 0
+
+
+        Parameters
+        __________
+
+        coarse_utilities : two-dimensional list or numpy array
+            The utility of each cell of the coarser grid
+
+        '''
+
+        coarse_utilities = np.asarray(coarse_utilities, dtype=np.float64)
+        coarse_height, coarse_width = coarse_utilities.shape
+
+        # coarse cell covering each row and each column of this grid
+        coarse_rows = np.arange(self.get_grid_height()) * coarse_height // self.get_grid_height()
+        coarse_cols = np.arange(self.get_grid_width()) * coarse_width // self.get_grid_width()
+        utilities = coarse_utilities[np.ix_(coarse_rows, coarse_cols)]
+
+        walls = self.get_walls()
+        utilities[walls] = 0
+        return utilities.tolist()
+
+    def coarsen(self, factor, reward_scale=1):
+        '''
+        Definition
+        __________
+
+        Returns a coarser Environment whose cells aggregate factor x factor blocks of cells of this grid, the blocks
+        along the bottom and right edges being cut short. A block is a wall only if all of its cells are walls,
+        otherwise it takes the most common type among its other cells and the mean of their rewards, multiplied by
+        reward_scale. Solving it gives an approximation of the utilities which prolong_utilities() maps back
+
+
+        Parameters
+        __________
+
+        factor : int
+            Number of cells along each side of a block
+
+        reward_scale : float
+            Factor applied to the mean reward of each block, to account for one coarse step covering several cells
+
+        '''
+
+        height, width = self.get_grid_height(), self.get_grid_width()
+        coarse_height, coarse_width = -(-height // factor), -(-width // factor)
+
+        # pad the rasters of the compact grid with walls up to a whole number of blocks, and split them into blocks,
+        # which works the same whether the grid is held as nested lists or as rasters
+        compact = self.to_compact()
+        wall_type = CELL_TYPES.index("wall")
+        cells = np.full((coarse_height * factor, coarse_width * factor), wall_type, dtype=np.uint8)
+        cells[:height, :width] = compact.cell_types
+        rewards = np.zeros(cells.shape)
+        rewards[:height, :width] = compact.rewards
+        block_shape = (coarse_height, factor, coarse_width, factor)
+        cells = cells.reshape(block_shape).swapaxes(1, 2).reshape(coarse_height, coarse_width, -1)
+        rewards = rewards.reshape(block_shape).swapaxes(1, 2).reshape(coarse_height, coarse_width, -1)
+
+        # mean reward of the cells of each block which are not walls
+        free = cells != wall_type
+        num_free = free.sum(axis=2)
+        coarse_rewards = reward_scale * (rewards * free).sum(axis=2) / np.maximum(num_free, 1)
+
+        # most common type among the cells of each block which are not walls, ties going to the first type found in
+        # row-major order
+        present_types, first_cells = np.unique(compact.cell_types, return_index=True)
+        cell_types = [int(cell_type) for cell_type in present_types[np.argsort(first_cells)] if cell_type != wall_type]
+        coarse_cells = np.full((coarse_height, coarse_width), wall_type, dtype=np.uint8)
+        if cell_types:
+            type_counts = np.stack([(cells == cell_type).sum(axis=2) for cell_type in cell_types])
+            coarse_cells = np.where(num_free > 0, np.array(cell_types, dtype=np.uint8)[type_counts.argmax(axis=0)],
+                                    coarse_cells)
+        coarse_grid = np.array(CELL_TYPES, dtype=object)[coarse_cells]
+        coarse_rewards[num_free == 0] = 0
+
+        # per-cell slip probabilities are averaged over the cells of each block which are not walls
+        slip_probabilities = self.get_slip_probabilities()
+        if slip_probabilities.ndim == 3:
+            padded_probabilities = np.zeros((coarse_height * factor, coarse_width * factor, 4))
+            padded_probabilities[:height, :width] = slip_probabilities
+            padded_probabilities = padded_probabilities.reshape(block_shape + (4,)).swapaxes(1, 2).reshape(
+                coarse_height, coarse_width, -1, 4)
+            slip_probabilities = (padded_probabilities * free[..., None]).sum(axis=2) / np.maximum(num_free, 1)[
+                ..., None]
+            slip_probabilities[num_free == 0] = self.DEFAULT_SLIP_PROBABILITIES
+
+        return Environment(coarse_grid.tolist(), coarse_height, coarse_width, self.get_actions(),
+                           coarse_rewards.tolist(), slip_probabilities)
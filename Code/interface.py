@@ -1,6 +1,25 @@
-from constants import *
-import pygame
-pygame.init()
+from display_constants import SCREEN_COLOR, WHITE, GREY, GREEN, BROWN, FONT_FILE
+
+# pygame is imported and initialized by get_pygame() the first time something is displayed,
+# so that importing this module does not pay the SDL and font initialization cost
+pygame = None
+
+
+def get_pygame():
+    '''
+    Definition
+    __________
+
+    Imports and initializes pygame on first use, and returns the module
+
+    '''
+
+    global pygame
+    if pygame is None:
+        import pygame as pygame_module
+        pygame_module.init()
+        pygame = pygame_module
+    return pygame
 
 
 class Interface(object):
@@ -24,6 +43,9 @@ class Interface(object):
     width : int
         Width of the grid
 
+    fonts : dict
+        Fonts loaded so far, keyed by their size
+
 
     Methods
     _______
@@ -32,6 +54,8 @@ class Interface(object):
 
     solve_mdp(mdp, error) : Solves the Markov Decision Process
 
+    get_font(font_size) : Returns the font used to render the content of each cell, at the specified size
+
     display(arr, grid, offset, font, title='Grid World') : Starts the PyGame display window, with the specified settings
 
     '''
@@ -63,7 +87,29 @@ class Interface(object):
         self.cell_size = cell_size
         self.height = height
         self.width = width
-        self.screen_dims = (height, width)
+        self.screen_dims = (width, height)
+        self.fonts = {}
+
+    def get_font(self, font_size):
+        '''
+        Definition
+        __________
+
+        Returns the font used to render the content of each cell, at the specified size.
+        Fonts are loaded on first use and cached
+
+
+        Parameters
+        __________
+
+        font_size : int
+            Size of the font
+
+        '''
+
+        if font_size not in self.fonts:
+            self.fonts[font_size] = get_pygame().font.Font(FONT_FILE, int(font_size))
+        return self.fonts[font_size]
 
     def get_grid_colors(self, grid):
         '''
@@ -130,7 +176,8 @@ class Interface(object):
 
         '''
 
-        # open the pygame screen display
+        # open the pygame screen display, initializing pygame if it is the first display
+        pygame = get_pygame()
         screen = pygame.display.set_mode(self.screen_dims)
         pygame.display.set_caption(title)
 
@@ -156,7 +203,7 @@ class Interface(object):
 
             # iterate through each cell in the grid
             for row in range(len(grid)):
-                for col in range(len(grid)):
+                for col in range(len(grid[row])):
                     rect = pygame.Rect(
                         col * self.cell_size, row * self.cell_size, self.cell_size, self.cell_size)
                     pygame.draw.rect(screen, colors[row][col], rect)
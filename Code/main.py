@@ -1,110 +1,498 @@
 # import the required files to execute the program
+import argparse
+import cProfile
+import importlib
+import json
+import os
+import pstats
+import sys
+import tracemalloc
+import numpy as np
+
 from algorithms.value_iteration import ValueIteration
 from algorithms.policy_iteration import PolicyIteration
-from data_recorder import DataRecorder
+from algorithms.multigrid_value_iteration import MultigridValueIteration
+from checkpoint import Checkpoint
+from data_recorder import DataRecorder, DataStream
 from environment import Environment
 from interface import Interface
+from result_cache import ResultCache
+from sweep_monitor import SweepMonitor
+from trace_recorder import TraceRecorder
 
-from constants import *
-# uncomment below line and comment the above line to use custom grid
-# from complex_constants import *
-
-# initialize variables used for both value iteration and policy iteration
-interface = Interface(cell_size, height, width)
-mdp = Environment(grid, grid_height, grid_width, actions, rewards)
-data_recorder = DataRecorder("recorded_data/")
-
-# display the menu until the correct option is chosen
-while True:
-    print("Choose algorithm")
-    print("1. Value Iteration")
-    print("2. Policy Iteration")
-    print("3. Exit")
-    choice = int(input())
-    print()
-
-    # if the user has chosen the run value iteration
-    if choice == 1:
-        value_iteration = ValueIteration(val_iter_discount_factor)
-        result = value_iteration.solve_mdp(mdp, val_iter_error)
-
-        num_iters = result["num_iters"]
-        utilities = result["utilities"]
-        optimal_policy = result["optimal_policy"]
-
-        print("Number of iterations = " + str(num_iters))
-        print()
-        print("Cell-wise utilities: (Col, Row)")
-        print()
-        # display the utilities of each cell, formatted as (col, row), in the command line
-        for row in range(grid_height):
-            for col in range(grid_width):
-                print("(" + str(col) + "," + str(row) + "): " +
-                      str(utilities[row][col]))
-        print()
+PROFILERS = ("cprofile", "tracemalloc")
 
-        # display policy on the pygame interface
-        direction_array = [[ACTION_TUPLE_CONVERSION[optimal_policy[row][col]]
-                            for col in range(grid_width)] for row in range(grid_height)]
-        interface.display(arr=direction_array, grid=grid, offset=POLICY_CELL_OFFSET,
-                          font=POLICY_FONT, title='Value Iteration Policy')
+ALGORITHMS = {
+    "value_iteration": "Value Iteration",
+    "policy_iteration": "Policy Iteration",
+    "multigrid_value_iteration": "Multigrid Value Iteration"
+}
 
-        # display utilities on the pygame interface
-        utility_values = [["{:.2f}".format(utilities[row][col]) for col in range(
-            grid_width)] for row in range(grid_height)]
-        interface.display(arr=utility_values, grid=grid, offset=UTILITY_CELL_OFFSET,
-                          font=UTILITY_FONT, title='Value Iteration Utilities')
 
-        # record data of algorithm execution into a csv, for future data analysis
-        data_recorder.record("value_iteration.csv",
-                             value_iteration.get_analysis_data())
+def parse_args(argv=None):
+    '''
+    Definition
+    __________
 
-        break
+    Parses the command line arguments. Without --algorithm, the interactive menu is shown
 
-    # if the user has chosen the run policy iteration
-    elif choice == 2:
-        policy_iteration = PolicyIteration(
-            policy_iter_discount_factor, policy_iter_num_policy_eval_iters)
-        result = policy_iteration.solve_mdp(mdp)
 
-        num_iters = result["num_iters"]
-        utilities = result["utilities"]
-        optimal_policy = result["optimal_policy"]
+    Parameters
+    __________
 
-        print("Number of iterations = " + str(num_iters))
-        print()
-        print("Cell-wise utilities: (Col, Row)")
-        print()
-        for row in range(grid_height):
-            for col in range(grid_width):
-                print("(" + str(col) + "," + str(row) + "): " +
-                      str(utilities[row][col]))
-        print()
+    argv : list
+        Command line arguments, defaults to sys.argv[1:]
+
+    '''
+
+    parser = argparse.ArgumentParser(
+        description="Solve a grid world Markov Decision Process using Value Iteration or Policy Iteration")
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS),
+                        help="algorithm to run, shows the interactive menu if omitted")
+    parser.add_argument("--grid", default="constants",
+                        help="settings module to load the grid from (constants / complex_constants), or the path "
+                             "of a JSON file with a 'grid', an optional 'reward_mapping', optional "
+                             "'slip_probabilities' (4 values, or one list of 4 values per cell) and optional "
+                             "'start_cells' ([row, col] pairs)")
+    parser.add_argument("--discount", type=float,
+                        help="discount factor, defaults to the one in the settings module")
+    parser.add_argument("--error", type=float,
+                        help="maximum acceptable error for value iteration, defaults to the one in the settings "
+                             "module, and for the utilities of modified policy iteration, defaulting to 0.01")
+    parser.add_argument("--eval-iters", type=int,
+                        help="number of policy evaluation sweeps for policy iteration, defaults to the one in the "
+                             "settings module")
+    parser.add_argument("--backend", choices=ValueIteration.BACKENDS + tuple(ValueIteration.BACKEND_ALIASES),
+                        default="kernel",
+                        help="value iteration backend - the shared kernels (compiled with numba when it is installed) "
+                             "or vectorized numpy sweeps. 'python' is the former name of 'kernel'")
+    parser.add_argument("--evaluation", choices=PolicyIteration.EVALUATIONS, default="iterative",
+                        help="policy iteration evaluation mode")
+    parser.add_argument("--num-levels", type=int, default=1,
+                        help="number of grids multigrid value iteration solves, from the original one to the coarsest, "
+                             "or 0 to coarsen down to 16 cells along a side. The default of 1 only solves the original "
+                             "grid, with the aggregation correction")
+    parser.add_argument("--coarsening-factor", type=int, default=2,
+                        help="number of cells along each side of the blocks merged into one cell of the next coarser "
+                             "grid of multigrid value iteration")
+    parser.add_argument("--prune-unreachable", action="store_true",
+                        help="only sweep the states reachable from the start cells of the grid (every non-wall cell "
+                             "by default), leaving out the walls")
+    parser.add_argument("--no-gui", action="store_true",
+                        help="do not open the pygame windows")
+    parser.add_argument("--no-record", action="store_true",
+                        help="do not record analysis data, which also skips tracing every sweep")
+    parser.add_argument("--record-format", choices=DataStream.FORMATS,
+                        help="stream the utilities of every sweep to recorded_data/<algorithm>.<format> as the solver "
+                             "runs, instead of keeping them in memory and writing a CSV file at the end. Results are "
+                             "not cached when the sweeps are streamed")
+    parser.add_argument("--record-layout", choices=DataStream.LAYOUTS, default="wide",
+                        help="layout of the csv and parquet record formats - one column per cell, or one (sweep, row, "
+                             "col, utility) row per cell per sweep")
+    parser.add_argument("--checkpoint",
+                        help="file to periodically save the solver state to, so that the solve can be resumed")
+    parser.add_argument("--checkpoint-interval", type=int, default=50,
+                        help="sweeps (value iteration) or improvement steps (policy iteration) between checkpoints")
+    parser.add_argument("--resume", action="store_true",
+                        help="resume from the --checkpoint file if it exists")
+    parser.add_argument("--cache",
+                        help="directory to cache value iteration and policy iteration results in, so that an "
+                             "identical run returns the cached result instead of solving again")
+    parser.add_argument("--cache-size", type=int, default=256,
+                        help="size of the cache in megabytes above which the least recently used results are evicted")
+    parser.add_argument("--telemetry",
+                        help="file to stream one JSON event per sweep to, as the solver runs, or - for standard error")
+    parser.add_argument("--track-policy-changes", action="store_true",
+                        help="count the cells whose greedy action changed after each value iteration sweep in the "
+                             "telemetry, at the cost of one extra pass per sweep")
+    parser.add_argument("--profile", choices=PROFILERS,
+                        help="profile the solve with cProfile (time per function) or tracemalloc (memory per line)")
+    parser.add_argument("--profile-output",
+                        help="file to write the profile to, defaults to a summary on standard error")
+    parser.add_argument("--output-format", choices=("text", "json", "npz"), default="text",
+                        help="format of the utilities and policy written to --output")
+    parser.add_argument("--output",
+                        help="file to write the utilities and policy to, defaults to standard output (text / json)")
+    return parser.parse_args(argv)
+
+
+def load_settings(grid_source):
+    '''
+    Definition
+    __________
+
+    Returns the settings used to build, solve and display the Markov Decision Process, as a dictionary.
+    Settings modules are imported along with their display settings module (constants -> display_constants,
+    complex_constants -> complex_display_constants), while JSON grids reuse the settings of constants
+
+
+    Parameters
+    __________
+
+    grid_source : string
+        Name of a settings module, or the path of a JSON file
+
+    '''
+
+    if not grid_source.endswith(".json"):
+        settings = dict(vars(importlib.import_module(grid_source)))
+        display_source = grid_source.replace("constants", "display_constants")
+        settings.update(vars(importlib.import_module(display_source)))
+        return settings
+
+    settings = load_settings("constants")
+    with open(grid_source) as grid_file:
+        grid_spec = json.load(grid_file)
+
+    grid = grid_spec["grid"]
+    reward_mapping = grid_spec.get("reward_mapping", settings["reward_mapping"])
+    settings.update({
+        "slip_probabilities": grid_spec.get("slip_probabilities"),
+        "start_cells": grid_spec.get("start_cells"),
+        "grid": grid,
+        "grid_height": len(grid),
+        "grid_width": len(grid[0]),
+        "reward_mapping": reward_mapping,
+        "rewards": [[reward_mapping[cell] for cell in row] for row in grid],
+        "height": settings["cell_size"] * len(grid),
+        "width": settings["cell_size"] * len(grid[0])
+    })
+    return settings
+
+
+def solve(algorithm, mdp, settings, args, monitor=None, stream=None):
+    '''
+    Definition
+    __________
+
+    Runs the chosen algorithm on the Markov Decision Process, and returns its result along with the solver
+
+
+    Parameters
+    __________
+
+    algorithm : string
+        'value_iteration', 'policy_iteration' or 'multigrid_value_iteration'
+
+    mdp : Environment
+        The environment of the Markov Decision Process to solve
+
+    settings : dict
+        Settings loaded by load_settings()
+
+    args : argparse.Namespace
+        Parsed command line arguments
+
+    monitor : SweepMonitor
+        Receives live telemetry from the solver, or None
+
+    stream : DataStream
+        Stream which every sweep is written to as the solver runs, instead of being kept in memory, or None
+
+    '''
+
+    if stream is not None:
+        trace = TraceRecorder("off", stream=stream)
+    else:
+        trace = TraceRecorder("off" if args.no_record else "full")
+
+    # save the solver state periodically, and pick up from an earlier checkpoint if asked to
+    checkpoint, resume_from = None, None
+    if args.checkpoint is not None:
+        checkpoint = Checkpoint(args.checkpoint, args.checkpoint_interval)
+        if args.resume and checkpoint.exists():
+            resume_from = checkpoint
+
+    # results are cached by content, unless the solve resumes from a checkpoint or streams its sweeps, which a
+    # cached result would not write
+    cache = None
+    if args.cache is not None and resume_from is None and stream is None:
+        cache = ResultCache(args.cache, args.cache_size << 20)
+
+    if algorithm == "value_iteration":
+        discount_factor = args.discount if args.discount is not None else settings["val_iter_discount_factor"]
+        error = args.error if args.error is not None else settings["val_iter_error"]
+        solver = ValueIteration(discount_factor, backend=args.backend, trace=trace, checkpoint=checkpoint,
+                                monitor=monitor, prune_unreachable=args.prune_unreachable)
+        if cache is not None:
+            return solver, cache.solve_mdp(solver, mdp, error)
+        return solver, solver.solve_mdp(mdp, error, resume_from=resume_from)
+
+    if algorithm == "multigrid_value_iteration":
+        discount_factor = args.discount if args.discount is not None else settings["val_iter_discount_factor"]
+        error = args.error if args.error is not None else settings["val_iter_error"]
+        solver = MultigridValueIteration(discount_factor, coarsening_factor=args.coarsening_factor,
+                                         num_levels=args.num_levels or None, trace=trace)
+        return solver, solver.solve_mdp(mdp, error)
+
+    discount_factor = args.discount if args.discount is not None else settings["policy_iter_discount_factor"]
+    num_eval_iters = args.eval_iters if args.eval_iters is not None else settings[
+        "policy_iter_num_policy_eval_iters"]
+    solver_args = {} if args.error is None else {"error": args.error}
+    solver = PolicyIteration(discount_factor, num_eval_iters, evaluation=args.evaluation, trace=trace,
+                             checkpoint=checkpoint, monitor=monitor, prune_unreachable=args.prune_unreachable,
+                             **solver_args)
+    if cache is not None:
+        return solver, cache.solve_mdp(solver, mdp)
+    return solver, solver.solve_mdp(mdp, resume_from=resume_from)
+
+
+def solve_profiled(algorithm, mdp, settings, args, monitor=None, stream=None):
+    '''
+    Definition
+    __________
+
+    Runs solve() under the profiler chosen on the command line, and writes the profile to --profile-output, or a
+    summary of it to standard error
+
+
+    Parameters
+    __________
+
+    algorithm : string
+        'value_iteration', 'policy_iteration' or 'multigrid_value_iteration'
+
+    mdp : Environment
+        The environment of the Markov Decision Process to solve
+
+    settings : dict
+        Settings loaded by load_settings()
+
+    args : argparse.Namespace
+        Parsed command line arguments
+
+    monitor : SweepMonitor
+        Receives live telemetry from the solver, or None
+
+    stream : DataStream
+        Stream which every sweep is written to as the solver runs, instead of being kept in memory, or None
+
+    '''
+
+    if args.profile == "cprofile":
+        profiler = cProfile.Profile()
+        solver, result = profiler.runcall(solve, algorithm, mdp, settings, args, monitor, stream)
 
-        # display policy on the pygame interface
-        direction_array = [[ACTION_TUPLE_CONVERSION[optimal_policy[row][col]]
-                            for col in range(grid_width)] for row in range(grid_height)]
-        interface.display(arr=direction_array, grid=grid, offset=POLICY_CELL_OFFSET,
-                          font=POLICY_FONT, title='Policy Iteration Policy')
+        # the raw profile can be opened with pstats or snakeviz, the summary lists the 20 costliest functions
+        if args.profile_output is not None:
+            profiler.dump_stats(args.profile_output)
+        else:
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(20)
+        return solver, result
 
-        # display utilities on the pygame interface
-        utility_values = [["{:.2f}".format(utilities[row][col]) for col in range(
-            grid_width)] for row in range(grid_height)]
-        interface.display(arr=utility_values, grid=grid, offset=UTILITY_CELL_OFFSET,
-                          font=UTILITY_FONT, title='Policy Iteration Utilities')
+    tracemalloc.start()
+    try:
+        solver, result = solve(algorithm, mdp, settings, args, monitor, stream)
+        snapshot = tracemalloc.take_snapshot()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
 
-        # record data of algorithm execution into a csv, for future data analysis
-        data_recorder.record("policy_iteration.csv",
-                             policy_iteration.get_analysis_data())
+    # list the lines holding the most memory at the end of the solve, along with the peak during it
+    lines = ["Peak memory during the solve: " + str(peak_memory) + " bytes", ""]
+    lines.extend(str(statistic) for statistic in snapshot.statistics("lineno")[:20])
+    if args.profile_output is not None:
+        with open(args.profile_output, "w") as profile_file:
+            profile_file.write("\n".join(lines) + "\n")
+    else:
+        sys.stderr.write("\n".join(lines) + "\n")
+    return solver, result
+
+
+def write_output(algorithm, result, settings, args):
+    '''
+    Definition
+    __________
+
+    Writes the number of iterations, the utilities and the policy in one buffered write
+
+
+    Parameters
+    __________
+
+    algorithm : string
+        'value_iteration', 'policy_iteration' or 'multigrid_value_iteration'
 
-        break
+    result : dict
+        Result returned by the solver
 
-    # if the user has chosen the exit the program
-    elif choice == 3:
-        print("Exiting...")
-        break
+    settings : dict
+        Settings loaded by load_settings()
+
+    args : argparse.Namespace
+        Parsed command line arguments
+
+    '''
+
+    utilities = result["utilities"]
+    optimal_policy = result["optimal_policy"]
+    actions = settings["actions"]
+
+    if args.output_format == "npz":
+        if args.output is None:
+            raise SystemExit("--output is required for the npz output format")
+        np.savez_compressed(args.output, utilities=np.array(utilities, dtype=np.float64),
+                            policy=np.array([[actions.index(action) for action in row]
+                                            for row in optimal_policy], dtype=np.int8),
+                            actions=np.array(actions), num_iters=result["num_iters"])
+        return
+
+    if args.output_format == "json":
+        output = json.dumps({
+            "algorithm": algorithm,
+            "num_iters": result["num_iters"],
+            "utilities": utilities,
+            "optimal_policy": optimal_policy
+        })
+    else:
+        # display the utilities of each cell, formatted as (col, row)
+        lines = ["Number of iterations = " + str(result["num_iters"]), "",
+                 "Cell-wise utilities: (Col, Row)", ""]
+        lines.extend("(" + str(col) + "," + str(row) + "): " + str(utility)
+                     for row, utility_row in enumerate(utilities) for col, utility in enumerate(utility_row))
+        output = "\n".join(lines) + "\n"
 
-    # if the user enters a number not available in the menu
+    if args.output is None:
+        sys.stdout.write(output + "\n")
     else:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+
+
+def display(algorithm, result, settings):
+    '''
+    Definition
+    __________
+
+    Displays the policy and the utilities of each cell on the pygame interface
+
+
+    Parameters
+    __________
+
+    algorithm : string
+        'value_iteration', 'policy_iteration' or 'multigrid_value_iteration'
+
+    result : dict
+        Result returned by the solver
+
+    settings : dict
+        Settings loaded by load_settings()
+
+    '''
+
+    grid = settings["grid"]
+    grid_height, grid_width = settings["grid_height"], settings["grid_width"]
+    utilities = result["utilities"]
+    optimal_policy = result["optimal_policy"]
+    title = ALGORITHMS[algorithm]
+
+    interface = Interface(settings["cell_size"], settings["height"], settings["width"])
+
+    # display policy on the pygame interface
+    direction_array = [[settings["ACTION_TUPLE_CONVERSION"][optimal_policy[row][col]]
+                        for col in range(grid_width)] for row in range(grid_height)]
+    interface.display(arr=direction_array, grid=grid, offset=settings["POLICY_CELL_OFFSET"],
+                      font=interface.get_font(settings["POLICY_FONT_SIZE"]), title=title + ' Policy')
+
+    # display utilities on the pygame interface
+    utility_values = [["{:.2f}".format(utilities[row][col]) for col in range(
+        grid_width)] for row in range(grid_height)]
+    interface.display(arr=utility_values, grid=grid, offset=settings["UTILITY_CELL_OFFSET"],
+                      font=interface.get_font(settings["UTILITY_FONT_SIZE"]), title=title + ' Utilities')
+
+
+def choose_algorithm():
+    '''
+    Definition
+    __________
+
+    Displays the menu until a correct option is chosen, and returns the chosen algorithm or None to exit
+
+    '''
+
+    while True:
+        print("Choose algorithm")
+        print("1. Value Iteration")
+        print("2. Policy Iteration")
+        print("3. Exit")
+        choice = int(input())
+        print()
+
+        if choice == 1:
+            return "value_iteration"
+        elif choice == 2:
+            return "policy_iteration"
+        elif choice == 3:
+            print("Exiting...")
+            return None
+
+        # if the user enters a number not available in the menu
         print("Incorrect choice. Please enter choice again!")
         print()
+
+
+def main(argv=None):
+    '''
+    Definition
+    __________
+
+    Entry point of the program
+
+
+    Parameters
+    __________
+
+    argv : list
+        Command line arguments, defaults to sys.argv[1:]
+
+    '''
+
+    args = parse_args(argv)
+
+    # use the interactive menu if no algorithm was given on the command line
+    algorithm = args.algorithm if args.algorithm is not None else choose_algorithm()
+    if algorithm is None:
+        return
+
+    settings = load_settings(args.grid)
+    mdp = Environment(settings["grid"], settings["grid_height"], settings["grid_width"],
+                      settings["actions"], settings["rewards"], settings.get("slip_probabilities"),
+                      settings.get("start_cells"))
+
+    # stream live telemetry from the solver if asked to
+    monitor, telemetry_file = None, None
+    if args.telemetry is not None:
+        telemetry_file = sys.stderr if args.telemetry == "-" else open(args.telemetry, "w")
+        monitor = SweepMonitor(stream=telemetry_file, track_policy_changes=args.track_policy_changes)
+
+    # record data of algorithm execution into a csv, for future data analysis, or stream it to disk as the solver
+    # runs if a record format was given
+    data_recorder, stream = None, None
+    if not args.no_record:
+        data_recorder = DataRecorder(os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_data", ""))
+        if args.record_format is not None:
+            stream = data_recorder.open_stream(algorithm + "." + args.record_format, mdp.get_grid_height(),
+                                               mdp.get_grid_width(), args.record_format, args.record_layout)
+
+    try:
+        if args.profile is None:
+            solver, result = solve(algorithm, mdp, settings, args, monitor, stream)
+        else:
+            solver, result = solve_profiled(algorithm, mdp, settings, args, monitor, stream)
+    finally:
+        if telemetry_file is not None and telemetry_file is not sys.stderr:
+            telemetry_file.close()
+        if stream is not None:
+            stream.close()
+    write_output(algorithm, result, settings, args)
+
+    if not args.no_gui:
+        display(algorithm, result, settings)
+
+    if data_recorder is not None and stream is None:
+        data_recorder.record(algorithm + ".csv", solver.get_analysis_data())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+import os
+import numpy as np
+from environment import Environment
+from compact_grid import CompactGrid, compact_from_lists
+from transition_model import TransitionModel
+
+# names of the files holding a raster grid inside its directory
+CELL_TYPES_FILE = "cell_types.npy"
+REWARDS_FILE = "rewards.npy"
+SLIP_PROBABILITIES_FILE = "slip_probabilities.npy"
+
+
+class RasterEnvironment(Environment):
+
+    '''
+    Definition
+    __________
+
+    Environment whose grid is held in a CompactGrid - a uint8 raster of cell types and a float32 raster of rewards,
+    typically memory-mapped from .npy files with load_raster(), along with a precomputed wall bitmap - instead of
+    nested lists of strings. The transition model can also be compiled straight into memory-mapped files, a chunk of
+    states at a time, so that the size of the world is limited by disk rather than RAM
+
+
+    Class Attributes
+    ________________
+
+    compact : CompactGrid
+        The cell types, walls and rewards of the grid
+
+    cell_types : two-dimensional numpy array
+        Index of the type of each cell in Environment.CELL_TYPES
+
+    storage_directory : string
+        Directory the arrays of the compiled transition model are memory-mapped from, or None to keep them in memory
+
+    chunk_size : int
+        Number of states compiled at once
+
+
+    Methods
+    _______
+
+    get_reward(row, col) : Returns the reward for a particular cell in the grid
+
+    is_wall(row, col) : Returns whether the specified cell is a wall or not
+
+    is_goal(row, col) : Returns whether the specified cell is a goal ('G') or not
+
+    get_walls() : Returns the wall bitmap of the grid
+
+    write_cell(row, col, cell, reward) : Writes the type and reward of a cell into the rasters
+
+    compile_transition_model() : Compiles the transition model of the whole grid, a chunk of states at a time
+
+    create_array(name, shape, dtype) : Returns a zeroed array, memory-mapped from the storage directory if there is one
+
+    '''
+
+    def __init__(self, cell_types, rewards, actions, slip_probabilities=None, storage_directory=None,
+                 chunk_size=1 << 20):
+        '''
+        Definition
+        __________
+
+        Initializes the RasterEnvironment class
+
+
+        Parameters
+        __________
+
+        cell_types : two-dimensional numpy array
+            Index of the type of each cell in Environment.CELL_TYPES
+
+        rewards : two-dimensional numpy array
+            The reward at each cell in the grid
+
+        actions : list
+            A list of possible actions - UP, DOWN, LEFT, RIGHT
+
+        slip_probabilities : numpy array
+            Probability of moving in each direction relative to the action taken, see Environment
+
+        storage_directory : string
+            Directory to memory-map the arrays of the compiled transition model from, or None to keep them in memory
+
+        chunk_size : int
+            Number of states compiled at once
+
+        '''
+
+        compact = CompactGrid(cell_types, rewards)
+        super().__init__(None, compact.height, compact.width, actions, compact.rewards, slip_probabilities)
+        self.compact = compact
+        self.cell_types = compact.cell_types
+        self.storage_directory = storage_directory
+        self.chunk_size = max(int(chunk_size), 1)
+
+    def get_reward(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns the reward for a particular cell in the grid
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        '''
+
+        return self.compact.get_reward(row, col)
+
+    def is_wall(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns whether the specified cell is a wall or not
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        '''
+
+        return self.compact.is_wall(row, col)
+
+    def is_goal(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns whether the specified cell is a goal ('G') or not
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        '''
+
+        return self.compact.is_goal(row, col)
+
+    def get_walls(self):
+        '''
+        Definition
+        __________
+
+        Returns the wall bitmap of the grid, as a two-dimensional boolean numpy array
+
+        '''
+
+        return self.compact.walls
+
+    def write_cell(self, row, col, cell, reward):
+        '''
+        Definition
+        __________
+
+        Writes the type and reward of a cell into the rasters, which must have been opened for writing
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified cell
+
+        col : int
+            The column (indexed from 0) of the specified cell
+
+        cell : string
+            The new type of the cell - 'wall', 'G', 'B' or ''
+
+        reward : float
+            The new reward of the cell
+
+        '''
+
+        self.compact.set_cell(row, col, cell, reward)
+
+    def create_array(self, name, shape, dtype):
+        '''
+        Definition
+        __________
+
+        Returns a zeroed array, memory-mapped from a .npy file of the storage directory if there is one
+
+
+        Parameters
+        __________
+
+        name : string
+            Name of the array, used as the file name
+
+        shape : tuple
+            Shape of the array
+
+        dtype : numpy dtype
+            Type of the elements of the array
+
+        '''
+
+        if self.storage_directory is None:
+            return np.zeros(shape, dtype=dtype)
+
+        os.makedirs(self.storage_directory, exist_ok=True)
+        return np.lib.format.open_memmap(os.path.join(self.storage_directory, name + ".npy"), mode="w+",
+                                         dtype=dtype, shape=shape)
+
+    def compile_transition_model(self):
+        '''
+        Definition
+        __________
+
+        Compiles the transition model P(s'|s,a) of every state and action into a TransitionModel, in the same layout
+        as Environment.compile_transition_model(), but a chunk of states at a time. Every chunk is compiled once, in
+        a first pass which counts its successors into the row pointers and spools them into one array per action,
+        in the storage directory if there is one. The second pass copies the rows of each action from the spool to
+        their position in the transition model, so that only one chunk is ever compiled in memory
+
+        '''
+
+        height, width = self.get_grid_height(), self.get_grid_width()
+        num_states = height * width
+        num_actions = len(self.get_actions())
+        chunks = [(start, min(start + self.chunk_size, num_states)) for start in range(0, num_states, self.chunk_size)]
+
+        # wall mask and reward of every state
+        walls = self.create_array("walls", (num_states,), bool)
+        rewards = self.create_array("rewards", (num_states,), np.float64)
+        wall_raster = self.compact.walls.reshape(num_states)
+        reward_raster = self.compact.rewards.reshape(num_states)
+        for start, end in chunks:
+            walls[start:end] = wall_raster[start:end]
+            rewards[start:end] = reward_raster[start:end]
+
+        # first pass, counting the successors of every (action, state) pair into the row pointers, and spooling them
+        # into one array per action, which holds the rows of that action one after the other and is sized for the
+        # four directions of movement of every state, the unused end of it never being written
+        indptr = self.create_array("indptr", (num_actions * num_states + 1,), np.int64)
+        spool_indices = self.create_array("spool_indices", (num_actions, 4 * num_states), np.int64)
+        spool_probabilities = self.create_array("spool_probabilities", (num_actions, 4 * num_states), np.float64)
+        num_spooled = [0] * num_actions
+        for start, end in chunks:
+            counts, chunk_indices, chunk_probabilities = self.compile_transition_rows(np.arange(start, end), walls)
+
+            # the chunk holds one block of rows per action
+            offset = 0
+            for action_index in range(num_actions):
+                first_row = action_index * num_states
+                indptr[first_row + start + 1:first_row + end + 1] = counts[action_index]
+
+                num_entries = int(counts[action_index].sum())
+                position = num_spooled[action_index]
+                spool_indices[action_index, position:position + num_entries] = \
+                    chunk_indices[offset:offset + num_entries]
+                spool_probabilities[action_index, position:position + num_entries] = \
+                    chunk_probabilities[offset:offset + num_entries]
+                num_spooled[action_index] += num_entries
+                offset += num_entries
+
+        # turn the counts into row pointers, one chunk of rows at a time
+        for start in range(1, indptr.size, self.chunk_size):
+            end = min(start + self.chunk_size, indptr.size)
+            indptr[start:end] = np.cumsum(indptr[start:end]) + indptr[start - 1]
+
+        # second pass, copying the rows of each action from the spool to the position of its first row, a chunk of
+        # entries at a time
+        indices = self.create_array("indices", (int(indptr[-1]),), np.int64)
+        probabilities = self.create_array("probabilities", (int(indptr[-1]),), np.float64)
+        for action_index in range(num_actions):
+            position = int(indptr[action_index * num_states])
+            for start in range(0, num_spooled[action_index], self.chunk_size):
+                end = min(start + self.chunk_size, num_spooled[action_index])
+                indices[position + start:position + end] = spool_indices[action_index, start:end]
+                probabilities[position + start:position + end] = spool_probabilities[action_index, start:end]
+
+        # the spool is no longer needed
+        del spool_indices, spool_probabilities
+        if self.storage_directory is not None:
+            for name in ("spool_indices", "spool_probabilities"):
+                os.remove(os.path.join(self.storage_directory, name + ".npy"))
+
+        return TransitionModel(height, width, self.get_actions(), indptr, indices, probabilities, rewards, walls)
+
+
+def save_raster(directory, grid, rewards, slip_probabilities=None):
+    '''
+    Definition
+    __________
+
+    Saves a grid as a directory of .npy rasters which load_raster() can memory-map - a uint8 raster of the index
+    of each cell type in Environment.CELL_TYPES, a float32 raster of rewards, and optionally the slip probabilities
+
+
+    Parameters
+    __________
+
+    directory : string
+        Directory to save the rasters to
+
+    grid : two-dimensional list
+        The grid, with each cell having one of the following values: 'G' / 'B' / 'wall' / ''
+
+    rewards : two-dimensional list
+        The reward at each cell in the grid
+
+    slip_probabilities : list or numpy array
+        Probability of moving in each direction relative to the action taken, see Environment, or None
+
+    '''
+
+    os.makedirs(directory, exist_ok=True)
+    compact = compact_from_lists(grid, rewards)
+    np.save(os.path.join(directory, CELL_TYPES_FILE), compact.cell_types)
+    np.save(os.path.join(directory, REWARDS_FILE), compact.rewards)
+    if slip_probabilities is not None:
+        np.save(os.path.join(directory, SLIP_PROBABILITIES_FILE), np.array(slip_probabilities, dtype=np.float64))
+
+
+def load_raster(directory, actions, storage_directory=None, chunk_size=1 << 20, mode="r"):
+    '''
+    Definition
+    __________
+
+    Returns a RasterEnvironment whose rasters are memory-mapped from a directory written by save_raster()
+
+
+    Parameters
+    __________
+
+    directory : string
+        Directory holding the rasters
+
+    actions : list
+        A list of possible actions - UP, DOWN, LEFT, RIGHT
+
+    storage_directory : string
+        Directory to memory-map the arrays of the compiled transition model from, or None to keep them in memory
+
+    chunk_size : int
+        Number of states compiled at once
+
+    mode : string
+        Mode the rasters are memory-mapped with - 'r' for read only, 'r+' to allow set_cell()
+
+    '''
+
+    cell_types = np.load(os.path.join(directory, CELL_TYPES_FILE), mmap_mode=mode)
+    rewards = np.load(os.path.join(directory, REWARDS_FILE), mmap_mode=mode)
+
+    slip_probabilities = None
+    if os.path.exists(os.path.join(directory, SLIP_PROBABILITIES_FILE)):
+        slip_probabilities = np.load(os.path.join(directory, SLIP_PROBABILITIES_FILE), mmap_mode="r")
+
+    return RasterEnvironment(cell_types, rewards, actions, slip_probabilities, storage_directory, chunk_size)
+
+
+def from_environment(mdp, storage_directory=None, chunk_size=1 << 20):
+    '''
+    Definition
+    __________
+
+    Converts an Environment holding nested lists of strings into a RasterEnvironment held in memory, with the same
+    actions and slip probabilities. The rewards are stored as float32
+
+
+    Parameters
+    __________
+
+    mdp : Environment
+        The environment to convert
+
+    storage_directory : string
+        Directory to memory-map the arrays of the compiled transition model from, or None to keep them in memory
+
+    chunk_size : int
+        Number of states compiled at once
+
+    '''
+
+    # copy the arrays, which are otherwise shared with the compact grid of the environment
+    compact = mdp.to_compact()
+    return RasterEnvironment(compact.cell_types.copy(), compact.rewards.copy(), mdp.get_actions(),
+                             mdp.get_slip_probabilities(), storage_directory, chunk_size)
@@ -0,0 +1,363 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+
+from algorithms.value_iteration import ValueIteration
+from algorithms.policy_iteration import PolicyIteration
+
+# version of the layout of the cache files, part of every key so that old entries are never read
+CACHE_VERSION = 1
+
+
+class ResultCache:
+
+    '''
+    Definition
+    __________
+
+    Class to keep the results of Value Iteration and Policy Iteration in a directory of .npz files, one per result,
+    named after a hash of the compiled transition model and of every solver parameter which changes the result.
+    The utilities are stored as float64, the policy as the index of each action, and the frames recorded by the
+    trace of the solver if there are any, so that a hit also restores the analysis data. The least recently used
+    results are evicted once the directory grows over its size cap. Every file is written next to its final name
+    and renamed over it, and files disappearing under a reader count as misses, so that several processes can share
+    the same directory
+
+
+    Class Attributes
+    ________________
+
+    directory : string
+        Directory holding the cached results
+
+    max_bytes : int
+        Total size of the cached results above which the least recently used ones are evicted
+
+    num_hits : int
+        Number of results found in the cache since it was created
+
+    num_misses : int
+        Number of results not found in the cache since it was created
+
+
+    Methods
+    _______
+
+    get_parameters(solver, error) : Returns the name of the algorithm and the parameters which change its result
+
+    get_key(solver, mdp, error) : Returns the key of the result of a solver on an environment
+
+    get_path(key) : Returns the path of the file holding a cached result
+
+    load(key, mdp, trace) : Returns a cached result, or None if it is not in the cache
+
+    save(key, mdp, result, trace) : Adds a result to the cache, evicting the least recently used ones if needed
+
+    evict() : Removes the least recently used results until the cache is below its size cap
+
+    solve_mdp(solver, mdp, error) : Returns the cached result of a solver, solving and caching it on a miss
+
+    '''
+
+    # attributes of each solver which change its result, besides the error given to solve_mdp()
+    SOLVER_PARAMETERS = {
+        "value_iteration": ("discount_factor", "mode", "sweep_order", "prune_unreachable"),
+        "policy_iteration": ("discount_factor", "num_policy_eval_iters", "evaluation", "linear_solver",
+                             "eval_tolerance", "prune_unreachable")
+    }
+
+    def __init__(self, directory, max_bytes=1 << 28):
+        '''
+        Definition
+        __________
+
+        Initializes the ResultCache class
+
+
+        Parameters
+        __________
+
+        directory : string
+            Directory holding the cached results, created if needed
+
+        max_bytes : int
+            Total size of the cached results above which the least recently used ones are evicted
+
+        '''
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def get_parameters(self, solver, error=None):
+        '''
+        Definition
+        __________
+
+        Returns the name of the algorithm of a solver, along with a dictionary of the parameters which change its
+        result. The backend of Value Iteration and the kernel backend are left out, since every backend gives the
+        same result
+
+
+        Parameters
+        __________
+
+        solver : ValueIteration or PolicyIteration
+            The solver whose result is cached
+
+        error : float
+            The maximum acceptable error passed to ValueIteration.solve_mdp(), or None for Policy Iteration
+
+        '''
+
+        if isinstance(solver, ValueIteration):
+            if solver.buffer_directory is not None:
+                raise ValueError("Memory-mapped results are not cached")
+            algorithm = "value_iteration"
+        elif isinstance(solver, PolicyIteration):
+            algorithm = "policy_iteration"
+        else:
+            raise ValueError("Unknown solver: " + type(solver).__name__)
+
+        parameters = {name: getattr(solver, name) for name in self.SOLVER_PARAMETERS[algorithm]}
+        if algorithm == "value_iteration":
+            parameters["error"] = error
+
+        # the recorded frames are part of the result, so they depend on how the trace records them
+        if solver.trace.mode != "off":
+            parameters["trace"] = [solver.trace.mode, solver.trace.interval, solver.trace.capacity]
+
+        return algorithm, parameters
+
+    def get_key(self, solver, mdp, error=None):
+        '''
+        Definition
+        __________
+
+        Returns the key of the result of a solver on an environment, as the hexadecimal SHA-256 hash of the arrays of
+        the transition model swept by the solver, of the actions, and of the parameters of the solver
+
+
+        Parameters
+        __________
+
+        solver : ValueIteration or PolicyIteration
+            The solver whose result is cached
+
+        mdp : Environment
+            The environment of the Markov Decision Process
+
+        error : float
+            The maximum acceptable error passed to ValueIteration.solve_mdp(), or None for Policy Iteration
+
+        '''
+
+        algorithm, parameters = self.get_parameters(solver, error)
+        transition_model = solver.get_transition_model(mdp)
+
+        key_hash = hashlib.sha256()
+        key_hash.update(json.dumps([CACHE_VERSION, algorithm, parameters, transition_model.height,
+                                    transition_model.width, [list(action) for action in mdp.get_actions()]],
+                                   sort_keys=True).encode())
+
+        # the compiled arrays, with their type and shape, so that equal bytes of different arrays never collide
+        arrays = [transition_model.indptr, transition_model.indices, transition_model.probabilities,
+                  transition_model.rewards, transition_model.walls]
+        if transition_model.states is not None:
+            arrays.append(transition_model.states)
+        for array in arrays:
+            array = np.ascontiguousarray(array)
+            key_hash.update((array.dtype.str + str(array.shape)).encode())
+            key_hash.update(array.data)
+
+        return key_hash.hexdigest()
+
+    def get_path(self, key):
+        '''
+        Definition
+        __________
+
+        Returns the path of the file holding a cached result
+
+
+        Parameters
+        __________
+
+        key : string
+            Key returned by get_key()
+
+        '''
+
+        return os.path.join(self.directory, key + ".npz")
+
+    def load(self, key, mdp, trace=None):
+        '''
+        Definition
+        __________
+
+        Returns a cached result in the same format as the solver, or None if it is not in the cache. A hit marks the
+        result as recently used, and restores its recorded frames into the trace if one is given
+
+
+        Parameters
+        __________
+
+        key : string
+            Key returned by get_key()
+
+        mdp : Environment
+            The environment of the Markov Decision Process, whose actions the policy is stored as indices of
+
+        trace : TraceRecorder
+            Trace to restore the recorded frames into, or None
+
+        '''
+
+        path = self.get_path(key)
+        try:
+            with np.load(path) as arrays:
+                actions = mdp.get_actions()
+                result = {
+                    "utilities": arrays["utilities"].tolist(),
+                    "optimal_policy": [[actions[action_index] for action_index in policy_row]
+                                       for policy_row in arrays["policy"].tolist()]
+                }
+                for name in arrays.files:
+                    if name.startswith("result_"):
+                        result[name[len("result_"):]] = arrays[name].item()
+
+                if trace is not None and "frames" in arrays.files:
+                    trace.restore(arrays["frames"], arrays["sweeps"], int(arrays["num_sweeps"]))
+
+            # mark the result as recently used
+            os.utime(path)
+
+        # the result is missing, or has been evicted or replaced by another process while being read
+        except (OSError, KeyError, ValueError):
+            self.num_misses += 1
+            return None
+
+        self.num_hits += 1
+        return result
+
+    def save(self, key, mdp, result, trace=None):
+        '''
+        Definition
+        __________
+
+        Adds a result to the cache, along with the frames recorded by the trace if there are any, and evicts the
+        least recently used results if the cache has grown over its size cap
+
+
+        Parameters
+        __________
+
+        key : string
+            Key returned by get_key()
+
+        mdp : Environment
+            The environment of the Markov Decision Process, whose actions the policy is stored as indices of
+
+        result : dict
+            Result returned by the solver
+
+        trace : TraceRecorder
+            Trace whose recorded frames are saved, or None
+
+        '''
+
+        actions = mdp.get_actions()
+        arrays = {
+            "utilities": np.array(result["utilities"], dtype=np.float64),
+            "policy": np.array([[actions.index(action) for action in policy_row]
+                                for policy_row in result["optimal_policy"]], dtype=np.int8)
+        }
+
+        # every other entry of the result is a scalar, such as the number of iterations
+        for name, value in result.items():
+            if name not in ("utilities", "optimal_policy"):
+                arrays["result_" + name] = np.array(value)
+
+        if trace is not None and trace.num_frames > 0:
+            arrays["frames"] = trace.get_frames()
+            arrays["sweeps"] = trace.get_sweeps()
+            arrays["num_sweeps"] = np.array(trace.num_sweeps)
+
+        # write to a file unique to this process, and rename it over the entry in one step
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as cache_file:
+                np.savez(cache_file, **arrays)
+            os.replace(temporary_path, self.get_path(key))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        '''
+        Definition
+        __________
+
+        Removes the least recently used results until the total size of the cache is below its size cap. Files
+        removed by another process in the meantime are skipped
+
+        '''
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".npz"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_bytes -= size
+
+    def solve_mdp(self, solver, mdp, error=None):
+        '''
+        Definition
+        __________
+
+        Returns the result of a solver on an environment from the cache, restoring the analysis data into the trace
+        of the solver, or solves it and adds it to the cache on a miss
+
+
+        Parameters
+        __________
+
+        solver : ValueIteration or PolicyIteration
+            The solver whose result is cached
+
+        mdp : Environment
+            The environment of the Markov Decision Process to solve
+
+        error : float
+            The maximum acceptable error passed to ValueIteration.solve_mdp(), or None for Policy Iteration
+
+        '''
+
+        key = self.get_key(solver, mdp, error)
+        trace = solver.trace if solver.trace.mode != "off" else None
+        result = self.load(key, mdp, trace)
+        if result is not None:
+            return result
+
+        result = solver.solve_mdp(mdp, error) if isinstance(solver, ValueIteration) else solver.solve_mdp(mdp)
+        self.save(key, mdp, result, trace)
+        return result
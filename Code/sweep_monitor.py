@@ -0,0 +1,276 @@
+import json
+import time
+import numpy as np
+from algorithms import kernels
+
+
+class SweepMonitor:
+
+    '''
+    Definition
+    __________
+
+    Class to report live telemetry from a solver. An event is sent to every callback when the solve starts, after
+    every sweep and when the solve finishes, each event being a dictionary. Sweep events hold the sweep index, the
+    maximum residual, the number of cells whose greedy action changed (if tracked) and the time taken by the sweep,
+    split into the time spent gathering the successors of each state from the transition model and the time spent
+    on the rest of the arithmetic wherever the solver can tell them apart
+
+
+    Class Attributes
+    ________________
+
+    callbacks : list
+        Functions called with each event
+
+    stream : file
+        Optional text stream each event is also written to, as one JSON object per line
+
+    track_policy_changes : bool
+        Whether to count the cells whose greedy action changed after each sweep of Value Iteration, which costs one
+        extra pass over the transition model per sweep. Policy Iteration always reports them
+
+    algorithm : string
+        Name of the solver being monitored
+
+    greedy_actions : one-dimensional numpy array
+        Greedy action of every state after the previous sweep, when policy changes are tracked
+
+    num_sweeps : int
+        Number of sweeps reported since start()
+
+    sweep_time : float
+        Total time of the sweeps reported since start()
+
+    start_time : float
+        Value of time.perf_counter() when start() was called
+
+
+    Methods
+    _______
+
+    add_callback(callback) : Adds a function to be called with each event
+
+    start(algorithm, transition_model, setup_time) : Sends the event starting a solve
+
+    count_policy_changes(transition_model, utilities) : Returns the number of cells whose greedy action changed
+
+    record_sweep(iteration, max_residual, sweep_time, num_policy_changes, **timings) : Sends the event of a sweep
+
+    finish(num_iters, num_backups) : Sends the event finishing a solve
+
+    '''
+
+    def __init__(self, callbacks=(), stream=None, track_policy_changes=False):
+        '''
+        Definition
+        __________
+
+        Initializes the SweepMonitor class
+
+
+        Parameters
+        __________
+
+        callbacks : iterable
+            Functions called with each event
+
+        stream : file
+            Optional text stream each event is also written to, as one JSON object per line
+
+        track_policy_changes : bool
+            Whether to count the cells whose greedy action changed after each sweep of Value Iteration
+
+        '''
+
+        self.callbacks = list(callbacks)
+        self.stream = stream
+        self.track_policy_changes = track_policy_changes
+        self.algorithm = None
+        self.greedy_actions = None
+        self.num_sweeps = 0
+        self.sweep_time = 0
+        self.start_time = None
+
+    def add_callback(self, callback):
+        '''
+        Definition
+        __________
+
+        Adds a function to be called with each event
+
+
+        Parameters
+        __________
+
+        callback : function
+            Function taking the event dictionary as its only argument
+
+        '''
+
+        self.callbacks.append(callback)
+
+    def emit(self, event):
+        '''
+        Definition
+        __________
+
+        Sends an event to every callback and to the stream
+
+
+        Parameters
+        __________
+
+        event : dict
+            The event to send
+
+        '''
+
+        for callback in self.callbacks:
+            callback(event)
+
+        if self.stream is not None:
+            self.stream.write(json.dumps(event) + "\n")
+            self.stream.flush()
+
+    def start(self, algorithm, transition_model, setup_time=0):
+        '''
+        Definition
+        __________
+
+        Clears the monitor and sends the event starting a solve
+
+
+        Parameters
+        __________
+
+        algorithm : string
+            Name of the solver being monitored
+
+        transition_model : TransitionModel
+            The compiled transition model of the environment being solved
+
+        setup_time : float
+            Time spent retrieving the compiled transition model before the first sweep
+
+        '''
+
+        self.algorithm = algorithm
+        self.greedy_actions = None
+        self.num_sweeps = 0
+        self.sweep_time = 0
+        self.start_time = time.perf_counter()
+
+        self.emit({
+            "event": "start",
+            "algorithm": algorithm,
+            "num_states": transition_model.num_states,
+            "num_free_states": int((~transition_model.walls).sum()),
+            "kernel_backend": kernels.KERNEL_BACKEND,
+            "setup_time": setup_time
+        })
+
+    def count_policy_changes(self, transition_model, utilities):
+        '''
+        Definition
+        __________
+
+        Returns the number of cells whose greedy action changed since the previous call, every non-wall cell
+        counting as changed the first time, or None if policy changes are not tracked
+
+
+        Parameters
+        __________
+
+        transition_model : TransitionModel
+            The compiled transition model of the environment being solved
+
+        utilities : list or one-dimensional numpy array
+            The utility value of each flat state
+
+        '''
+
+        if not self.track_policy_changes:
+            return None
+
+        greedy_actions = kernels.get_greedy_actions(transition_model, np.asarray(utilities, dtype=np.float64))
+        if self.greedy_actions is None:
+            num_policy_changes = int((greedy_actions >= 0).sum())
+        else:
+            num_policy_changes = int((greedy_actions != self.greedy_actions).sum())
+
+        self.greedy_actions = greedy_actions
+        return num_policy_changes
+
+    def record_sweep(self, iteration, max_residual, sweep_time, num_policy_changes=None, **timings):
+        '''
+        Definition
+        __________
+
+        Sends the event of a sweep
+
+
+        Parameters
+        __________
+
+        iteration : int
+            Index of the sweep, counted the same way as the num_iters of the solver
+
+        max_residual : float
+            Maximum change in utility during the sweep
+
+        sweep_time : float
+            Time taken by the sweep
+
+        num_policy_changes : int
+            Number of cells whose action changed, or None if not tracked
+
+        **timings : float
+            Breakdown of the time taken by the sweep, such as 'lookup_time' and 'arithmetic_time'
+
+        '''
+
+        self.num_sweeps += 1
+        self.sweep_time += sweep_time
+
+        event = {
+            "event": "sweep",
+            "algorithm": self.algorithm,
+            "iteration": iteration,
+            "max_residual": float(max_residual),
+            "num_policy_changes": num_policy_changes,
+            "sweep_time": sweep_time
+        }
+        event.update(timings)
+        self.emit(event)
+
+    def finish(self, num_iters, num_backups):
+        '''
+        Definition
+        __________
+
+        Sends the event finishing a solve, with the total time of the solve and of its sweeps
+
+
+        Parameters
+        __________
+
+        num_iters : int
+            Number of iterations reported by the solver
+
+        num_backups : int
+            Number of state backups carried out by the solver
+
+        '''
+
+        total_time = time.perf_counter() - self.start_time
+        self.emit({
+            "event": "finish",
+            "algorithm": self.algorithm,
+            "num_iters": num_iters,
+            "num_backups": num_backups,
+            "num_sweeps": self.num_sweeps,
+            "sweep_time": self.sweep_time,
+            "total_time": total_time,
+            "backups_per_second": num_backups / self.sweep_time if self.sweep_time > 0 else None
+        })
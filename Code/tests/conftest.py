@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules of the program are imported from the directory of main.py, as when it is run
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
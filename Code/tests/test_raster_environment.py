@@ -0,0 +1,43 @@
+import numpy as np
+
+from algorithms.multigrid_value_iteration import MultigridValueIteration
+from raster_environment import from_environment, load_raster, save_raster
+from trace_recorder import TraceRecorder
+from test_solvers import DISCOUNT_FACTOR, ERROR, make_environment
+
+
+def test_chunked_raster_compile_matches_environment(tmp_path):
+    mdp = make_environment()
+    expected = mdp.compile_transition_model()
+    transition_model = from_environment(mdp, storage_directory=str(tmp_path), chunk_size=10).compile_transition_model()
+
+    for name in ("indptr", "indices", "probabilities", "walls"):
+        assert np.array_equal(getattr(transition_model, name), getattr(expected, name))
+    assert np.allclose(transition_model.rewards, expected.rewards)
+    assert sorted(path.name for path in tmp_path.iterdir()) == \
+        ["indices.npy", "indptr.npy", "probabilities.npy", "rewards.npy", "walls.npy"]
+
+
+def test_raster_coarsen_matches_list_environment(tmp_path):
+    mdp = make_environment(23, 17, per_cell_slip=False)
+    save_raster(str(tmp_path), mdp.grid, mdp.rewards)
+    raster_mdp = load_raster(str(tmp_path), mdp.get_actions())
+
+    coarse, raster_coarse = mdp.coarsen(3, 2), raster_mdp.coarsen(3, 2)
+    assert raster_coarse.grid == coarse.grid
+    assert np.allclose(raster_coarse.rewards, coarse.rewards)
+
+
+def test_raster_multigrid_solves_coarse_levels(tmp_path):
+    mdp = make_environment(23, 17, per_cell_slip=False)
+    save_raster(str(tmp_path), mdp.grid, mdp.rewards)
+    raster_mdp = load_raster(str(tmp_path), mdp.get_actions())
+
+    solver = MultigridValueIteration(DISCOUNT_FACTOR, num_levels=None, min_size=2, trace=TraceRecorder("off"))
+    assert len(solver.get_levels(raster_mdp)) > 1
+    result = solver.solve_mdp(raster_mdp, ERROR)
+    expected = MultigridValueIteration(DISCOUNT_FACTOR, num_levels=None, min_size=2,
+                                       trace=TraceRecorder("off")).solve_mdp(mdp, ERROR)
+
+    assert np.abs(np.array(result["utilities"]) - np.array(expected["utilities"])).max() < 1e-6
+    assert result["optimal_policy"] == expected["optimal_policy"]
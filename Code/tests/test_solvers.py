@@ -0,0 +1,221 @@
+import random
+import numpy as np
+import pytest
+
+from algorithms.multigrid_value_iteration import MultigridValueIteration
+from algorithms.parallel_value_iteration import ParallelValueIteration
+from algorithms.policy_iteration import PolicyIteration
+from algorithms.value_iteration import ValueIteration
+from checkpoint import Checkpoint
+from environment import Environment
+from trace_recorder import TraceRecorder
+
+ACTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+REWARD_MAPPING = {"wall": 0, "G": 1, "B": -1, "": -0.04}
+DISCOUNT_FACTOR = 0.95
+ERROR = 0.01
+
+
+def make_environment(height=7, width=11, seed=0, per_cell_slip=True):
+    '''
+    Definition
+    __________
+
+    Returns a seeded random Environment on a grid which is not square, with slip probabilities drawn per cell
+
+
+    Parameters
+    __________
+
+    height : int
+        Height of the grid
+
+    width : int
+        Width of the grid
+
+    seed : int
+        Seed of the random cells and slip probabilities
+
+    per_cell_slip : bool
+        Whether every cell gets its own slip probabilities, rather than the default ones
+
+    '''
+
+    rng = random.Random(seed)
+    grid = [[rng.choice(["", "", "", "wall", "G", "B"]) for _ in range(width)] for _ in range(height)]
+    rewards = [[REWARD_MAPPING[cell] for cell in grid_row] for grid_row in grid]
+
+    slip_probabilities = None
+    if per_cell_slip:
+        slip_probabilities = np.random.default_rng(seed).dirichlet((8, 1, 1, 0.5), size=(height, width))
+
+    return Environment(grid, height, width, ACTIONS, rewards, slip_probabilities)
+
+
+def solve_baseline(mdp, error=ERROR / 10):
+    '''
+    Definition
+    __________
+
+    Returns the utilities of the baseline synchronous Value Iteration, solved to a tenth of ERROR
+
+
+    Parameters
+    __________
+
+    mdp : Environment
+        The environment to solve
+
+    error : float
+        The maximum acceptable error in utility value for each cell
+
+    '''
+
+    result = ValueIteration(DISCOUNT_FACTOR, trace=TraceRecorder("off")).solve_mdp(mdp, error)
+    return np.array(result["utilities"], dtype=np.float64)
+
+
+def test_compiled_transition_model_matches_get_transition_model():
+    mdp = make_environment()
+    transition_model = mdp.get_compiled_transition_model()
+
+    for row in range(mdp.get_grid_height()):
+        for col in range(mdp.get_grid_width()):
+            state = transition_model.get_state(row, col)
+            for action_index, action in enumerate(mdp.get_actions()):
+                indices, probabilities = transition_model.get_successors(state, action_index)
+                compiled = {}
+                for index, probability in zip(indices.tolist(), probabilities.tolist()):
+                    cell = transition_model.get_cell(index)
+                    compiled[cell] = compiled.get(cell, 0) + probability
+
+                # walls have no successors in the compiled model
+                if mdp.is_wall(row, col):
+                    assert compiled == {}
+                    continue
+
+                expected = {cell: probability for cell, probability in
+                            mdp.get_transition_model(row, col, action).items() if probability > 0}
+                assert compiled.keys() == expected.keys()
+                for cell, probability in expected.items():
+                    assert compiled[cell] == pytest.approx(probability)
+
+
+SOLVERS = {
+    "vi_numpy": lambda tmp_path: ValueIteration(DISCOUNT_FACTOR, backend="numpy", trace=TraceRecorder("off")),
+    "vi_gauss_seidel": lambda tmp_path: ValueIteration(DISCOUNT_FACTOR, mode="gauss_seidel",
+                                                       trace=TraceRecorder("off")),
+    "vi_goal_distance": lambda tmp_path: ValueIteration(DISCOUNT_FACTOR, mode="gauss_seidel",
+                                                        sweep_order="goal_distance", trace=TraceRecorder("off")),
+    "vi_prioritized": lambda tmp_path: ValueIteration(DISCOUNT_FACTOR, mode="prioritized",
+                                                      trace=TraceRecorder("off")),
+    "vi_topological": lambda tmp_path: ValueIteration(DISCOUNT_FACTOR, mode="topological",
+                                                      trace=TraceRecorder("off")),
+    "vi_pruned": lambda tmp_path: ValueIteration(DISCOUNT_FACTOR, prune_unreachable=True,
+                                                 trace=TraceRecorder("off")),
+    "vi_memmap": lambda tmp_path: ValueIteration(DISCOUNT_FACTOR, buffer_directory=str(tmp_path), chunk_size=16),
+    "parallel_vi": lambda tmp_path: ParallelValueIteration(DISCOUNT_FACTOR, num_workers=2,
+                                                           trace=TraceRecorder("off")),
+    "multigrid_vi": lambda tmp_path: MultigridValueIteration(DISCOUNT_FACTOR, num_levels=None, min_size=2,
+                                                             trace=TraceRecorder("off")),
+}
+
+POLICY_SOLVERS = {
+    "pi_iterative": dict(evaluation="iterative"),
+    "pi_exact": dict(evaluation="exact"),
+    "pi_bicgstab": dict(evaluation="exact", linear_solver="bicgstab"),
+    "pi_modified": dict(evaluation="modified", error=ERROR),
+}
+
+
+@pytest.mark.parametrize("name", sorted(SOLVERS))
+def test_value_iteration_solvers_match_baseline(name, tmp_path):
+    mdp = make_environment()
+    result = SOLVERS[name](tmp_path).solve_mdp(mdp, ERROR)
+    assert np.abs(np.array(result["utilities"], dtype=np.float64) - solve_baseline(mdp)).max() < ERROR
+
+
+@pytest.mark.parametrize("name", sorted(POLICY_SOLVERS))
+def test_policy_iteration_solvers_match_baseline(name):
+    mdp = make_environment()
+    result = PolicyIteration(DISCOUNT_FACTOR, 200, trace=TraceRecorder("off"), **POLICY_SOLVERS[name]).solve_mdp(mdp)
+    assert np.abs(np.array(result["utilities"], dtype=np.float64) - solve_baseline(mdp)).max() < ERROR
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashingCheckpoint(Checkpoint):
+
+    '''
+    Definition
+    __________
+
+    Checkpoint which raises Crash after a number of saves, to interrupt a solve
+
+    '''
+
+    def __init__(self, file_path, interval, num_saves):
+        super().__init__(file_path, interval)
+        self.num_saves = num_saves
+
+    def save(self, *args, **state):
+        super().save(*args, **state)
+        self.num_saves -= 1
+        if self.num_saves == 0:
+            raise Crash()
+
+
+@pytest.mark.parametrize("options", [dict(), dict(backend="numpy"), dict(mode="gauss_seidel")])
+def test_value_iteration_resume_matches_uninterrupted_run(options, tmp_path):
+    mdp = make_environment()
+    path = str(tmp_path / "checkpoint.npz")
+    full = ValueIteration(DISCOUNT_FACTOR, trace=TraceRecorder("off"), **options).solve_mdp(mdp, ERROR)
+
+    with pytest.raises(Crash):
+        ValueIteration(DISCOUNT_FACTOR, trace=TraceRecorder("off"), checkpoint=CrashingCheckpoint(path, 10, 2),
+                       **options).solve_mdp(mdp, ERROR)
+    resumed = ValueIteration(DISCOUNT_FACTOR, trace=TraceRecorder("off"), **options).solve_mdp(
+        mdp, ERROR, resume_from=Checkpoint(path))
+
+    assert resumed == full
+
+
+@pytest.mark.parametrize("options", [dict(), dict(evaluation="exact"), dict(evaluation="modified")])
+def test_policy_iteration_resume_matches_uninterrupted_run(options, tmp_path):
+    mdp = make_environment()
+    path = str(tmp_path / "checkpoint.npz")
+    full = PolicyIteration(DISCOUNT_FACTOR, 20, trace=TraceRecorder("off"), **options).solve_mdp(mdp)
+
+    with pytest.raises(Crash):
+        PolicyIteration(DISCOUNT_FACTOR, 20, trace=TraceRecorder("off"), checkpoint=CrashingCheckpoint(path, 1, 1),
+                        **options).solve_mdp(mdp)
+    resumed = PolicyIteration(DISCOUNT_FACTOR, 20, trace=TraceRecorder("off"), **options).solve_mdp(
+        mdp, resume_from=Checkpoint(path))
+
+    for key in ("num_iters", "utilities", "optimal_policy"):
+        assert resumed[key] == full[key]
+
+
+def test_set_cell_and_incremental_solve_match_fresh_solve():
+    mdp = make_environment(per_cell_slip=False)
+    solver = ValueIteration(DISCOUNT_FACTOR, trace=TraceRecorder("off"))
+    result = solver.solve_mdp(mdp, ERROR)
+    mdp.pop_changed_states()
+
+    rng = random.Random(1)
+    for _ in range(5):
+        row, col = rng.randrange(mdp.get_grid_height()), rng.randrange(mdp.get_grid_width())
+        cell = rng.choice(["wall", "G", "B", ""])
+        mdp.set_cell(row, col, cell, REWARD_MAPPING[cell])
+
+        # the patched transition model matches one compiled from scratch
+        fresh_mdp = Environment([list(grid_row) for grid_row in mdp.grid], mdp.get_grid_height(),
+                                mdp.get_grid_width(), ACTIONS, [list(reward_row) for reward_row in mdp.rewards])
+        patched, compiled = mdp.get_compiled_transition_model(), fresh_mdp.get_compiled_transition_model()
+        for name in ("indptr", "indices", "probabilities", "rewards", "walls"):
+            assert np.array_equal(getattr(patched, name), getattr(compiled, name))
+
+        result = solver.solve_mdp_incremental(mdp, ERROR, result)
+        assert np.abs(np.array(result["utilities"], dtype=np.float64) - solve_baseline(fresh_mdp)).max() < ERROR
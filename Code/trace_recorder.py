@@ -0,0 +1,280 @@
+import numpy as np
+
+
+class TraceRecorder:
+
+    '''
+    Definition
+    __________
+
+    Class to record the utility of each cell across the sweeps of a solver, for future analysis
+
+
+    Class Attributes
+    ________________
+
+    mode : string
+        Recording mode - 'off' to record nothing, 'full' to record every sweep, 'every_nth' to record one sweep
+        out of every interval sweeps, 'ring' to only keep the most recent capacity recorded sweeps
+
+    interval : int
+        Number of sweeps between two recorded sweeps in the 'every_nth' mode
+
+    capacity : int
+        Number of sweeps kept by the 'ring' mode, and initial number of sweeps allocated by the 'full' mode
+
+    height : int
+        Height of the grid being recorded
+
+    width : int
+        Width of the grid being recorded
+
+    stream : DataStream
+        Optional stream which every recorded sweep is also written to, as the solver runs
+
+    frames : three-dimensional numpy array
+        Preallocated float64 buffer of shape [frames, height, width] holding the recorded utilities
+
+    sweeps : one-dimensional numpy array
+        Sweep index of each frame in the buffer
+
+    num_sweeps : int
+        Number of sweeps passed to record() since start()
+
+    num_frames : int
+        Number of frames written to the buffer since start()
+
+
+    Methods
+    _______
+
+    start(height, width) : Clears the recorder and allocates its buffer for a grid of the specified size
+
+    is_started() : Returns whether start() has been called
+
+    record(utilities) : Records the utilities of every cell after a sweep
+
+    get_frames() : Returns the recorded utilities in chronological order, as an array of shape [frames, height, width]
+
+    get_sweeps() : Returns the sweep index of each recorded frame
+
+    to_dict() : Returns the recorded utilities in the format expected by DataRecorder
+
+    restore(frames, sweeps, num_sweeps) : Replaces the recorded utilities with frames recorded earlier
+
+    '''
+
+    MODES = ("off", "full", "every_nth", "ring")
+
+    def __init__(self, mode="full", interval=1, capacity=128, stream=None):
+        '''
+        Definition
+        __________
+
+        Initializes the TraceRecorder class
+
+
+        Parameters
+        __________
+
+        mode : string
+            Recording mode - 'off', 'full', 'every_nth' or 'ring'
+
+        interval : int
+            Number of sweeps between two recorded sweeps in the 'every_nth' mode
+
+        capacity : int
+            Number of sweeps kept by the 'ring' mode, and initial number of sweeps allocated by the 'full' mode
+
+        stream : DataStream
+            Optional stream which every recorded sweep is also written to, as the solver runs. Combined with the
+            'off' mode, sweeps are only kept on disk
+
+        '''
+
+        if mode not in self.MODES:
+            raise ValueError("Unknown trace recorder mode: " + str(mode))
+
+        self.mode = mode
+        self.interval = max(int(interval), 1)
+        self.capacity = max(int(capacity), 1)
+        self.height = None
+        self.width = None
+        self.stream = stream
+        self.frames = None
+        self.sweeps = None
+        self.num_sweeps = 0
+        self.num_frames = 0
+
+    def start(self, height, width):
+        '''
+        Definition
+        __________
+
+        Clears the recorder and allocates its buffer for a grid of the specified size
+
+
+        Parameters
+        __________
+
+        height : int
+            Height of the grid
+
+        width : int
+            Width of the grid
+
+        '''
+
+        self.height = height
+        self.width = width
+        self.num_sweeps = 0
+        self.num_frames = 0
+
+        num_frames = 0 if self.mode == "off" else self.capacity
+        self.frames = np.zeros((num_frames, height, width), dtype=np.float64)
+        self.sweeps = np.zeros(num_frames, dtype=np.int64)
+
+    def is_started(self):
+        '''
+        Definition
+        __________
+
+        Returns whether start() has been called
+
+        '''
+
+        return self.frames is not None
+
+    def record(self, utilities):
+        '''
+        Definition
+        __________
+
+        Records the utilities of every cell after a sweep, or ignores them if the mode says this sweep is not kept.
+        The first call after start() is sweep 0, usually the initial utilities
+
+
+        Parameters
+        __________
+
+        utilities : list or numpy array
+            The utility of each cell, either flat in row major order or as a two-dimensional grid
+
+        '''
+
+        sweep = self.num_sweeps
+        self.num_sweeps += 1
+
+        if self.mode == "every_nth" and sweep % self.interval != 0:
+            return
+
+        if self.stream is not None:
+            self.stream.write(utilities, sweep)
+
+        if self.mode == "off":
+            return
+
+        if self.mode == "ring":
+            position = self.num_frames % self.capacity
+        else:
+            position = self.num_frames
+
+            # grow the buffer geometrically once it is full
+            if position == self.frames.shape[0]:
+                self.frames = np.concatenate(
+                    (self.frames, np.zeros_like(self.frames)))
+                self.sweeps = np.concatenate(
+                    (self.sweeps, np.zeros_like(self.sweeps)))
+
+        self.frames[position] = np.reshape(utilities, (self.height, self.width))
+        self.sweeps[position] = sweep
+        self.num_frames += 1
+
+    def get_frames(self):
+        '''
+        Definition
+        __________
+
+        Returns the recorded utilities in chronological order, as an array of shape [frames, height, width]
+
+        '''
+
+        if self.frames is None:
+            return np.zeros((0, 0, 0))
+
+        # a ring buffer which has wrapped around starts at the oldest frame
+        if self.mode == "ring" and self.num_frames > self.capacity:
+            start = self.num_frames % self.capacity
+            return np.concatenate((self.frames[start:], self.frames[:start]))
+
+        return self.frames[:self.num_frames]
+
+    def get_sweeps(self):
+        '''
+        Definition
+        __________
+
+        Returns the sweep index of each recorded frame, in the same order as get_frames()
+
+        '''
+
+        if self.sweeps is None:
+            return np.zeros(0, dtype=np.int64)
+
+        if self.mode == "ring" and self.num_frames > self.capacity:
+            start = self.num_frames % self.capacity
+            return np.concatenate((self.sweeps[start:], self.sweeps[:start]))
+
+        return self.sweeps[:self.num_frames]
+
+    def to_dict(self):
+        '''
+        Definition
+        __________
+
+        Returns the recorded utilities as a dictionary mapping each cell, formatted as "(col,row)", to the list of its
+        recorded utilities, which is the format expected by DataRecorder.record(). A leading "sweep" entry lists the
+        sweep index of each recorded frame, so that 'every_nth' and 'ring' traces keep their sweep indices
+
+        '''
+
+        frames = self.get_frames()
+        if frames.size == 0:
+            return {}
+
+        analysis_data = {"sweep": self.get_sweeps().tolist()}
+        for row in range(self.height):
+            row_frames = frames[:, row, :].T.tolist()
+            for col in range(self.width):
+                analysis_data["(" + str(col) + "," + str(row) + ")"] = row_frames[col]
+
+        return analysis_data
+
+    def restore(self, frames, sweeps, num_sweeps):
+        '''
+        Definition
+        __________
+
+        Replaces the recorded utilities with frames recorded earlier by a trace of the same mode, such as the frames
+        of a cached result, as if the sweeps had just been recorded. The stream is not written to
+
+
+        Parameters
+        __________
+
+        frames : three-dimensional numpy array
+            Recorded utilities in chronological order, of shape [frames, height, width]
+
+        sweeps : one-dimensional numpy array
+            Sweep index of each frame
+
+        num_sweeps : int
+            Number of sweeps passed to record() when the frames were recorded
+
+        '''
+
+        self.height, self.width = frames.shape[1:]
+        self.frames = np.array(frames, dtype=np.float64)
+        self.sweeps = np.array(sweeps, dtype=np.int64)
+        self.num_frames = frames.shape[0]
+        self.num_sweeps = num_sweeps
@@ -0,0 +1,618 @@
+import numpy as np
+
+
+class TransitionModel:
+
+    '''
+    Definition
+    __________
+
+    Class to hold the compiled transition model P(s'|s,a) of an Environment as a sparse CSR-style structure
+
+
+    Class Attributes
+    ________________
+
+    height : int
+        Height of the grid
+
+    width : int
+        Width of the grid
+
+    actions : list
+        A list of possible actions - UP, DOWN, LEFT, RIGHT
+
+    num_states : int
+        Number of flat states, with state = row * width + col unless the model has been restricted to a subset of
+        the cells
+
+    states : one-dimensional numpy array
+        Flat cell index, row * width + col, of each state of a model restricted with restrict(), or None when every
+        cell of the grid is a state
+
+    state_indices : one-dimensional numpy array
+        State of each flat cell index in a restricted model, or -1 for the cells left out, or None
+
+    num_actions : int
+        Number of possible actions
+
+    indptr : one-dimensional numpy array
+        Row pointers of the CSR structure, with one row per (action, state) pair, stored as one block per action
+
+    indices : one-dimensional numpy array
+        Flat index of the successor state for each non-zero transition
+
+    probabilities : one-dimensional numpy array
+        Probability of each non-zero transition
+
+    rewards : one-dimensional numpy array
+        The reward at each flat state
+
+    walls : one-dimensional numpy array
+        Whether each flat state is a wall or not
+
+
+    Methods
+    _______
+
+    get_state(row, col) : Returns the flat state index of a particular cell in the grid
+
+    get_cell(state) : Returns the (row, col) coordinates of a flat state index
+
+    get_successors(state, action_index) : Returns the successor states and probabilities for a particular state and action
+
+    get_python_arrays() : Returns the CSR arrays as python lists, for use inside pure python loops
+
+    get_padded_arrays() : Returns the successor states and probabilities as dense arrays padded to a fixed width
+
+    get_padded_block(start, end) : Returns the padded successor states and probabilities of a contiguous block of
+    states, reading the CSR arrays directly
+
+    get_action_utilities(utilities) : Returns the expected utility of the successor state for every action and state,
+    optionally for a whole batch of utility vectors at once
+
+    get_action_utilities_block(utilities, start, end) : Returns the expected utility of the successor state for every
+    action and a contiguous block of states, reading the CSR arrays directly
+
+    get_predecessors() : Returns, for every state, the states which can transition into it under some action
+
+    get_components() : Returns the strongly connected components of the non-wall states, in reverse topological order
+
+    replace_rows(states, counts, indices, probabilities) : Replaces the rows of a subset of the states, after a cell of
+    the grid has changed
+
+    restrict(states) : Returns the transition model restricted to a subset of the states, renumbered densely
+
+    gather(values) : Returns the values of the states of the model, from the values of every cell of the grid
+
+    scatter(values, fill) : Returns the values of every cell of the grid, from the values of the states of the model
+
+    to_grid(values) : Converts a flat list of per-cell values into a two-dimensional list
+
+    '''
+
+    def __init__(self, height, width, actions, indptr, indices, probabilities, rewards, walls, states=None):
+        '''
+        Definition
+        __________
+
+        Initializes the TransitionModel class
+
+
+        Parameters
+        __________
+
+        height : int
+            Height of the grid
+
+        width : int
+            Width of the grid
+
+        actions : list
+            A list of possible actions - UP, DOWN, LEFT, RIGHT
+
+        indptr : one-dimensional numpy array
+            Row pointers of the CSR structure, with one row per (action, state) pair
+
+        indices : one-dimensional numpy array
+            Flat index of the successor state for each non-zero transition
+
+        probabilities : one-dimensional numpy array
+            Probability of each non-zero transition
+
+        rewards : one-dimensional numpy array
+            The reward at each flat state
+
+        walls : one-dimensional numpy array
+            Whether each flat state is a wall or not
+
+        states : one-dimensional numpy array
+            Flat cell index of each state, in increasing order, or None when every cell of the grid is a state
+
+        '''
+
+        self.height = height
+        self.width = width
+        self.actions = actions
+        self.states = states
+        self.state_indices = None
+        if states is None:
+            self.num_states = height * width
+        else:
+            self.num_states = states.size
+            self.state_indices = np.full(height * width, -1, dtype=np.int64)
+            self.state_indices[states] = np.arange(states.size)
+        self.num_actions = len(actions)
+        self.indptr = indptr
+        self.indices = indices
+        self.probabilities = probabilities
+        self.rewards = rewards
+        self.walls = walls
+
+        # python list copies and padded copies of the arrays, built lazily on first use
+        self.python_arrays = None
+        self.padded_arrays = None
+        self.predecessors = None
+        self.components = None
+
+    def get_state(self, row, col):
+        '''
+        Definition
+        __________
+
+        Returns the flat state index of a particular cell in the grid
+
+
+        Parameters
+        __________
+
+        row : int
+            The row (indexed from 0) of the specified state
+
+        col : int
+            The column (indexed from 0) of the specified state
+
+        '''
+
+        if self.states is None:
+            return row * self.width + col
+        return int(self.state_indices[row * self.width + col])
+
+    def get_cell(self, state):
+        '''
+        Definition
+        __________
+
+        Returns the (row, col) coordinates of a flat state index
+
+
+        Parameters
+        __________
+
+        state : int
+            The flat index of the specified state
+
+        '''
+
+        if self.states is None:
+            return divmod(state, self.width)
+        return divmod(int(self.states[state]), self.width)
+
+    def get_successors(self, state, action_index):
+        '''
+        Definition
+        __________
+
+        Returns the successor states and their probabilities for a particular state and action
+
+
+        Parameters
+        __________
+
+        state : int
+            The flat index of the specified state
+
+        action_index : int
+            The index of the action being taken, in the list of actions
+
+        '''
+
+        row = action_index * self.num_states + state
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], self.probabilities[start:end]
+
+    def get_python_arrays(self):
+        '''
+        Definition
+        __________
+
+        Returns the indptr, indices and probabilities arrays as python lists, since indexing
+        numpy arrays element by element inside pure python loops is slow
+
+        '''
+
+        if self.python_arrays is None:
+            self.python_arrays = (self.indptr.tolist(), self.indices.tolist(),
+                                  self.probabilities.tolist())
+        return self.python_arrays
+
+    def get_padded_arrays(self):
+        '''
+        Definition
+        __________
+
+        Returns the successor states and probabilities as arrays of shape (max_successors, num_actions, num_states),
+        so that a Bellman backup over every state and action becomes a few batched gathers. Unused entries
+        point to the state itself with a probability of 0
+
+        '''
+
+        if self.padded_arrays is None:
+            self.padded_arrays = self.get_padded_block(0, self.num_states)
+        return self.padded_arrays
+
+    def get_padded_block(self, start, end):
+        '''
+        Definition
+        __________
+
+        Returns the successor states and probabilities of the states from start to end as arrays of shape
+        (max_successors, num_actions, end - start), padded like get_padded_arrays(). Only the CSR entries of the
+        block are read, so that a worker sweeping one band of the grid does not pad the rows of the whole grid
+
+
+        Parameters
+        __________
+
+        start : int
+            Flat index of the first state of the block
+
+        end : int
+            Flat index one past the last state of the block
+
+        '''
+
+        num_block_states = end - start
+        row_pointers = [np.asarray(self.indptr[action_index * self.num_states + start:
+                                               action_index * self.num_states + end + 1])
+                        for action_index in range(self.num_actions)]
+        max_successors = max([int(np.diff(action_pointers).max(initial=0)) for action_pointers in row_pointers] + [1])
+
+        # pad every row with self transitions of probability 0
+        padded_indices = np.tile(np.arange(start, end), (max_successors, self.num_actions))
+        padded_probabilities = np.zeros((max_successors, self.num_actions * num_block_states))
+        for action_index, action_pointers in enumerate(row_pointers):
+            counts = np.diff(action_pointers)
+            entries = slice(action_pointers[0], action_pointers[-1])
+
+            # row of each non-zero transition, and its position inside the padded row
+            rows = action_index * num_block_states + np.repeat(np.arange(num_block_states), counts)
+            positions = np.arange(action_pointers[0], action_pointers[-1]) - np.repeat(action_pointers[:-1], counts)
+            padded_indices[positions, rows] = self.indices[entries]
+            padded_probabilities[positions, rows] = self.probabilities[entries]
+
+        shape = (max_successors, self.num_actions, num_block_states)
+        return padded_indices.reshape(shape), padded_probabilities.reshape(shape)
+
+    def get_action_utilities(self, utilities):
+        '''
+        Definition
+        __________
+
+        Returns the expected utility of the successor state, sum over s' of P(s'|s,a) * U(s'), for every
+        action and every state at once, as an array of shape (num_actions, num_states). A batch of utility
+        vectors of shape (batch, num_states) gives an array of shape (batch, num_actions, num_states)
+
+
+        Parameters
+        __________
+
+        utilities : numpy array
+            The utility value of each flat state, or a batch of them with the states along the last axis
+
+        '''
+
+        successor_indices, successor_probabilities = self.get_padded_arrays()
+
+        # accumulate one successor slot at a time, in the same order as the CSR rows
+        action_utilities = successor_probabilities[0] * utilities[..., successor_indices[0]]
+        for k in range(1, successor_indices.shape[0]):
+            action_utilities += successor_probabilities[k] * \
+                utilities[..., successor_indices[k]]
+
+        return action_utilities
+
+    def get_action_utilities_block(self, utilities, start, end):
+        '''
+        Definition
+        __________
+
+        Returns the expected utility of the successor state, sum over s' of P(s'|s,a) * U(s'), for every action and
+        the states from start to end, as an array of shape (num_actions, end - start). Only the CSR entries of the
+        block are read, without building the padded arrays, so that memory stays proportional to the block even
+        when the arrays of the transition model and the utilities are memory-mapped. The successors of each row are
+        accumulated in order, giving the same values as get_action_utilities()
+
+
+        Parameters
+        __________
+
+        utilities : one-dimensional numpy array
+            The utility value of each flat state
+
+        start : int
+            Flat index of the first state of the block
+
+        end : int
+            Flat index one past the last state of the block
+
+        '''
+
+        num_block_states = end - start
+        block_rows = np.arange(num_block_states)
+        action_utilities = np.empty((self.num_actions, num_block_states))
+        for action_index in range(self.num_actions):
+            first_row = action_index * self.num_states + start
+            row_pointers = np.asarray(self.indptr[first_row:first_row + num_block_states + 1])
+            entries = slice(row_pointers[0], row_pointers[-1])
+
+            # sum the transitions of each row, bincount adding the weights of each bin in order
+            values = self.probabilities[entries] * utilities[self.indices[entries]]
+            action_utilities[action_index] = np.bincount(np.repeat(block_rows, np.diff(row_pointers)),
+                                                         weights=values, minlength=num_block_states)
+
+        return action_utilities
+
+    def get_predecessors(self):
+        '''
+        Definition
+        __________
+
+        Returns the predecessor index of the transition model as a pair of CSR arrays (indptr, states), where
+        states[indptr[s]:indptr[s + 1]] lists, without duplicates, every state which reaches s with a non-zero
+        probability under some action
+
+        '''
+
+        if self.predecessors is None:
+
+            # (successor, state) pair of every non-zero transition, with duplicates across actions removed
+            states = np.repeat(np.arange(self.indptr.size - 1) % self.num_states, np.diff(self.indptr))
+            pairs = np.unique(self.indices * self.num_states + states)
+            successors, predecessor_states = np.divmod(pairs, self.num_states)
+
+            indptr = np.zeros(self.num_states + 1, dtype=np.int64)
+            np.cumsum(np.bincount(successors, minlength=self.num_states), out=indptr[1:])
+            self.predecessors = (indptr, predecessor_states)
+        return self.predecessors
+
+    def get_components(self):
+        '''
+        Definition
+        __________
+
+        Returns the strongly connected components of the graph of non-zero transitions between the non-wall states,
+        such as the regions separated by walls, as a pair of CSR arrays (indptr, states), where
+        states[indptr[c]:indptr[c + 1]] lists the states of component c in increasing order. Components come in
+        reverse topological order, so that every state only transitions into its own component or earlier ones
+
+        '''
+
+        if self.components is None:
+
+            # scipy is only imported once the components are needed
+            from scipy import sparse
+            from scipy.sparse import csgraph
+
+            # label the strongly connected components of the graph of every non-zero transition
+            states = np.repeat(np.arange(self.indptr.size - 1) % self.num_states, np.diff(self.indptr))
+            graph = sparse.csr_matrix((np.ones(states.size, dtype=np.int8), (states, self.indices)),
+                                      shape=(self.num_states, self.num_states))
+            num_components, labels = csgraph.connected_components(graph, directed=True, connection="strong")
+
+            # edges of the condensed graph, between different components
+            edges = np.unique(labels[states] * num_components + labels[self.indices])
+            sources, targets = np.divmod(edges, num_components)
+            keep = sources != targets
+            sources, targets = sources[keep].tolist(), targets[keep].tolist()
+
+            # topological sort of the condensed graph, starting from the components without outgoing edges
+            num_successors = [0] * num_components
+            predecessors = [[] for component in range(num_components)]
+            for source, target in zip(sources, targets):
+                num_successors[source] += 1
+                predecessors[target].append(source)
+            queue = [component for component in range(num_components) if num_successors[component] == 0]
+            for component in queue:
+                for predecessor in predecessors[component]:
+                    num_successors[predecessor] -= 1
+                    if num_successors[predecessor] == 0:
+                        queue.append(predecessor)
+
+            # position of each component in the order, walls being left out
+            ranks = np.empty(num_components, dtype=np.int64)
+            ranks[np.array(queue, dtype=np.int64)] = np.arange(num_components)
+            free_states = np.flatnonzero(~self.walls)
+            state_ranks = ranks[labels[free_states]]
+            component_states = free_states[np.argsort(state_ranks, kind="stable")]
+
+            # renumber the components that hold some non-wall state, and build the row pointers
+            counts = np.unique(state_ranks, return_counts=True)[1]
+            indptr = np.zeros(counts.size + 1, dtype=np.int64)
+            np.cumsum(counts, out=indptr[1:])
+            self.components = (indptr, component_states)
+        return self.components
+
+    def replace_rows(self, states, counts, indices, probabilities):
+        '''
+        Definition
+        __________
+
+        Replaces the rows of every action for a subset of the states, leaving the other rows untouched, and clears the
+        copies of the arrays built lazily from the old rows. The rewards and walls arrays are updated by the caller
+
+
+        Parameters
+        __________
+
+        states : one-dimensional numpy array
+            The flat indices of the states whose rows are replaced
+
+        counts : two-dimensional numpy array
+            Number of successors of each (action, state) pair, with shape (num_actions, len(states))
+
+        indices : one-dimensional numpy array
+            Successor states of the new rows, one block of rows per action
+
+        probabilities : one-dimensional numpy array
+            Probability of each successor of the new rows
+
+        '''
+
+        old_counts = np.diff(self.indptr)
+        replaced_rows = (np.arange(self.num_actions)[:, None] * self.num_states + states).reshape(-1)
+
+        # row pointers after the replacement
+        new_counts = old_counts.copy()
+        new_counts[replaced_rows] = counts.reshape(-1)
+        indptr = np.zeros(new_counts.size + 1, dtype=np.int64)
+        np.cumsum(new_counts, out=indptr[1:])
+
+        # move the entries of the untouched rows to their new positions
+        old_rows = np.repeat(np.arange(old_counts.size), old_counts)
+        kept = np.ones(old_counts.size, dtype=bool)
+        kept[replaced_rows] = False
+        kept = kept[old_rows]
+        kept_rows = old_rows[kept]
+        kept_positions = indptr[kept_rows] + np.arange(self.indices.size)[kept] - self.indptr[kept_rows]
+
+        # and write the entries of the replaced rows, in order, after them
+        new_rows = np.repeat(replaced_rows, counts.reshape(-1))
+        new_positions = indptr[new_rows] + np.arange(new_rows.size) - \
+            np.repeat(np.cumsum(counts.reshape(-1)) - counts.reshape(-1), counts.reshape(-1))
+
+        new_indices = np.empty(indptr[-1], dtype=self.indices.dtype)
+        new_probabilities = np.empty(indptr[-1], dtype=self.probabilities.dtype)
+        new_indices[kept_positions] = self.indices[kept]
+        new_probabilities[kept_positions] = self.probabilities[kept]
+        new_indices[new_positions] = indices
+        new_probabilities[new_positions] = probabilities
+
+        self.indptr = indptr
+        self.indices = new_indices
+        self.probabilities = new_probabilities
+
+        # the cached copies describe the old rows
+        self.python_arrays = None
+        self.padded_arrays = None
+        self.predecessors = None
+        self.components = None
+
+    def restrict(self, states):
+        '''
+        Definition
+        __________
+
+        Returns a new TransitionModel holding only the given states, renumbered densely in increasing order of their
+        flat index, so that the solvers only sweep over them. The states must be closed under the transitions of
+        the model, such as the states reachable from some start cells, and the model must not be restricted already
+
+
+        Parameters
+        __________
+
+        states : one-dimensional numpy array
+            Flat indices of the states to keep
+
+        '''
+
+        states = np.unique(np.asarray(states, dtype=np.int64))
+        state_indices = np.full(self.num_states, -1, dtype=np.int64)
+        state_indices[states] = np.arange(states.size)
+
+        # rows of the kept states, still one block of rows per action
+        rows = (np.arange(self.num_actions)[:, None] * self.num_states + states).reshape(-1)
+        counts = self.indptr[rows + 1] - self.indptr[rows]
+        indptr = np.zeros(rows.size + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+
+        # position of every entry of the kept rows in the original arrays
+        positions = np.arange(indptr[-1]) - np.repeat(indptr[:-1] - self.indptr[rows], counts)
+        indices = state_indices[self.indices[positions]]
+        if (indices < 0).any():
+            raise ValueError("Unknown restriction, some transitions leave the given states")
+
+        return TransitionModel(self.height, self.width, self.actions, indptr, indices,
+                               self.probabilities[positions], self.rewards[states], self.walls[states], states)
+
+    def gather(self, values):
+        '''
+        Definition
+        __________
+
+        Returns the values of the states of the model from the values of every flat cell of the grid, which are
+        returned as they are unless the model has been restricted
+
+
+        Parameters
+        __________
+
+        values : one-dimensional numpy array
+            The value of each flat cell of the grid
+
+        '''
+
+        if self.states is None:
+            return values
+        return values[self.states]
+
+    def scatter(self, values, fill=0):
+        '''
+        Definition
+        __________
+
+        Returns the values of every flat cell of the grid from the values of the states of the model, which are
+        returned as they are unless the model has been restricted, the cells left out taking the fill value
+
+
+        Parameters
+        __________
+
+        values : one-dimensional numpy array
+            The value of each state of the model
+
+        fill : float
+            Value of the cells which are not states of the model
+
+        '''
+
+        if self.states is None:
+            return values
+
+        grid_values = np.full(self.height * self.width, fill, dtype=np.asarray(values).dtype)
+        grid_values[self.states] = values
+        return grid_values
+
+    def to_grid(self, values):
+        '''
+        Definition
+        __________
+
+        Converts a flat list of per-cell values into a two-dimensional list indexed as [row][col]. It only reshapes
+        the values, so callers holding the values of the states of a restricted model must pass them through
+        scatter() first
+
+
+        Parameters
+        __________
+
+        values : list or one-dimensional numpy array
+            The value of each flat cell
+
+        '''
+
+        # numpy arrays are reshaped directly, so that the grid holds python floats
+        if isinstance(values, np.ndarray):
+            return values.reshape(self.height, self.width).tolist()
+
+        return [list(values[row * self.width:(row + 1) * self.width]) for row in range(self.height)]